@@ -7,7 +7,10 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
-__all__ = ["constants", "escpos", "exceptions", "printer"]
+__all__ = [
+    "assets", "constants", "discovery", "emulator", "escpos", "exceptions", "glyphs", "instrument", "merge",
+    "pagemode", "printer", "profiling", "proxy", "spool", "status", "transfer",
+]
 
 try:
     from .version import version as __version__  # noqa
@@ -0,0 +1,294 @@
+""" Graphics stored in the printer
+
+This module contains :py:class:`AssetManager`, which stores images like the header logo in the memory of a printer
+and prints them by their two byte key code, and the :py:class:`AssetRegistry` that keeps track of the images
+resident on each printer.
+
+Two memories are supported, both with the raster format of ``GS ( L`` / ``GS 8 L``:
+
+* ``'download'``: download graphics (functions 83 and 85), kept until the printer is switched off. The registry
+  does not save them, call :py:meth:`AssetManager.reset` when the printer may have been switched off in between.
+* ``'nv'``: NV graphics (functions 67 and 69), kept in flash memory. Flash wears out with every write, so NV
+  graphics are only written by an explicit :py:meth:`AssetManager.upload`.
+
+Once the manager is attached, :py:meth:`~escpos.escpos.Escpos.image` prints a resident image with the print
+command of 8 bytes instead of the bitmap.
+
+Example:
+
+.. code-block:: Python
+
+    assets = AssetManager(p, AssetRegistry('/var/lib/escpos/assets.json'))
+    assets.upload('logo.png')
+    assets.attach()
+    p.image('logo.png')  # sends GS ( L 06 00 30 55 k1 k2 01 01
+
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import hashlib
+import io
+import json
+import os
+import struct
+import threading
+import time
+
+import six
+
+from .constants import *
+from .instrument import unwrap_method, wrap_method
+
+MEMORIES = {
+    # memory: (define, print, delete)
+    'download': (GRAPHICS_DOWNLOAD_DEFINE, GRAPHICS_DOWNLOAD_PRINT, GRAPHICS_DOWNLOAD_DELETE),
+    'nv': (GRAPHICS_NV_DEFINE, GRAPHICS_NV_PRINT, GRAPHICS_NV_DELETE),
+}
+
+# memories whose content survives a power cycle, only these are saved to the file of a registry
+PERSISTENT_MEMORIES = ('nv',)
+
+# key codes are two printable characters
+KEY_RANGE = range(32, 127)
+
+
+def printer_id(printer):
+    """ Identify a printer by its connection, e.g. ``'network:192.168.1.100:9100'``
+
+    Printers without a connection (like :py:class:`~escpos.printer.Dummy`) get an id that is only valid for the
+    lifetime of the object.
+    """
+    name = type(printer).__name__.lower()
+    if hasattr(printer, 'host'):
+        return '{0}:{1}:{2}'.format(name, printer.host, printer.port)
+    if hasattr(printer, 'idVendor'):
+        return '{0}:{1:04x}:{2:04x}'.format(name, printer.idVendor, printer.idProduct)
+    if hasattr(printer, 'devfile'):
+        return '{0}:{1}'.format(name, printer.devfile)
+    return '{0}:{1:x}'.format(name, id(printer))
+
+
+class AssetRegistry(object):
+    """ Which images are resident on which printer
+
+    Entries are kept per printer id and memory, with the content hash of the image, so the same key can be looked
+    up by content. With a `path`, the NV graphics entries are saved as JSON after every change and loaded again by
+    the next process. Download graphics are lost when the printer is switched off, which another process cannot
+    know of, so they are only kept for the lifetime of the registry.
+    """
+
+    def __init__(self, path=None):
+        """
+        :param path: JSON file to persist the registry in, None to keep it in memory
+        """
+        self.path = path
+        self._lock = threading.RLock()
+        self._printers = {}
+        if path is not None and os.path.exists(path):
+            with io.open(path, encoding='utf-8') as registry_file:
+                self._printers = self._persistent(json.load(registry_file))
+
+    @staticmethod
+    def _persistent(printers):
+        """ The entries of `printers` that are saved """
+        return dict((printer, dict((memory, entries) for memory, entries in six.iteritems(memories)
+                                   if memory in PERSISTENT_MEMORIES))
+                    for printer, memories in six.iteritems(printers))
+
+    def save(self):
+        """ Write the registry to its file, replacing it atomically """
+        if self.path is None:
+            return
+        with self._lock:
+            tmp_path = self.path + '.tmp'
+            printers = self._persistent(self._printers)
+            with io.open(tmp_path, 'w', encoding='utf-8') as registry_file:
+                registry_file.write(six.text_type(json.dumps(printers, indent=2, sort_keys=True)))
+            os.replace(tmp_path, self.path)
+
+    def entries(self, printer, memory):
+        """ Resident images of a printer memory
+
+        :returns: dictionary of key code to entry, an entry is a dictionary with ``digest``, ``width``, ``height``
+            and ``stored`` (time stamp)
+        """
+        with self._lock:
+            return dict(self._printers.get(printer, {}).get(memory, {}))
+
+    def find(self, printer, memory, digest):
+        """ Key code of a resident image, None if it is not stored """
+        with self._lock:
+            for key, entry in six.iteritems(self._printers.get(printer, {}).get(memory, {})):
+                if entry['digest'] == digest:
+                    return key
+        return None
+
+    def record(self, printer, memory, key, digest, width, height):
+        with self._lock:
+            memories = self._printers.setdefault(printer, {})
+            memories.setdefault(memory, {})[key] = {
+                'digest': digest, 'width': width, 'height': height, 'stored': time.time(),
+            }
+            if memory in PERSISTENT_MEMORIES:
+                self.save()
+
+    def forget(self, printer, memory=None, key=None):
+        """ Remove entries, e.g. after the printer was switched off
+
+        :param memory: memory to forget, all memories by default
+        :param key: key code to forget, all keys of the memory by default
+        """
+        with self._lock:
+            memories = self._printers.get(printer, {})
+            for name in ([memory] if memory is not None else list(memories)):
+                if key is None:
+                    memories.pop(name, None)
+                else:
+                    memories.get(name, {}).pop(key, None)
+            self.save()
+
+
+class AssetManager(object):
+    """ Stores images in a printer and prints them by key code """
+
+    def __init__(self, printer, registry=None, memory='download', printer_name=None, auto_upload=False):
+        """
+        :param printer: An Escpos-printer object
+        :param registry: the :py:class:`AssetRegistry`, a new one in memory by default
+        :param memory: ``'download'`` or ``'nv'``
+        :param printer_name: id of the printer in the registry, defaults to :py:func:`printer_id`
+        :param auto_upload: with ``'download'`` memory, store every image printed through the attached `image()`
+            on first use. Use it for images that are printed again and again, the memory of the printer is small.
+        """
+        if memory not in MEMORIES:
+            raise ValueError("Unknown memory {0!r}".format(memory))
+        self.printer = printer
+        self.registry = registry or AssetRegistry()
+        self.memory = memory
+        self.printer_name = printer_name or printer_id(printer)
+        self.auto_upload = auto_upload and memory == 'download'
+        self._digests = {}
+
+    @staticmethod
+    def _encode(img_source):
+        from .image import EscposImage
+        return img_source if isinstance(img_source, EscposImage) else EscposImage(img_source)
+
+    def _digest(self, img_source, im=None):
+        """ Content hash of an image, cached for files that did not change """
+        cache_key = None
+        if isinstance(img_source, six.string_types):
+            stat = os.stat(img_source)
+            cache_key = (os.path.abspath(img_source), stat.st_mtime_ns, stat.st_size)
+            digest = self._digests.get(cache_key)
+            if digest is not None:
+                return digest, im
+        im = im or self._encode(img_source)
+        digest = hashlib.sha256(struct.pack('<HH', im.width, im.height) + im.to_raster_format()).hexdigest()
+        if cache_key is not None:
+            self._digests[cache_key] = digest
+        return digest, im
+
+    def _free_key(self):
+        used = set(self.registry.entries(self.printer_name, self.memory))
+        # without spaces, they are easy to miss in the key code lists of printer utilities
+        for first in KEY_RANGE[1:]:
+            for second in KEY_RANGE[1:]:
+                key = six.unichr(first) + six.unichr(second)
+                if key not in used:
+                    return key
+        raise ValueError("No free key code left")
+
+    @staticmethod
+    def _key_bytes(key):
+        if len(key) != 2 or not all(ord(char) in KEY_RANGE for char in key):
+            raise ValueError("Key codes are two printable ASCII characters, not {0!r}".format(key))
+        return key.encode('ascii')
+
+    def resident(self, img_source):
+        """ Key code of an image if it is stored in the printer, None otherwise """
+        digest, _ = self._digest(img_source)
+        return self.registry.find(self.printer_name, self.memory, digest)
+
+    def upload(self, img_source, key=None):
+        """ Store an image in the printer unless it is resident already
+
+        :param img_source: PIL image or filename
+        :param key: key code of two printable characters, a free one is chosen by default. An image stored under
+            the same key is replaced.
+        :returns: the key code of the image
+        :raises: :py:exc:`ValueError` if the image is larger than 8192 x 2304 dots
+        """
+        digest, im = self._digest(img_source)
+        resident = self.registry.find(self.printer_name, self.memory, digest)
+        if resident is not None and (key is None or key == resident):
+            return resident
+        im = im or self._encode(img_source)
+        if im.width > GRAPHICS_MAX_WIDTH or im.height > GRAPHICS_MAX_HEIGHT:
+            raise ValueError("Image of {0}x{1} dots is too large to be stored".format(im.width, im.height))
+        key = key or self._free_key()
+        define, _, _ = MEMORIES[self.memory]
+        # a: monochrome, b: one color plane, c: color 1
+        header = b'0' + self._key_bytes(key) + b'\x01' + struct.pack('<HH', im.width, im.height) + b'1'
+        self.printer._image_send_graphics_data(b'0', define, header + im.to_raster_format())
+        self.registry.record(self.printer_name, self.memory, key, digest, im.width, im.height)
+        return key
+
+    def print_key(self, key, double_width=False, double_height=False):
+        """ Print a stored image
+
+        :param key: key code returned by :py:meth:`upload`
+        """
+        _, print_fn, _ = MEMORIES[self.memory]
+        scale = six.int2byte(2 if double_width else 1) + six.int2byte(2 if double_height else 1)
+        self.printer._image_send_graphics_data(b'0', print_fn, self._key_bytes(key) + scale)
+
+    def delete(self, key):
+        """ Remove a stored image from the printer and the registry """
+        _, _, delete = MEMORIES[self.memory]
+        self.printer._image_send_graphics_data(b'0', delete, self._key_bytes(key))
+        self.registry.forget(self.printer_name, self.memory, key)
+
+    def image(self, img_source, high_density_vertical=True, high_density_horizontal=True, **kwargs):
+        """ Print an image by key code if it is resident, with :py:meth:`~escpos.escpos.Escpos.image` otherwise
+
+        Low density is printed as double width or height. The other arguments are used for images that are not
+        resident.
+        """
+        key = self.resident(img_source)
+        if key is None and self.auto_upload:
+            try:
+                key = self.upload(img_source)
+            except ValueError:
+                key = None
+        if key is None:
+            return self._image(img_source, high_density_vertical=high_density_vertical,
+                               high_density_horizontal=high_density_horizontal, **kwargs)
+        self.print_key(key, double_width=not high_density_horizontal, double_height=not high_density_vertical)
+
+    def reset(self):
+        """ Forget the download graphics of the printer, e.g. after it was switched off or connected again """
+        if self.memory == 'download':
+            self.registry.forget(self.printer_name, 'download')
+
+    def _image(self, *args, **kwargs):
+        return self.printer.image(*args, **kwargs)
+
+    def attach(self):
+        """ Make `image()` of the printer print resident images by key code """
+        def replacing(name, image):
+            self._image = image
+
+            def wrapper(*args, **kwargs):
+                return self.image(*args, **kwargs)
+            return wrapper
+        wrap_method(self.printer, 'image', replacing, self)
+
+    def detach(self):
+        """ Remove the wrapper set by :py:meth:`attach` """
+        unwrap_method(self.printer, 'image', self)
+        self.__dict__.pop('_image', None)
@@ -0,0 +1,361 @@
+""" Benchmarks
+
+This module contains micro-benchmarks for the building blocks of python-escpos. Run them with:
+
+.. code-block:: none
+
+    python -m escpos.bench
+
+Single benchmarks are run by passing their names. ``python -m escpos.bench imports`` checks that the core modules
+import within their time budget and without loading optional heavy dependencies, it exits with status 1 otherwise.
+
+The standard suite of :py:func:`run_suite` renders typical jobs on :py:class:`~escpos.printer.Dummy` and on the
+simulators of :py:mod:`escpos.simulator`, it is run with ``escpos bench`` and reports JSON that can be compared
+across versions.
+
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import contextlib
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from . import printer as printer_module
+from .instrument import LatencyHistogram, unwrap_method, wrap_method
+from .printer import Dummy
+
+# Cumulative import time budgets in milliseconds, as reported by ``python -X importtime``
+IMPORT_BUDGETS = {
+    'escpos.escpos': 50,
+    'escpos.printer': 80,
+    'escpos.cli': 80,
+}
+# Dependencies that are only loaded on first use of the matching feature or transport
+LAZY_DEPENDENCIES = ('qrcode', 'PIL', 'usb', 'serial', 'yaml', 'appdirs')
+
+
+def _best_of(func, repeat):
+    """ Run `func` `repeat` times and return the fastest run in seconds """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def bench_dummy_appends(count=10000, size=16, repeat=5):
+    """ Many small commands, as sent by `set()` and `text()`, followed by a reset of the buffer
+
+    :param count: number of commands per job
+    :param size: size of each command in bytes
+    :param repeat: number of runs
+    :returns: dictionary with the duration of the fastest run and the number of bytes of the job
+    """
+    msg = b'\x1b' * size
+    printer = Dummy()
+
+    def job():
+        for _ in range(count):
+            printer._raw(msg)
+        with printer.getbuffer() as data:
+            len(data)
+        printer.clear()
+
+    return {'seconds': _best_of(job, repeat), 'bytes': count * size}
+
+
+def bench_dummy_image(total=100 * 1024 * 1024, fragment=72 * 1024, repeat=3):
+    """ A large image job made of raster fragments, drained in one piece
+
+    :param total: size of the job in bytes
+    :param fragment: size of each fragment, the default is a 1024 dots high fragment of a 576 dots wide image
+    :param repeat: number of runs
+    :returns: dictionary with the duration of the fastest run and the number of bytes of the job
+    """
+    data = b'\xaa' * fragment
+    count = total // fragment
+
+    def job():
+        printer = Dummy()
+        for _ in range(count):
+            printer._raw(data)
+        printer.drain()
+
+    return {'seconds': _best_of(job, repeat), 'bytes': count * fragment}
+
+
+def measure_import(module, repeat=3):
+    """ Import a module in fresh interpreters
+
+    :param module: name of the module
+    :param repeat: number of interpreters started
+    :returns: tuple of the fastest cumulative import time in milliseconds and the lazy dependencies that were loaded
+    """
+    code = "import sys, {0}; print(' '.join(sys.modules))".format(module)
+    best = None
+    loaded = set()
+    for _ in range(repeat):
+        process = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                                 stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True,
+                                 universal_newlines=True)
+        for line in process.stderr.splitlines():
+            # import time: self [us] | cumulative | imported package
+            fields = line.split('|')
+            if len(fields) == 3 and fields[2].strip() == module:
+                elapsed = int(fields[1]) / 1000.0
+                if best is None or elapsed < best:
+                    best = elapsed
+        loaded.update(name.split('.')[0] for name in process.stdout.split())
+    return best, sorted(loaded.intersection(LAZY_DEPENDENCIES))
+
+
+def check_imports(budgets=None):
+    """ Compare the import times of modules with their budgets
+
+    :param budgets: dictionary of module names and budgets in milliseconds, defaults to :py:data:`IMPORT_BUDGETS`
+    :returns: list of the violations, empty if all modules are within budget
+    """
+    failures = []
+    for module, budget in sorted((IMPORT_BUDGETS if budgets is None else budgets).items()):
+        elapsed, loaded = measure_import(module)
+        print("{0:<20} {1:10.3f} ms  budget {2:6.1f} ms  {3}".format(
+            module, elapsed, budget, ' '.join(loaded) or '-'))
+        if elapsed > budget:
+            failures.append("{0} takes {1:.1f} ms to import (budget {2} ms)".format(module, elapsed, budget))
+        if loaded:
+            failures.append("{0} loads {1}".format(module, ', '.join(loaded)))
+    return failures
+
+
+BENCHMARKS = {
+    'dummy_appends': bench_dummy_appends,
+    'dummy_image': bench_dummy_image,
+}
+
+
+def _test_image(width, height):
+    """ A reproducible test picture: gradients and a grid """
+    from PIL import Image, ImageDraw
+    im = Image.linear_gradient('L').resize((width, height))
+    draw = ImageDraw.Draw(im)
+    for x in range(0, width, 32):
+        draw.line((x, 0, x, height), fill=0, width=2)
+    for y in range(0, height, 32):
+        draw.line((0, y, width, y), fill=255, width=2)
+    return im
+
+
+def _receipt(printer):
+    printer.set(align='center', text_type='B', width=2, height=2)
+    printer.text("ACME STORE\n")
+    printer.set()
+    for item in range(30):
+        printer.text("{0:<20}{1:>12}\n".format("Item {0}".format(item), "{0}.{1:02d}".format(item, item * 7 % 100)))
+    printer.block_text("Thank you for your purchase. " * 4)
+    printer.text("\n")
+    printer.cut()
+
+
+def _barcodes(printer, functions):
+    for params in functions:
+        printer.barcode(**params)
+
+
+def _suite_cases():
+    """ The cases of the standard suite
+
+    :returns: dictionary of names and tuples of the callable run with the printer and the default number of
+        iterations
+    """
+    from .cli import DEMO_FUNCTIONS
+    from .constants import BARCODE_TYPES
+
+    def supported(functions):
+        # the demo also lists symbologies this library can not encode (e.g. CODE128A)
+        return [params for params in functions
+                if params['bc'].upper() in BARCODE_TYPES[params.get('function_type', 'A').upper()]]
+
+    barcodes_a = supported(DEMO_FUNCTIONS['barcodes_a'])
+    barcodes_b = supported(DEMO_FUNCTIONS['barcodes_b'])
+    image = _test_image(384, 256)
+    tall_image = _test_image(576, 4096)
+    cases = {
+        'receipt_text': (_receipt, 200),
+        'qr_native': (lambda p: p.qr('https://example.com/receipt/4711', native=True), 500),
+        'qr_raster': (lambda p: p.qr('https://example.com/receipt/4711', size=6), 50),
+        'barcodes_a': (lambda p: _barcodes(p, barcodes_a), 200),
+        'barcodes_b': (lambda p: _barcodes(p, barcodes_b), 200),
+        'image_fragments': (lambda p: p.image(tall_image, fragment_height=1024), 5),
+    }
+    for impl in ('bitImageRaster', 'graphics', 'bitImageColumn'):
+        cases['image_' + impl] = ((lambda impl: lambda p: p.image(image, impl=impl))(impl), 20)
+    return cases
+
+
+@contextlib.contextmanager
+def _dummy_target():
+    printer = Dummy()
+    # keep the memory of the dummy from growing over the iterations
+    yield printer, printer.clear
+
+
+@contextlib.contextmanager
+def _network_target():
+    from .simulator import NetworkPrinterSimulator
+    with NetworkPrinterSimulator(record=False) as sim:
+        printer = printer_module.Network(sim.host, sim.port)
+        yield printer, None
+        printer.close()
+
+
+@contextlib.contextmanager
+def _serial_target():
+    from .simulator import SerialPrinterSimulator
+    with SerialPrinterSimulator(record=False) as sim:
+        # Serial announces itself on stdout, which carries the JSON report
+        with contextlib.redirect_stdout(sys.stderr):
+            printer = printer_module.Serial(sim.port, baudrate=115200, dsrdtr=False)
+        yield printer, None
+        printer.close()
+
+
+@contextlib.contextmanager
+def _file_target():
+    from .simulator import FilePrinterSimulator
+    with FilePrinterSimulator(record=False) as sim:
+        printer = printer_module.File(sim.path)
+        yield printer, None
+        printer.close()
+
+
+# Printers the suite is run against, by name. Each is a context manager yielding the printer and a callable run
+# after every iteration (or None).
+SUITE_TARGETS = {
+    'dummy': _dummy_target,
+    'network': _network_target,
+    'serial': _serial_target,
+    'file': _file_target,
+}
+
+
+def _run_case(printer, case, iterations, after):
+    """ Run one case and measure it """
+    output = {'bytes': 0}
+
+    def counting(name, raw):
+        def wrapper(msg):
+            output['bytes'] += len(msg)
+            return raw(msg)
+        return wrapper
+
+    histogram = LatencyHistogram()
+    wrap_method(printer, '_raw', counting, output)
+    try:
+        # warm up caches and lazy imports
+        case(printer)
+        if after is not None:
+            after()
+        output['bytes'] = 0
+        total = 0
+        for _ in range(iterations):
+            start = time.perf_counter_ns()
+            case(printer)
+            elapsed = time.perf_counter_ns() - start
+            if after is not None:
+                after()
+            histogram.record(elapsed)
+            total += elapsed
+        size = output['bytes']
+
+        # memory is measured separately since tracing slows everything down
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        case(printer)
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+        if not tracing:
+            tracemalloc.stop()
+        if after is not None:
+            after()
+    finally:
+        unwrap_method(printer, '_raw', output)
+    return {
+        'iterations': iterations,
+        'ops_per_s': iterations / (total / 1e9) if total else None,
+        'bytes_per_op': size // iterations,
+        'mean_us': histogram.mean / 1000.0,
+        'p50_us': histogram.percentile(50) / 1000.0,
+        'p99_us': histogram.percentile(99) / 1000.0,
+        'peak_memory_bytes': peak,
+    }
+
+
+def run_suite(targets=None, cases=None, iterations=None, progress=None):
+    """ Run the standard suite
+
+    :param targets: names of :py:data:`SUITE_TARGETS` to run against, all by default
+    :param cases: names of the cases to run, all by default
+    :param iterations: number of iterations of every case, defaults to a number per case
+    :param progress: callable called with the target and case name before each case
+    :returns: JSON-serializable dictionary with environment and results
+    """
+    from . import version
+    all_cases = _suite_cases()
+    targets = targets or sorted(SUITE_TARGETS)
+    cases = cases or sorted(all_cases)
+    for name in targets:
+        if name not in SUITE_TARGETS:
+            raise ValueError("Unknown target {0!r}".format(name))
+    for name in cases:
+        if name not in all_cases:
+            raise ValueError("Unknown case {0!r}".format(name))
+    results = []
+    for target in targets:
+        with SUITE_TARGETS[target]() as (printer, after):
+            for name in cases:
+                case, default_iterations = all_cases[name]
+                if progress is not None:
+                    progress(target, name)
+                result = _run_case(printer, case, iterations or default_iterations, after)
+                result.update({'target': target, 'case': name})
+                results.append(result)
+    return {
+        'escpos': version.version,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'time': time.time(),
+        'results': results,
+    }
+
+
+def main(names=None):
+    names = names or sys.argv[1:]
+    if 'imports' in names:
+        failures = check_imports()
+        for failure in failures:
+            print(failure, file=sys.stderr)
+        if failures:
+            sys.exit(1)
+        names = [name for name in names if name != 'imports']
+        if not names:
+            return
+    for name in (names or sorted(BENCHMARKS)):
+        result = BENCHMARKS[name]()
+        print("{0:<20} {1:10.3f} ms {2:12d} bytes {3:10.1f} MB/s".format(
+            name, result['seconds'] * 1000, result['bytes'], result['bytes'] / result['seconds'] / 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -15,6 +15,7 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 import argparse
+import json
 try:
     import argcomplete
 except ImportError:
@@ -22,7 +23,6 @@ except ImportError:
     pass  # noqa
 import sys
 import six
-from . import config
 from . import version
 
 
@@ -33,6 +33,13 @@ def str_to_bool(string):
     """
     return string.lower() in ('y', 'yes', '1', 'true')
 
+
+def str_to_bytes(string):
+    """ Used as a type in argparse for raw data, every character
+    from \\x00 to \\xff is sent as one byte
+    """
+    return string.encode('latin-1')
+
 # A list of functions that work better with a newline to be sent after them.
 REQUIRES_NEWLINE = ('qr', 'barcode', 'text', 'block_text')
 
@@ -429,6 +436,7 @@ ESCPOS_COMMANDS = [
             {
                 'option_strings': ('--msg',),
                 'help': 'Raw data to send',
+                'type': str_to_bytes,
                 'required': True,
             },
         ],
@@ -458,6 +466,17 @@ def main():
         help='Alternate path to the configuration file',
     )
 
+    parser.add_argument(
+        '-p', '--printer',
+        help='Name of the printer in the printers section of the configuration file',
+    )
+
+    parser.add_argument(
+        '--profile',
+        help='Print time, output and allocations of every command to stderr',
+        action='store_true',
+    )
+
     # Everything interesting runs off of a subparser so we can use the format
     # cli [subparser] -args
     command_subparsers = parser.add_subparsers(
@@ -472,6 +491,7 @@ def main():
         parser_command = command_subparsers.add_parser(**command['parser'])
         parser_command.set_defaults(**command['defaults'])
         for argument in command['arguments']:
+            argument = dict(argument)
             option_strings = argument.pop('option_strings')
             parser_command.add_argument(*option_strings, **argument)
 
@@ -501,6 +521,65 @@ def main():
         action='store_true',
     )
 
+    parser_command_proxy = command_subparsers.add_parser('proxy',
+                                                         help='Forward raw jobs from TCP clients to the printer')
+    parser_command_proxy.set_defaults(func='proxy')
+    parser_command_proxy.add_argument(
+        '--host',
+        help='Address to listen on',
+    )
+    parser_command_proxy.add_argument(
+        '--port',
+        help='TCP port to listen on',
+        type=int,
+    )
+    parser_command_proxy.add_argument(
+        '--max_clients',
+        help='Maximum number of simultaneous client connections',
+        type=int,
+    )
+
+    parser_command_batch = command_subparsers.add_parser('batch',
+                                                         help='Run newline-delimited JSON commands on one open printer')
+    parser_command_batch.set_defaults(func='run_batch')
+    parser_command_batch.add_argument(
+        '--file',
+        help='File with one command per line, e.g. {"command": "text", "txt": "Hello"}. Defaults to stdin',
+    )
+    parser_command_batch.add_argument(
+        '--buffer_size',
+        help='Number of bytes collected before they are written to the printer',
+        type=int,
+    )
+    parser_command_batch.add_argument(
+        '--pipeline',
+        help='Render the next commands in a separate thread while the printer is written to',
+        action='store_true',
+    )
+
+    parser_command_bench = command_subparsers.add_parser('bench',
+                                                         help='Run the performance suite, no printer needed')
+    parser_command_bench.set_defaults(func='run_bench')
+    parser_command_bench.add_argument(
+        '--targets',
+        help='Printers to run the suite against: dummy, network, serial, file. Defaults to all',
+        nargs='+',
+    )
+    parser_command_bench.add_argument(
+        '--cases',
+        help='Cases to run, defaults to all',
+        nargs='+',
+    )
+    parser_command_bench.add_argument(
+        '--iterations',
+        help='Number of iterations of every case, defaults to a number per case',
+        type=int,
+    )
+    parser_command_bench.add_argument(
+        '--output',
+        help='File to write the JSON results to, defaults to stdout',
+    )
+
     parser_command_version = command_subparsers.add_parser('version',
                                                            help='Print the version of python-escpos')
     parser_command_version.set_defaults(version=True)
@@ -525,14 +604,30 @@ def main():
     # If there was a config path passed, grab it
     config_path = command_arguments.pop('config', None)
 
-    # Load the configuration and defined printer
+    printer_name = command_arguments.pop('printer', None)
+
+    profile = command_arguments.pop('profile', False)
+
+    # The benchmark brings its own printers
+    if command_arguments.get('func') == 'run_bench':
+        command_arguments.pop('func')
+        command_arguments.pop('parser', None)
+        run_bench(**command_arguments)
+        sys.exit()
+
+    # Load the configuration and defined printer, this imports the transports and yaml
+    from . import config
     saved_config = config.Config()
     saved_config.load(config_path)
-    printer = saved_config.printer()
+    printer = saved_config.printer(printer_name)
 
-    if not printer:
+    if printer is None:
         raise Exception('No printers loaded from config')
 
+    if profile and printer.profiler is None:
+        from .profiling import Profiler
+        printer.start_profiling(Profiler(output=sys.stderr))
+
     target_command = command_arguments.pop('func')
 
     # remove helper-argument 'parser' from dict
@@ -547,6 +642,9 @@ def main():
         command_arguments['printer'] = printer
         globals()[target_command](**command_arguments)
 
+    if printer.profiler is not None:
+        printer.profiler.end_job()
+
 
 def demo(printer, **kwargs):
     """
@@ -568,5 +666,208 @@ def demo(printer, **kwargs):
             command(**params)
         printer.cut()
 
+
+def proxy(printer, host='0.0.0.0', port=9100, **kwargs):
+    """
+    Forwards raw ESC/POS jobs received over TCP to the printer until interrupted. Called when CLI is passed `proxy`.
+
+    :param printer: A printer from escpos.printer
+    :param host: Address to listen on
+    :param port: TCP port to listen on
+    :param kwargs: Further arguments for :py:class:`escpos.proxy.ProxyServer`
+    """
+    from .proxy import ProxyServer
+    server = ProxyServer({port: printer}, host=host, **kwargs)
+    print("Forwarding jobs from {0}:{1}".format(host, port))
+    server.serve_forever()
+
+
+def _batch_arguments():
+    """ Map the names of the ESCPOS_COMMANDS to their printer method and the specifications of their arguments
+
+    The names are those of the subcommands, e.g. ``raw`` for ``_raw()``. Commands that are not printer methods can
+    not be batched.
+    """
+    from .escpos import Escpos
+
+    commands = {}
+    for command in ESCPOS_COMMANDS:
+        func = command['defaults']['func']
+        if not hasattr(Escpos, func):
+            continue
+        arguments = {}
+        for argument in command['arguments']:
+            arguments[argument['option_strings'][-1].lstrip('-')] = argument
+        commands[command['parser']['name']] = (func, arguments)
+    return commands
+
+
+def _parse_batch_line(line, commands):
+    """ Turn a line of a batch into the name and the arguments of a printer method
+
+    The arguments are checked and converted like the arguments of the single commands.
+    """
+    entry = json.loads(line)
+    if not isinstance(entry, dict) or entry.get('command') not in commands:
+        raise ValueError('Unknown command {0!r}'.format(entry.get('command') if isinstance(entry, dict) else entry))
+    name = entry.pop('command')
+    func, specifications = commands[name]
+    for key, value in six.iteritems(entry):
+        specification = specifications.get(key)
+        if specification is None:
+            raise ValueError('Unknown argument {0!r} of {1}'.format(key, name))
+        if isinstance(value, six.string_types) and 'type' in specification:
+            value = entry[key] = specification['type'](value)
+        if 'choices' in specification and value not in specification['choices']:
+            raise ValueError('Invalid value {0!r} for argument {1!r} of {2}'.format(value, key, name))
+    for key, specification in six.iteritems(specifications):
+        if specification.get('required') and key not in entry:
+            raise ValueError('Missing argument {0!r} of {1}'.format(key, name))
+    return func, entry
+
+
+def _render_batch(lines, renderer, buffer_size):
+    """ Run the commands of a batch on a Dummy printer and yield the output in chunks
+
+    A chunk ends after a cut or when the output reaches `buffer_size` bytes.
+    """
+    commands = _batch_arguments()
+    count = 0
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            name, arguments = _parse_batch_line(line, commands)
+        except ValueError as e:
+            raise ValueError('Line {0}: {1}'.format(number, e))
+        getattr(renderer, name)(**arguments)
+        if name in REQUIRES_NEWLINE:
+            renderer.text("\n")
+        count += 1
+        if name == 'cut' or len(renderer) >= buffer_size:
+            yield count, renderer.drain()
+            count = 0
+    if count or len(renderer):
+        yield count, renderer.drain()
+
+
+def _pipelined(chunks, depth=4):
+    """ Iterate over `chunks` in a separate thread, at most `depth` chunks ahead of the consumer """
+    import threading
+    from six.moves import queue
+
+    pending = queue.Queue(maxsize=depth)
+    done = object()
+    stopped = threading.Event()
+
+    def produce():
+        try:
+            for chunk in chunks:
+                while not stopped.is_set():
+                    try:
+                        pending.put(chunk, timeout=0.1)
+                        break
+                    except queue.Full:
+                        pass
+                if stopped.is_set():
+                    return
+            pending.put(done)
+        except Exception as e:
+            pending.put(e)
+
+    thread = threading.Thread(target=produce, name='escpos-batch-render')
+    thread.daemon = True
+    thread.start()
+    try:
+        while True:
+            chunk = pending.get()
+            if chunk is done:
+                return
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def run_batch(printer, file=None, buffer_size=65536, pipeline=False, **kwargs):
+    """
+    Runs newline-delimited JSON commands on the printer. Called when CLI is passed `batch`.
+
+    Every line is an object with the name of one of the ESCPOS_COMMANDS in `command`, as on the command line, and its
+    arguments, e.g.
+    ``{"command": "barcode", "code": "1324354", "bc": "EAN8"}``. The commands are rendered into a buffer that is
+    written to the printer after each cut and whenever it holds `buffer_size` bytes, the device stays open for the
+    whole batch. Statistics are printed to stderr at the end. A profiler of the printer measures the commands while
+    they are rendered.
+
+    :param printer: A printer from escpos.printer
+    :param file: Path of the file with the commands, stdin if not given
+    :param buffer_size: Number of bytes collected before they are written
+    :param pipeline: Render commands in a separate thread while the previous output is written
+    """
+    import time
+    from .printer import Dummy
+
+    renderer = Dummy(columns=printer.columns)
+    profiler = printer.profiler
+    if profiler is not None:
+        # the commands run on the renderer, the printer only gets their output
+        printer.stop_profiling()
+        renderer.start_profiling(profiler)
+    lines = open(file) if file else sys.stdin
+    commands = 0
+    size = 0
+    writing = 0.0
+    start = time.perf_counter()
+    try:
+        chunks = _render_batch(lines, renderer, buffer_size)
+        if pipeline:
+            chunks = _pipelined(chunks)
+        for count, data in chunks:
+            before = time.perf_counter()
+            printer._raw(data)
+            writing += time.perf_counter() - before
+            commands += count
+            size += len(data)
+        if hasattr(printer, 'flush'):
+            printer.flush()
+    finally:
+        if file:
+            lines.close()
+        if profiler is not None:
+            renderer.stop_profiling()
+            printer.start_profiling(profiler)
+    elapsed = time.perf_counter() - start
+    print("{0} commands, {1} bytes in {2:.3f} s ({3:.3f} s writing): {4:.1f} commands/s, {5:.1f} kB/s".format(
+        commands, size, elapsed, writing, commands / elapsed if elapsed else 0.0,
+        size / elapsed / 1000 if elapsed else 0.0), file=sys.stderr)
+
+
+def run_bench(targets=None, cases=None, iterations=None, output=None, **kwargs):
+    """
+    Runs the performance suite of :py:mod:`escpos.bench` and writes the results as JSON. Called when CLI is passed
+    `bench`.
+
+    :param targets: Names of the printers to run against
+    :param cases: Names of the cases to run
+    :param iterations: Number of iterations of every case
+    :param output: Path of the JSON file, stdout if not given
+    """
+    from .bench import run_suite
+
+    def progress(target, case):
+        print("{0}: {1}".format(target, case), file=sys.stderr)
+
+    results = run_suite(targets, cases, iterations, progress)
+    if output:
+        with open(output, 'w') as output_file:
+            json.dump(results, output_file, indent=2, sort_keys=True)
+    else:
+        json.dump(results, sys.stdout, indent=2, sort_keys=True)
+        print()
+
+
 if __name__ == '__main__':
     main()
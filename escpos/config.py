@@ -10,7 +10,10 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 import os
+import threading
+
 import appdirs
+import six
 import yaml
 
 from . import printer
@@ -22,6 +25,25 @@ class Config(object):
 
     This class loads configuration from a default or specificed directory. It
     can create your defined printer and return it to you.
+
+    Besides the default printer in the `printer:` section, named printers can
+    be defined in the `printers:` section:
+
+    .. code-block:: yaml
+
+        printer:
+            type: Network
+            host: 192.168.1.100
+        printers:
+            kitchen:
+                type: Network
+                host: 192.168.1.101
+            bar:
+                type: Usb
+                idVendor: 0x0416
+                idProduct: 0x5011
+
+    Printers are created on first use and reused afterwards.
     """
     _app_name = 'python-escpos'
     _config_file = 'config.yaml'
@@ -33,39 +55,72 @@ class Config(object):
         to self._reset_config
         """
         self._has_loaded = False
-        self._printer = None
+        self._config_path = None
+        self._source = None
+        self._lock = threading.RLock()
 
-        self._printer_name = None
-        self._printer_config = None
+        # printer sections and instances by name, the default printer is named None
+        self._printer_configs = {}
+        self._printers = {}
 
     def _reset_config(self):
         """ Clear the loaded configuration.
 
         If we are loading a changed config, we don't want to have leftover
-        data.
+        data. Printers are kept by :py:meth:`load` if their section did not change.
         """
         self._has_loaded = False
-        self._printer = None
+        self._config_path = None
+        self._source = None
+
+        self._printer_configs = {}
+        self._printers = {}
+
+    @staticmethod
+    def _parse_printer(printer_config, section):
+        """ Split a printer section into the name of the class and its arguments """
+        printer_config = dict(printer_config)
+        printer_name = str(printer_config.pop('type', '') or '').title()
+
+        if not printer_name or not hasattr(printer, printer_name):
+            raise exceptions.ConfigSyntaxError(
+                'Printer type "{printer_name}" in section {section} is invalid'.format(
+                    printer_name=printer_name,
+                    section=section,
+                )
+            )
+        return printer_name, printer_config
 
-        self._printer_name = None
-        self._printer_config = None
+    @classmethod
+    def build_printer(cls, printer_config, section='printer'):
+        """ Create a printer from a printer section, without loading a file
+
+        :param printer_config: dictionary with the printer `type` and the
+            arguments of its class, e.g. ``{'type': 'Network', 'host': '192.168.1.100'}``
+        :param section: name of the section in error messages
+        """
+        printer_name, printer_config = cls._parse_printer(printer_config, section)
+        return getattr(printer, printer_name)(**printer_config)
 
     def load(self, config_path=None):
         """ Load and parse the configuration file using pyyaml
 
+        A file that was loaded before is only parsed again if its modification
+        time or size changed. Printers whose section did not change are kept,
+        the others are closed and created again on their next use.
+
         :param config_path: An optional file path, file handle, or byte string
             for the configuration file.
 
         """
 
-        self._reset_config()
-
         if not config_path:
             config_path = os.path.join(
                 appdirs.user_config_dir(self._app_name),
                 self._config_file
             )
 
+        source = None
         try:
             # First check if it's file like. If it is, pyyaml can load it.
             # I'm checking type instead of catching exceptions to keep the
@@ -73,6 +128,10 @@ class Config(object):
             if hasattr(config_path, 'read'):
                 config = yaml.safe_load(config_path)
             else:
+                stat = os.stat(config_path)
+                source = (config_path, stat.st_mtime_ns, stat.st_size)
+                if self._has_loaded and source == self._source:
+                    return
                 # If it isn't, it's a path. We have to open it first, otherwise
                 # pyyaml will try to read it as yaml
                 with open(config_path, 'rb') as config_file:
@@ -84,35 +143,69 @@ class Config(object):
         except yaml.YAMLError:
             raise exceptions.ConfigSyntaxError('Error parsing YAML')
 
+        config = config or {}
+        printer_configs = {}
         if 'printer' in config:
-            self._printer_config = config['printer']
-            self._printer_name = self._printer_config.pop('type').title()
-
-            if not self._printer_name or not hasattr(printer, self._printer_name):
-                raise exceptions.ConfigSyntaxError(
-                    'Printer type "{printer_name}" is invalid'.format(
-                        printer_name=self._printer_name,
-                    )
-                )
+            printer_configs[None] = self._parse_printer(config['printer'], 'printer')
+        for name, printer_config in six.iteritems(config.get('printers') or {}):
+            printer_configs[name] = self._parse_printer(printer_config, 'printers.{0}'.format(name))
+
+        with self._lock:
+            printers = self._printers
+            previous_configs = self._printer_configs
+            self._reset_config()
+            for name, instance in six.iteritems(printers):
+                if printer_configs.get(name) == previous_configs.get(name):
+                    self._printers[name] = instance
+                else:
+                    try:
+                        instance.close()
+                    except EnvironmentError:
+                        pass
+            self._printer_configs = printer_configs
+            self._config_path = None if source is None else config_path
+            self._source = source
+            self._has_loaded = True
+
+    def reload(self):
+        """ Load the configuration file again if it changed since it was loaded
+
+        This only costs a `stat()` of the file if it did not change.
+        """
+        if self._config_path is not None:
+            self.load(self._config_path)
 
-        self._has_loaded = True
+    def printer_names(self):
+        """ Names of the printers in the `printers:` section
+
+        :rtype: list
+        """
+        if not self._has_loaded:
+            self.load()
+        return sorted(name for name in self._printer_configs if name is not None)
 
-    def printer(self):
+    def printer(self, name=None):
         """ Returns a printer that was defined in the config, or throws an
         exception.
 
         This method loads the default config if one hasn't beeen already loaded.
 
+        :param name: name of a printer in the `printers:` section, by default
+            the printer of the `printer:` section is returned
         """
         if not self._has_loaded:
             self.load()
 
-        if not self._printer_name:
-            raise exceptions.ConfigSectionMissingError('printer')
+        with self._lock:
+            if name not in self._printer_configs:
+                raise exceptions.ConfigSectionMissingError(
+                    'printer' if name is None else 'printers.{0}'.format(name))
 
-        if not self._printer:
-            # We could catch init errors and make them a ConfigSyntaxError,
-            # but I'll just let them pass
-            self._printer = getattr(printer, self._printer_name)(**self._printer_config)
+            instance = self._printers.get(name)
+            if instance is None:
+                printer_name, printer_config = self._printer_configs[name]
+                # We could catch init errors and make them a ConfigSyntaxError,
+                # but I'll just let them pass
+                instance = self._printers[name] = getattr(printer, printer_name)(**printer_config)
 
-        return self._printer
+        return instance
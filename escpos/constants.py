@@ -38,6 +38,17 @@ CTL_HT = b'\t'              # Horizontal tab
 CTL_SET_HT = ESC + b'\x44'  # Set horizontal tab positions
 CTL_VT = b'\v'              # Vertical tab
 
+# Page mode
+PAGE_MODE      = ESC + b'L'     # Select page mode
+PAGE_STANDARD  = ESC + b'S'     # Back to standard mode, the page is discarded
+PAGE_AREA      = ESC + b'W'     # xL xH yL yH dxL dxH dyL dyH: print area
+PAGE_DIRECTION = ESC + b'T'     # n: print direction, 0 left to right
+PAGE_POS_X     = ESC + b'$'     # nL nH: absolute horizontal position
+PAGE_POS_Y     = GS + b'$'      # nL nH: absolute vertical position of the baseline
+PAGE_PRINT     = CTL_FF         # Print the page and go back to standard mode
+PAGE_CANCEL    = CAN            # Discard the page
+MOTION_UNITS   = GS + b'P'      # x y: motion units of 1/x and 1/y inch
+
 # Printer hardware
 HW_INIT   = ESC + b'@'             # Clear data in buffer and reset modes
 HW_SELECT = ESC + b'=\x01'         # Printer select
@@ -50,6 +61,44 @@ _CASH_DRAWER = lambda m, t1='', t2='': ESC + b'p' + m + six.int2byte(t1) + six.i
 CD_KICK_2 = _CASH_DRAWER(b'\x00', 50, 50)  # Sends a pulse to pin 2 []
 CD_KICK_5 = _CASH_DRAWER(b'\x01', 50, 50)  # Sends a pulse to pin 5 []
 
+# Real-time status transmission (DLE EOT n), answered with one status byte
+_RT_STATUS = lambda n: DLE + EOT + six.int2byte(n)
+RT_STATUS_PRINTER = _RT_STATUS(1)  # Printer status
+RT_STATUS_OFFLINE = _RT_STATUS(2)  # Offline cause status
+RT_STATUS_ERROR   = _RT_STATUS(3)  # Error cause status
+RT_STATUS_PAPER   = _RT_STATUS(4)  # Roll paper sensor status
+RT_STATUS_ONLINE  = RT_STATUS_PRINTER
+
+# Fixed bits of a real-time status byte: 0xx1xx10
+RT_FIXED_MASK  = 0x93
+RT_FIXED_VALUE = 0x12
+
+RT_MASK_DRAWER       = 0x04  # n=1: drawer kick-out connector pin 3 is high
+RT_MASK_OFFLINE      = 0x08  # n=1: printer is offline
+RT_MASK_COVER_OPEN   = 0x04  # n=2: cover is open
+RT_MASK_FEED_BUTTON  = 0x08  # n=2: paper is being fed by the feed button
+RT_MASK_PAPER_STOP   = 0x20  # n=2: printing stopped because of paper end
+RT_MASK_ERROR        = 0x40  # n=2: an error occurred
+RT_MASK_CUTTER_ERROR = 0x08  # n=3: autocutter error
+RT_MASK_UNRECOVERABLE_ERROR = 0x20  # n=3: unrecoverable error
+RT_MASK_AUTORECOVER_ERROR   = 0x40  # n=3: automatically recoverable error
+RT_MASK_PAPER_NEAR_END = 0x0c  # n=4: roll paper near-end sensor
+RT_MASK_PAPER_END      = 0x60  # n=4: roll paper end sensor
+
+# Automatic Status Back (GS a n), the printer pushes 4 status bytes on every change
+_ASB = lambda n: GS + b'a' + six.int2byte(n)
+ASB_DRAWER = 0x01  # Drawer kick-out connector pin 3
+ASB_ONLINE = 0x02  # Online/offline status
+ASB_ERROR  = 0x04  # Error status
+ASB_PAPER  = 0x08  # Roll paper sensor status
+ASB_ENABLE  = _ASB(ASB_DRAWER | ASB_ONLINE | ASB_ERROR | ASB_PAPER)
+ASB_DISABLE = _ASB(0)
+
+# Fixed bits of the first ASB byte: 0xx1xx00, following bytes: 0xx0xxxx
+ASB_FIXED_MASK  = 0x93
+ASB_FIXED_VALUE = 0x10
+ASB_TAIL_MASK   = 0x90
+
 # Paper Cutter
 _CUT_PAPER = lambda m: GS + b'V' + m
 PAPER_FULL_CUT = _CUT_PAPER(b'\x00')  # Full cut paper
@@ -142,6 +191,16 @@ CHARCODE_THAI16 = ESC + b'\x74\x19'  # Thai character code 16
 CHARCODE_THAI17 = ESC + b'\x74\x1a'  # Thai character code 17
 CHARCODE_THAI18 = ESC + b'\x74\x1b'  # Thai character code 18
 
+# User-defined characters
+USER_CHAR_DEFINE = ESC + b'&'     # y c1 c2 [x d1...d(y*x)]...
+USER_CHAR_ON     = ESC + b'%\x01'  # Select the user-defined character set
+USER_CHAR_OFF    = ESC + b'%\x00'  # Back to the resident character set
+USER_CHAR_CANCEL = ESC + b'?'     # Delete the user-defined character n
+USER_CHAR_CODES  = (32, 126)      # First and last code of a user-defined character
+
+# Character cells of font A and B in dots
+FONT_CELLS = {'a': (12, 24), 'b': (9, 17)}
+
 # Barcode format
 _SET_BARCODE_TXT_POS = lambda n: GS + b'H' + n
 BARCODE_TXT_OFF = _SET_BARCODE_TXT_POS(b'\x00')  # HRI barcode chars OFF
@@ -220,6 +279,19 @@ S_RASTER_2W = _PRINT_RASTER_IMG(b'\x01')  # Set raster image double width
 S_RASTER_2H = _PRINT_RASTER_IMG(b'\x02')  # Set raster image double height
 S_RASTER_Q  = _PRINT_RASTER_IMG(b'\x03')  # Set raster image quadruple
 
+# Stored graphics: function codes of GS ( L and GS 8 L with m = '0'
+# NV graphics are kept after power off, download graphics until power off.
+GRAPHICS_NV_DELETE_ALL       = b'A'  # fn 65, followed by 'CLR'
+GRAPHICS_NV_DELETE           = b'B'  # fn 66, kc1 kc2
+GRAPHICS_NV_DEFINE           = b'C'  # fn 67, raster format
+GRAPHICS_NV_PRINT            = b'E'  # fn 69, kc1 kc2 x y
+GRAPHICS_DOWNLOAD_DELETE_ALL = b'Q'  # fn 81, followed by 'CLR'
+GRAPHICS_DOWNLOAD_DELETE     = b'R'  # fn 82, kc1 kc2
+GRAPHICS_DOWNLOAD_DEFINE     = b'S'  # fn 83, raster format
+GRAPHICS_DOWNLOAD_PRINT      = b'U'  # fn 85, kc1 kc2 x y
+GRAPHICS_MAX_WIDTH  = 8192
+GRAPHICS_MAX_HEIGHT = 2304
+
 # Printing Density
 PD_N50 = GS + b'\x7c\x00'  # Printing Density -50%
 PD_N37 = GS + b'\x7c\x01'  # Printing Density -37.5%
@@ -230,3 +302,7 @@ PD_P50 = GS + b'\x7c\x08'  # Printing Density +50%
 PD_P37 = GS + b'\x7c\x07'  # Printing Density +37.5%
 PD_P25 = GS + b'\x7c\x06'  # Printing Density +25%
 PD_P12 = GS + b'\x7c\x05'  # Printing Density +12.5%
+
+# Public command methods of Escpos, e.g. for wrappers that act on every command
+PUBLIC_COMMANDS = ('text', 'block_text', 'image', 'qr', 'barcode', 'set', 'cut', 'charcode', 'line_spacing',
+                   'cashdraw', 'hw', 'control', 'panel_buttons')
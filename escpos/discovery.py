@@ -0,0 +1,290 @@
+""" Printer discovery
+
+This module finds printers that can be attached with the classes of :py:mod:`escpos.printer`:
+
+* :py:func:`find_usb` lists the USB devices of known ESC/POS vendors,
+* :py:func:`probe_network` connects to many ``host:9100`` endpoints at once with a short timeout,
+* :py:func:`probe_serial` opens the serial ports of printers in parallel and asks each for its real-time status.
+
+Every function returns a list of :py:class:`Candidate` and accepts a `cancelled` callable, so a caller can stop a
+long scan from another thread. :py:func:`discover` runs all three concurrently.
+
+Example:
+
+.. code-block:: Python
+
+    for candidate in discover(hosts='192.168.1.0/24'):
+        print(candidate.description, candidate.params)
+
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import collections
+import ipaddress
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .constants import RT_FIXED_MASK, RT_FIXED_VALUE, RT_STATUS_PRINTER
+
+# USB vendor ids of printer makers and of the USB chips found in unbranded ESC/POS printers
+KNOWN_VENDORS = {
+    0x0416: 'Winbond (Zjiang and other generic printers)',
+    0x0483: 'STMicroelectronics (generic printers)',
+    0x04b8: 'Seiko Epson',
+    0x0519: 'Star Micronics',
+    0x0dd4: 'Custom Engineering',
+    0x0fe6: 'ICS Advent (Xprinter and other generic printers)',
+    0x1504: 'Bixolon',
+    0x154f: 'SNBC',
+    0x1659: 'Prolific (generic printers)',
+    0x1d90: 'Citizen',
+    0x20d1: 'HPRT',
+    0x28e9: 'GigaDevice (generic printers)',
+}
+
+DEFAULT_PORT = 9100
+DEFAULT_BAUDRATES = (9600, 19200, 38400, 115200)
+
+Candidate = collections.namedtuple('Candidate', ['kind', 'params', 'description'])
+""" A device that looks like a printer
+
+`kind` is one of ``'USB'``, ``'Network'`` and ``'Serial'``, `params` are the keyword arguments for the printer class
+of that kind, e.g. ``{'host': '192.168.1.100', 'port': 9100}``.
+"""
+
+
+def _never():
+    return False
+
+
+def find_usb(vendors=None, cancelled=None):
+    """ List the USB devices of known printer vendors
+
+    :param vendors: dictionary of vendor id to name, defaults to :py:data:`KNOWN_VENDORS`
+    :param cancelled: unused, for the same signature as the other probes
+    :returns: list of :py:class:`Candidate` with ``idVendor`` and ``idProduct``, empty if :py:mod:`usb` or a USB
+        backend is not available
+    """
+    vendors = KNOWN_VENDORS if vendors is None else vendors
+    try:
+        import usb.core
+        devices = usb.core.find(find_all=True, custom_match=lambda device: device.idVendor in vendors)
+        devices = list(devices)
+    except (ImportError, EnvironmentError):
+        return []
+    except Exception as e:
+        # NoBackendError is not an EnvironmentError
+        if type(e).__name__ != 'NoBackendError':
+            raise
+        return []
+    candidates = []
+    for device in devices:
+        description = "{0} {1:04x}:{2:04x}".format(vendors[device.idVendor], device.idVendor, device.idProduct)
+        candidates.append(Candidate('USB', {'idVendor': device.idVendor, 'idProduct': device.idProduct},
+                                    description))
+    return candidates
+
+
+def local_networks(prefix=24):
+    """ The networks of the addresses this host uses for outgoing IPv4 traffic
+
+    :param prefix: prefix length of the returned networks
+    :returns: list of :py:class:`ipaddress.IPv4Network`, empty without IPv4 route
+    """
+    addresses = set()
+    probe = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        # connecting a UDP socket only selects the route, nothing is sent
+        probe.connect(('192.0.2.1', DEFAULT_PORT))
+        addresses.add(probe.getsockname()[0])
+    except EnvironmentError:
+        pass
+    finally:
+        probe.close()
+    return [ipaddress.ip_network('{0}/{1}'.format(address, prefix), strict=False) for address in sorted(addresses)
+            if not ipaddress.ip_address(address).is_loopback]
+
+
+def _hosts(hosts):
+    """ Expand networks like ``192.168.1.0/24`` to their host addresses """
+    if hosts is None:
+        hosts = local_networks()
+    elif isinstance(hosts, (str, ipaddress.IPv4Network)):
+        hosts = [hosts]
+    for host in hosts:
+        if isinstance(host, str) and '/' not in host:
+            yield host
+            continue
+        for address in ipaddress.ip_network(host, strict=False).hosts():
+            yield str(address)
+
+
+def _connects(host, port, timeout):
+    try:
+        connection = socket.create_connection((host, port), timeout)
+    except EnvironmentError:
+        return False
+    connection.close()
+    return True
+
+
+def probe_network(hosts=None, port=DEFAULT_PORT, timeout=0.5, workers=64, cancelled=None):
+    """ Find hosts accepting connections on the printer port
+
+    The connections are opened in parallel, so a /24 network takes about ``254 / workers * timeout`` seconds when
+    most addresses do not answer.
+
+    :param hosts: host names, addresses and networks (``'192.168.1.0/24'``), defaults to the local networks
+    :param port: TCP port of the printers
+    :param timeout: seconds to wait for a connection
+    :param workers: number of connections attempted at the same time
+    :param cancelled: callable returning True when the scan should stop
+    :returns: list of :py:class:`Candidate` with ``host`` and ``port``, in the order of `hosts`
+    """
+    cancelled = cancelled or _never
+    hosts = list(_hosts(hosts))
+    found = set()
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(hosts)))) as executor:
+        futures = {}
+        for host in hosts:
+            futures[executor.submit(lambda host=host: not cancelled() and _connects(host, port, timeout))] = host
+        for future in as_completed(futures):
+            if future.result():
+                found.add(futures[future])
+            if cancelled():
+                for pending in futures:
+                    pending.cancel()
+                break
+    return [Candidate('Network', {'host': host, 'port': port}, "{0}:{1}".format(host, port))
+            for host in hosts if host in found]
+
+
+def serial_ports(vendors=None):
+    """ Names of the serial ports of this system, empty if :py:mod:`serial` is not installed
+
+    :param vendors: USB vendor ids, to list only the ports of USB devices of these vendors
+    """
+    try:
+        from serial.tools import list_ports
+    except ImportError:
+        return []
+    return sorted(port.device for port in list_ports.comports() if vendors is None or port.vid in vendors)
+
+
+def _answers_status(port, baudrate, timeout):
+    """ Ask for the real-time printer status at one baud rate """
+    import serial
+    try:
+        device = serial.Serial(port, baudrate=baudrate, timeout=timeout, write_timeout=timeout)
+    except (EnvironmentError, serial.SerialException, ValueError):
+        return None
+    try:
+        device.reset_input_buffer()
+        device.write(RT_STATUS_PRINTER)
+        answer = device.read(1)
+    except (EnvironmentError, serial.SerialException):
+        return None
+    finally:
+        device.close()
+    return bool(answer) and bytearray(answer)[0] & RT_FIXED_MASK == RT_FIXED_VALUE
+
+
+def _probe_port(port, baudrates, timeout, cancelled):
+    opened = False
+    for baudrate in baudrates:
+        if cancelled():
+            break
+        answered = _answers_status(port, baudrate, timeout)
+        if answered is None:
+            # the port can not be opened, other baud rates will not help
+            break
+        opened = True
+        if answered:
+            return Candidate('Serial', {'devfile': port, 'baudrate': baudrate},
+                             "{0} at {1} baud".format(port, baudrate))
+    if opened:
+        return Candidate('Serial', {'devfile': port}, "{0} (no answer)".format(port))
+    return None
+
+
+def probe_serial(ports=None, baudrates=DEFAULT_BAUDRATES, timeout=0.3, answered_only=False, cancelled=None):
+    """ Find serial ports with a printer
+
+    Every port is probed in its own thread: it is opened at each baud rate in turn and asked for the real-time
+    printer status (``DLE EOT 1``), until a valid status byte comes back.
+
+    Writing to a port that another device is attached to, like a modem, a UPS or a microcontroller, can confuse
+    that device. Without `ports`, only the ports of USB adapters of :py:data:`KNOWN_VENDORS` are probed, the other
+    ports are listed without being opened.
+
+    :param ports: names of the ports to probe, e.g. the ones the user selected
+    :param baudrates: baud rates to try, in this order
+    :param timeout: seconds to wait for the answer at each baud rate
+    :param answered_only: leave out ports that could be opened but did not answer, e.g. printers without status
+        support
+    :param cancelled: callable returning True when the scan should stop
+    :returns: list of :py:class:`Candidate` with ``devfile`` and, if the printer answered, ``baudrate``; the ports
+        that were not probed come last
+    """
+    cancelled = cancelled or _never
+    unprobed = []
+    if ports is None:
+        ports = serial_ports(KNOWN_VENDORS)
+        if not answered_only:
+            unprobed = [Candidate('Serial', {'devfile': port}, "{0} (not probed)".format(port))
+                        for port in serial_ports() if port not in ports]
+    else:
+        ports = list(ports)
+    if not ports:
+        return unprobed
+    with ThreadPoolExecutor(max_workers=len(ports)) as executor:
+        results = list(executor.map(lambda port: _probe_port(port, baudrates, timeout, cancelled), ports))
+    return [candidate for candidate in results
+            if candidate is not None and (not answered_only or 'baudrate' in candidate.params)] + unprobed
+
+
+def discover(hosts=None, port=DEFAULT_PORT, usb=True, network=True, serial=True, on_found=None, cancelled=None,
+             timeout=0.5):
+    """ Run all probes at the same time
+
+    :param hosts: hosts and networks to scan, see :py:func:`probe_network`
+    :param port: TCP port of network printers
+    :param usb: list USB devices
+    :param network: scan `hosts`
+    :param serial: probe the serial ports of printers, see :py:func:`probe_serial`
+    :param on_found: callable that is called with the list of candidates of every probe as soon as it is done,
+        from the thread of the probe
+    :param cancelled: callable returning True when the scan should stop
+    :param timeout: connect timeout of the network probe and answer timeout of the serial probe in seconds
+    :returns: list of :py:class:`Candidate`, USB devices first, then network and serial ones
+    """
+    probes = []
+    if usb:
+        probes.append(lambda: find_usb(cancelled=cancelled))
+    if network:
+        probes.append(lambda: probe_network(hosts, port, timeout, cancelled=cancelled))
+    if serial:
+        probes.append(lambda: probe_serial(timeout=timeout, cancelled=cancelled))
+    results = [[] for _ in probes]
+    lock = threading.Lock()
+
+    def run(index):
+        found = probes[index]()
+        with lock:
+            results[index] = found
+        if on_found is not None and found:
+            on_found(found)
+
+    threads = [threading.Thread(target=run, args=(index,), name="escpos-discover-{0}".format(index))
+               for index in range(len(probes))]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return [candidate for found in results for candidate in found]
@@ -0,0 +1,646 @@
+""" ESC/POS emulator
+
+This module contains :py:class:`Emulator`, which renders an ESC/POS byte stream to a picture of the receipt. It
+covers what :py:class:`~escpos.escpos.Escpos` sends: text with alignment, emphasis, underline, inversion, fonts and
+sizes, the three image formats, barcodes (drawn as a stand-in pattern with the human readable text), native QR codes,
+user-defined characters, page mode and cuts. Other commands are skipped.
+
+The printer state is passed in and returned, so a stream can be rendered in independent parts:
+
+.. code-block:: Python
+
+    emulator = Emulator(paper_width=384)
+    strip, state = emulator.render(first_part)
+    next_strip, state = emulator.render(second_part, state)
+
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import collections
+
+from PIL import Image, ImageChops, ImageDraw, ImageFont, ImageOps
+
+from .constants import FONT_CELLS
+
+# Printer state kept between two renderings
+EmulatorState = collections.namedtuple('EmulatorState', [
+    'align',          # 0 left, 1 center, 2 right
+    'bold',
+    'underline',      # 0, 1 or 2 dots
+    'invert',
+    'font',           # 0 font A, 1 font B
+    'width',          # character width multiplier
+    'height',         # character height multiplier
+    'line_spacing',   # dots, None for the default
+    'barcode_height',
+    'barcode_width',
+    'barcode_hri',    # 0 none, 1 above, 2 below, 3 both
+    'qr_size',
+    'user_chars',     # user-defined character set selected
+])
+
+DEFAULT_STATE = EmulatorState(align=0, bold=False, underline=0, invert=False, font=0, width=1, height=1,
+                              line_spacing=None, barcode_height=162, barcode_width=3, barcode_hri=0, qr_size=3,
+                              user_chars=False)
+
+# Keys of FONT_CELLS by the font number of the state
+FONT_NAMES = 'ab'
+DEFAULT_LINE_SPACING = 30
+TAB_WIDTH = 8
+# Print area of page mode until it is set with ESC W
+DEFAULT_PAGE_HEIGHT = 1662
+
+ESC = 0x1b
+GS = 0x1d
+DLE = 0x10
+FS = 0x1c
+
+# Number of parameter bytes of the ESC and GS commands that are skipped
+ESC_ARGUMENTS = {
+    b'!'[0]: 1, b' '[0]: 1, b'$'[0]: 2, b'%'[0]: 1, b'2'[0]: 0, b'3'[0]: 1, b'='[0]: 1, b'?'[0]: 1, b'@'[0]: 0,
+    b'A'[0]: 1, b'+'[0]: 1, b'E'[0]: 1, b'G'[0]: 1, b'J'[0]: 1, b'L'[0]: 0, b'M'[0]: 1, b'R'[0]: 1, b'S'[0]: 0,
+    b'T'[0]: 1, b'U'[0]: 1, b'V'[0]: 1, b'W'[0]: 8, b'\\'[0]: 2, b'a'[0]: 1, b'd'[0]: 1, b'e'[0]: 1, b'i'[0]: 0,
+    b'm'[0]: 0, b'p'[0]: 3, b'r'[0]: 1, b't'[0]: 1, b'u'[0]: 1, b'v'[0]: 0, b'{'[0]: 1, b'-'[0]: 1, 0x0c: 0,
+}
+GS_ARGUMENTS = {
+    b'!'[0]: 1, b'$'[0]: 2, b'/'[0]: 1, b':'[0]: 0, b'B'[0]: 1, b'H'[0]: 1, b'I'[0]: 1, b'L'[0]: 2, b'P'[0]: 2,
+    b'W'[0]: 2, b'\\'[0]: 2, b'^'[0]: 3, b'a'[0]: 1, b'b'[0]: 1, b'f'[0]: 1, b'h'[0]: 1, b'r'[0]: 1, b'w'[0]: 1,
+}
+
+
+def _font(size):
+    """ A monospaced TrueType font if one is installed, the default font of PIL otherwise """
+    for name in ('DejaVuSansMono.ttf', 'LiberationMono-Regular.ttf', 'cour.ttf', 'Courier New.ttf'):
+        try:
+            return ImageFont.truetype(name, size)
+        except (IOError, OSError):
+            pass
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        # older PIL without scalable default font
+        return ImageFont.load_default()
+
+
+def _bits_to_image(data, width_bytes, height):
+    """ Convert 1-bit raster data (set bits are dots) to a greyscale image with black dots """
+    im = Image.frombytes('1', (width_bytes * 8, height), bytes(data[:width_bytes * height]))
+    return ImageOps.invert(im.convert('L'))
+
+
+class _PageArea(object):
+    """ The buffer of page mode: images at absolute positions, printed together """
+
+    def __init__(self, width):
+        self.width = width
+        # list of (x, y, image) in dots from the top left of the page
+        self.items = []
+        self.set_area(0, 0, width, DEFAULT_PAGE_HEIGHT)
+
+    def set_area(self, x, y, width, height):
+        self.area = (x, min(y, DEFAULT_PAGE_HEIGHT), min(width, self.width - x), min(height, DEFAULT_PAGE_HEIGHT))
+        # position within the area, `y` is the baseline, None until it is set or a line is printed
+        self.x = 0
+        self.y = None
+
+    def put(self, im, x, y):
+        """ Place an image with its top left at `x`, `y` of the area, clipped to the area """
+        area_x, area_y, area_width, area_height = self.area
+        box = (max(0, -x), max(0, -y), min(im.width, area_width - x), min(im.height, area_height - y))
+        if box[0] < box[2] and box[1] < box[3]:
+            self.items.append((area_x + max(0, x), area_y + max(0, y), im.crop(box)))
+
+    def image(self):
+        height = max([y + im.height for x, y, im in self.items] or [0])
+        page = Image.new('L', (self.width, height), 255)
+        for x, y, im in self.items:
+            # overlapping cells must not blank each other
+            box = (x, y, x + im.width, y + im.height)
+            page.paste(ImageChops.darker(page.crop(box), im), box)
+        return page
+
+
+class _Page(object):
+    """ The receipt while it is rendered """
+
+    def __init__(self, emulator, state):
+        self.emulator = emulator
+        self.state = state
+        self.rows = []
+        # pending line: list of (x, image) and its current width
+        self.line = []
+        self.line_width = 0
+        # buffer of page mode, None in standard mode
+        self.page_area = None
+
+    def add_row(self, im):
+        self.rows.append(im)
+
+    def feed(self, dots):
+        if dots > 0:
+            self.add_row(Image.new('L', (self.emulator.paper_width, dots), 255))
+
+    def _place(self, im):
+        """ Put an image that fills a line of its own at the current alignment """
+        width = self.emulator.paper_width
+        if im.width > width:
+            im = im.crop((0, 0, width, im.height))
+        row = Image.new('L', (width, im.height), 255)
+        row.paste(im, (self._offset(im.width), 0))
+        self.add_row(row)
+
+    def _offset(self, used):
+        free = max(0, self.emulator.paper_width - used)
+        return (0, free // 2, free)[self.state.align] if self.state.align in (0, 1, 2) else 0
+
+    def inline(self, im):
+        """ Add a character or column image to the pending line """
+        area = self.page_area
+        if area is not None:
+            if area.y is None:
+                area.y = im.height
+            area.put(im, area.x, area.y - im.height)
+            area.x += im.width
+            return
+        if self.line_width + im.width > self.emulator.paper_width and self.line:
+            self.newline()
+        self.line.append(im)
+        self.line_width += im.width
+
+    def newline(self):
+        """ Print the pending line and advance """
+        spacing = self.state.line_spacing
+        if spacing is None:
+            spacing = DEFAULT_LINE_SPACING
+        area = self.page_area
+        if area is not None:
+            area.x = 0
+            area.y = (spacing if area.y is None else area.y) + spacing
+            return
+        if not self.line:
+            self.feed(spacing)
+            return
+        height = max(im.height for im in self.line)
+        row = Image.new('L', (self.emulator.paper_width, max(height, spacing)), 255)
+        x = self._offset(self.line_width)
+        for im in self.line:
+            # characters of different sizes share the baseline
+            row.paste(im, (x, height - im.height))
+            x += im.width
+        self.add_row(row)
+        self.line = []
+        self.line_width = 0
+
+    def flush_line(self):
+        if self.line:
+            self.newline()
+
+    def block(self, im):
+        """ Print an image on its own, like raster images and 2D codes """
+        area = self.page_area
+        if area is not None:
+            # in page mode it stands on the baseline
+            area.put(im, area.x, (im.height if area.y is None else area.y) - im.height)
+            return
+        self.flush_line()
+        self._place(im)
+
+    def cut(self):
+        if self.page_area is not None:
+            return
+        self.flush_line()
+        row = Image.new('L', (self.emulator.paper_width, 9), 255)
+        draw = ImageDraw.Draw(row)
+        for x in range(0, self.emulator.paper_width, 8):
+            draw.line((x, 4, x + 4, 4), fill=128)
+        self.add_row(row)
+
+    def enter_page_mode(self):
+        self.flush_line()
+        self.page_area = _PageArea(self.emulator.paper_width)
+
+    def print_page(self, leave=True):
+        """ Print the page of page mode, and go back to standard mode with `leave` """
+        area = self.page_area
+        if area is None:
+            return
+        im = area.image()
+        if im.height:
+            self.add_row(im)
+        if leave:
+            self.page_area = None
+
+    def image(self):
+        self.print_page()
+        width = self.emulator.paper_width
+        height = sum(row.height for row in self.rows)
+        im = Image.new('L', (width, height), 255)
+        y = 0
+        for row in self.rows:
+            im.paste(row, (0, y))
+            y += row.height
+        return im
+
+
+class Emulator(object):
+    """ Renders ESC/POS data to a greyscale picture of the receipt """
+
+    def __init__(self, paper_width=384):
+        """
+        :param paper_width: printable width in dots, 384 for 58 mm and 576 for 80 mm paper
+        """
+        self.paper_width = paper_width
+        self._fonts = {}
+        self._glyphs = {}
+        # data stored in the printer by one command and printed by another one
+        self._stored_graphics = None
+        self._stored_qr = None
+        # graphics stored by key code, by define function and key
+        self._key_graphics = {}
+        # user-defined characters by font and code
+        self._user_chars = {}
+
+    def _glyph(self, char, state):
+        """ Image of one character cell in the style of `state` """
+        key = (char, state.bold, state.underline, state.invert, state.font, state.width, state.height)
+        glyph = self._glyphs.get(key)
+        if glyph is not None:
+            return glyph
+        cell_width, cell_height = FONT_CELLS[FONT_NAMES[state.font]]
+        font = self._fonts.get(state.font)
+        if font is None:
+            font = self._fonts[state.font] = _font(cell_height * 3 // 4)
+        glyph = Image.new('L', (cell_width, cell_height), 255)
+        draw = ImageDraw.Draw(glyph)
+        if char.strip():
+            left, top, right, bottom = draw.textbbox((0, 0), char, font=font)
+            x = (cell_width - (right - left)) // 2 - left
+            y = (cell_height - (bottom - top)) // 2 - top
+            draw.text((x, y), char, font=font, fill=0)
+            if state.bold:
+                draw.text((x + 1, y), char, font=font, fill=0)
+        if state.underline:
+            draw.rectangle((0, cell_height - state.underline, cell_width, cell_height - 1), fill=0)
+        if state.invert:
+            glyph = ImageOps.invert(glyph)
+        if state.width != 1 or state.height != 1:
+            glyph = glyph.resize((cell_width * state.width, cell_height * state.height), Image.NEAREST)
+        self._glyphs[key] = glyph
+        return glyph
+
+    def _user_char(self, char, state):
+        """ Image of a user-defined character in the style of `state` """
+        cell_width, cell_height = FONT_CELLS[FONT_NAMES[state.font]]
+        glyph = Image.new('L', (cell_width, cell_height), 255)
+        glyph.paste(char.crop((0, 0, min(char.width, cell_width), cell_height)), (0, 0))
+        if state.invert:
+            glyph = ImageOps.invert(glyph)
+        if state.width != 1 or state.height != 1:
+            glyph = glyph.resize((cell_width * state.width, cell_height * state.height), Image.NEAREST)
+        return glyph
+
+    def _text(self, page, data):
+        if page.state.user_chars:
+            start = 0
+            for index, code in enumerate(data):
+                char = self._user_chars.get((page.state.font, code))
+                if char is not None:
+                    if start < index:
+                        self._text(page, data[start:index])
+                    page.inline(self._user_char(char, page.state))
+                    start = index + 1
+            data = data[start:]
+        try:
+            text = bytes(data).decode('utf-8')
+        except UnicodeDecodeError:
+            text = bytes(data).decode('cp437')
+        for char in text:
+            page.inline(self._glyph(char, page.state))
+
+    def _barcode(self, page, code):
+        """ Stand-in for a barcode: bars from the bits of the data, framed by start and stop bars """
+        state = page.state
+        module = max(1, state.barcode_width)
+        bits = '101' + ''.join('{0:08b}'.format(byte) for byte in bytearray(code)) + '101'
+        bars = Image.new('L', (len(bits) * module, max(1, state.barcode_height)), 255)
+        draw = ImageDraw.Draw(bars)
+        for index, bit in enumerate(bits):
+            if bit == '1':
+                draw.rectangle((index * module, 0, (index + 1) * module - 1, bars.height - 1), fill=0)
+        hri = bytes(code).decode('ascii', 'replace')
+        area = page.page_area
+        if area is not None:
+            # the bars stand on the baseline, the text goes above and below them
+            x, y = area.x, bars.height if area.y is None else area.y
+            page.block(bars)
+            lines = ((1, 3), y - bars.height - 2), ((2, 3), y + FONT_CELLS['a'][1] + 2)
+            for modes, baseline in lines:
+                if state.barcode_hri in modes:
+                    area.x, area.y = x, baseline
+                    self._hri(page, hri)
+            area.x, area.y = x, y
+            return
+        if state.barcode_hri in (1, 3):
+            self._hri(page, hri)
+        page.block(bars)
+        if state.barcode_hri in (2, 3):
+            self._hri(page, hri)
+
+    def _hri(self, page, text):
+        line_state = page.state
+        page.state = line_state._replace(width=1, height=1, bold=False, underline=0, invert=False)
+        self._text(page, text.encode('ascii', 'replace'))
+        page.flush_line()
+        page.state = line_state
+
+    def _qr(self, page, content):
+        try:
+            import qrcode
+        except ImportError:
+            page.block(Image.new('L', (page.state.qr_size * 25,) * 2, 0))
+            return
+        code = qrcode.QRCode(box_size=page.state.qr_size, border=0)
+        code.add_data(bytes(content))
+        code.make(fit=True)
+        page.block(code.make_image()._img.convert('L'))
+
+    def render(self, data, state=None):
+        """ Render a part of an ESC/POS stream
+
+        A line that is not finished at the end of `data` is printed, as if a line feed followed.
+
+        :param data: the ESC/POS data, bytes-like
+        :param state: printer state at the start of `data`, defaults to the state after initialization
+        :returns: tuple of the image (mode ``L``, the width of the paper, height 0 if nothing is printed) and the
+            printer state at the end
+        """
+        page = _Page(self, state or DEFAULT_STATE)
+        data = memoryview(data).cast('B') if not isinstance(data, (bytes, bytearray)) else data
+        size = len(data)
+        i = 0
+        text_start = None
+
+        def end_text(i):
+            if text_start is not None:
+                self._text(page, data[text_start:i])
+            return None
+
+        while i < size:
+            byte = data[i]
+            if byte >= 0x20:
+                if text_start is None:
+                    text_start = i
+                i += 1
+                continue
+            text_start = end_text(i)
+            if byte == 0x0a:
+                page.newline()
+                i += 1
+            elif byte == 0x09:
+                cell = FONT_CELLS[FONT_NAMES[page.state.font]][0] * page.state.width * TAB_WIDTH
+                pad = cell - page.line_width % cell
+                page.inline(Image.new('L', (pad, 1), 255))
+                i += 1
+            elif byte == 0x0c:
+                if page.page_area is not None:
+                    page.print_page()
+                else:
+                    page.flush_line()
+                i += 1
+            elif byte == 0x18 and page.page_area is not None:
+                # CAN discards the page
+                page.page_area.items = []
+                i += 1
+            elif byte == ESC and i + 1 < size:
+                i = self._esc(page, data, i + 1)
+            elif byte == GS and i + 1 < size:
+                i = self._gs(page, data, i + 1)
+            elif byte == DLE and i + 1 < size:
+                # DLE EOT n, DLE ENQ n and DLE DC4 fn m t
+                i += 3 if data[i + 1] != 0x14 else 5
+            elif byte == FS and i + 1 < size:
+                i += 4 if data[i + 1] == b'p'[0] else 2
+            else:
+                i += 1
+        end_text(size)
+        page.flush_line()
+        return page.image(), page.state
+
+    def _esc(self, page, data, i):
+        """ Handle ESC commands, `i` points at the command byte; returns the index after the command """
+        size = len(data)
+        command = data[i]
+        arg = data[i + 1] if i + 1 < size else 0
+        state = page.state
+        if command == b'@'[0]:
+            page.page_area = None
+            page.flush_line()
+            page.state = DEFAULT_STATE
+            self._user_chars.clear()
+        elif command == b'a'[0]:
+            page.state = state._replace(align=arg % 48 if arg >= 48 else arg)
+        elif command in (b'E'[0], b'G'[0]):
+            page.state = state._replace(bold=bool(arg & 1))
+        elif command == b'-'[0]:
+            page.state = state._replace(underline=arg % 48 if arg >= 48 else arg)
+        elif command == b'M'[0]:
+            page.state = state._replace(font=1 if arg in (1, 49) else 0)
+        elif command == b'!'[0]:
+            page.state = state._replace(font=arg & 1, bold=bool(arg & 8), height=2 if arg & 16 else 1,
+                                        width=2 if arg & 32 else 1, underline=1 if arg & 128 else 0)
+        elif command == b'2'[0]:
+            page.state = state._replace(line_spacing=None)
+        elif command == b'3'[0]:
+            page.state = state._replace(line_spacing=arg)
+        elif command == b'A'[0]:
+            page.state = state._replace(line_spacing=arg * 3)
+        elif command == b'+'[0]:
+            page.state = state._replace(line_spacing=arg // 2)
+        elif command == b'd'[0]:
+            page.flush_line()
+            page.feed(arg * (state.line_spacing or DEFAULT_LINE_SPACING))
+        elif command == b'J'[0]:
+            page.flush_line()
+            page.feed(arg)
+        elif command == b'*'[0]:
+            return self._column_image(page, data, i + 1)
+        elif command == b'D'[0]:
+            # tab positions, NUL terminated
+            end = bytes(data[i + 1:]).find(b'\0')
+            return size if end < 0 else i + end + 2
+        elif command == b'c'[0]:
+            return i + 3
+        elif command == b'&'[0]:
+            # user-defined characters: y c1 c2, then x and y * x bytes per character
+            if i + 3 >= size:
+                return size
+            height, first, last = data[i + 1], data[i + 2], data[i + 3]
+            j = i + 4
+            for code in range(first, last + 1):
+                if j >= size:
+                    break
+                width = data[j]
+                # every column is a row of the transposed image
+                self._user_chars[(state.font, code)] = _bits_to_image(
+                    data[j + 1:j + 1 + height * width], height, width).transpose(Image.TRANSPOSE)
+                j += 1 + height * width
+            return j
+        elif command == b'%'[0]:
+            page.state = state._replace(user_chars=bool(arg & 1))
+        elif command == b'?'[0]:
+            self._user_chars.pop((state.font, arg), None)
+        elif command == b'L'[0]:
+            page.enter_page_mode()
+        elif command == b'S'[0]:
+            page.page_area = None
+        elif command == 0x0c:
+            page.print_page(leave=False)
+        elif command == b'W'[0] and page.page_area is not None and i + 8 < size:
+            page.page_area.set_area(*(data[index] + (data[index + 1] << 8) for index in range(i + 1, i + 9, 2)))
+        elif command == b'$'[0] and i + 2 < size:
+            position = arg + (data[i + 2] << 8)
+            if page.page_area is not None:
+                page.page_area.x = position
+            elif position > page.line_width:
+                page.inline(Image.new('L', (position - page.line_width, 1), 255))
+        elif command in (b'i'[0], b'm'[0]):
+            page.cut()
+        return i + 1 + ESC_ARGUMENTS.get(command, 1)
+
+    def _gs(self, page, data, i):
+        """ Handle GS commands, `i` points at the command byte; returns the index after the command """
+        size = len(data)
+        command = data[i]
+        arg = data[i + 1] if i + 1 < size else 0
+        state = page.state
+        if command == b'!'[0]:
+            page.state = state._replace(width=(arg >> 4) + 1, height=(arg & 0x0f) + 1)
+        elif command == b'B'[0]:
+            page.state = state._replace(invert=bool(arg & 1))
+        elif command == b'h'[0]:
+            page.state = state._replace(barcode_height=arg)
+        elif command == b'w'[0]:
+            page.state = state._replace(barcode_width=arg)
+        elif command == b'H'[0]:
+            page.state = state._replace(barcode_hri=arg % 48 if arg >= 48 else arg)
+        elif command == b'$'[0] and page.page_area is not None and i + 2 < size:
+            page.page_area.y = arg + (data[i + 2] << 8)
+        elif command == b'V'[0]:
+            page.cut()
+            return i + 3 if arg in (65, 66, 97, 98, 103, 104) else i + 2
+        elif command == b'k'[0]:
+            if arg <= 6:
+                end = bytes(data[i + 2:]).find(b'\0')
+                end = size if end < 0 else i + 2 + end
+                self._barcode(page, data[i + 2:end])
+                return end + 1
+            length = data[i + 2] if i + 2 < size else 0
+            self._barcode(page, data[i + 3:i + 3 + length])
+            return i + 3 + length
+        elif command == b'v'[0] and arg == b'0'[0]:
+            return self._raster_image(page, data, i + 2)
+        elif command == b'('[0]:
+            length = data[i + 2] + (data[i + 3] << 8) if i + 3 < size else 0
+            start = i + 4
+            if arg == b'k'[0]:
+                self._2d_code(page, data[start:start + length])
+            elif arg == b'L'[0]:
+                self._graphics(page, data[start:start + length])
+            return start + length
+        elif command == b'8'[0] and arg == b'L'[0]:
+            length = 0
+            for shift, index in enumerate(range(i + 2, i + 6)):
+                if index < size:
+                    length += data[index] << (8 * shift)
+            start = i + 6
+            self._graphics(page, data[start:start + length])
+            return start + length
+        return i + 1 + GS_ARGUMENTS.get(command, 1)
+
+    def _raster_image(self, page, data, i):
+        """ GS v 0 m xL xH yL yH d1...dk """
+        if i + 5 > len(data):
+            return len(data)
+        mode = data[i]
+        width_bytes = data[i + 1] + (data[i + 2] << 8)
+        height = data[i + 3] + (data[i + 4] << 8)
+        start = i + 5
+        end = start + width_bytes * height
+        im = _bits_to_image(data[start:end], width_bytes, height)
+        scale_x = 2 if mode & 1 else 1
+        scale_y = 2 if mode & 2 else 1
+        if scale_x != 1 or scale_y != 1:
+            im = im.resize((im.width * scale_x, im.height * scale_y), Image.NEAREST)
+        page.block(im)
+        return end
+
+    def _column_image(self, page, data, i):
+        """ ESC * m nL nH d1...dk, a line of 8 or 24 dots high columns """
+        if i + 3 > len(data):
+            return len(data)
+        mode = data[i]
+        width = data[i + 1] + (data[i + 2] << 8)
+        column_bytes = 3 if mode >= 32 else 1
+        start = i + 3
+        end = start + width * column_bytes
+        # every column is a row of the transposed image
+        im = _bits_to_image(data[start:end], column_bytes, width).transpose(Image.TRANSPOSE)
+        scale_x = 1 if mode & 1 else 2
+        scale_y = 1 if column_bytes == 3 else 3
+        if scale_x != 1 or scale_y != 1:
+            im = im.resize((im.width * scale_x, im.height * scale_y), Image.NEAREST)
+        page.inline(im)
+        return end
+
+    def _graphics(self, page, payload):
+        """ GS ( L and GS 8 L: m fn [parameters] """
+        if len(payload) < 2:
+            return
+        fn = payload[1]
+        if fn == 112 and len(payload) >= 10:
+            # store raster graphics in the print buffer: a bx by c xL xH yL yH d1...dk
+            bx, by = payload[3], payload[4]
+            width = payload[6] + (payload[7] << 8)
+            height = payload[8] + (payload[9] << 8)
+            width_bytes = (width + 7) >> 3
+            im = _bits_to_image(payload[10:], width_bytes, height).crop((0, 0, width, height))
+            if bx != 1 or by != 1:
+                im = im.resize((im.width * max(1, bx), im.height * max(1, by)), Image.NEAREST)
+            self._stored_graphics = im
+        elif fn == 50:
+            im = self._stored_graphics
+            if im is not None:
+                page.block(im)
+                self._stored_graphics = None
+        elif fn in (67, 83) and len(payload) >= 11:
+            # define NV or download graphics: a kc1 kc2 b xL xH yL yH c d1...dk
+            width = payload[6] + (payload[7] << 8)
+            height = payload[8] + (payload[9] << 8)
+            im = _bits_to_image(payload[11:], (width + 7) >> 3, height).crop((0, 0, width, height))
+            self._key_graphics[(fn, bytes(payload[3:5]))] = im
+        elif fn in (69, 85) and len(payload) >= 6:
+            # print NV or download graphics: kc1 kc2 x y
+            im = self._key_graphics.get((fn - 2, bytes(payload[2:4])))
+            if im is not None:
+                scale_x, scale_y = max(1, payload[4]), max(1, payload[5])
+                if scale_x != 1 or scale_y != 1:
+                    im = im.resize((im.width * scale_x, im.height * scale_y), Image.NEAREST)
+                page.block(im)
+
+    def _2d_code(self, page, payload):
+        """ GS ( k: cn fn [parameters], only QR codes are drawn """
+        if len(payload) < 2 or payload[0] != 49:
+            return
+        fn = payload[1]
+        if fn == 67 and len(payload) > 2:
+            page.state = page.state._replace(qr_size=payload[2])
+        elif fn == 80:
+            self._stored_qr = bytes(payload[3:])
+        elif fn == 81:
+            content = self._stored_qr
+            if content:
+                self._qr(page, content)
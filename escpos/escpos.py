@@ -15,14 +15,16 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
-import qrcode
+import contextlib
+import os
 import textwrap
+import threading
+import time
 
 from .constants import *
 from .exceptions import *
 
 from abc import ABCMeta, abstractmethod  # abstract base class support
-from escpos.image import EscposImage
 
 
 @six.add_metaclass(ABCMeta)
@@ -34,12 +36,24 @@ class Escpos(object):
     """
     device = None
     codepage = None
+    instrumentation = None
+    profiler = None
+    status_poller = None
 
     def __init__(self, columns=32):
         """ Initialize ESCPOS Printer
 
         :param columns: Text columns used by the printer. Defaults to 32."""
         self.columns = columns
+        # held while data is written, real-time status queries are only sent while it is free
+        self.transport_lock = threading.RLock()
+        # held while the answers to status queries are read
+        self._status_lock = threading.Lock()
+        if os.environ.get('ESCPOS_PROFILE'):
+            from .profiling import profiler_from_environment
+            profiler = profiler_from_environment()
+            if profiler is not None:
+                self.start_profiling(profiler)
 
     def __del__(self):
         """ call self.close upon deletion """
@@ -56,6 +70,218 @@ class Escpos(object):
         """
         pass
 
+    def _read(self, timeout=0):
+        """ Reads data sent back by the printer
+
+        This function has to be implemented by the implementations that can read from the device. It must not wait
+        longer than `timeout` seconds and returns an empty byte string if nothing was received.
+
+        :param timeout: maximum time to wait for data in seconds
+        :rtype: bytes
+        """
+        raise NotImplementedError()
+
+    @contextlib.contextmanager
+    def job(self):
+        """ Keep real-time status queries out of a job
+
+        Every `_raw()` call holds the transport lock on its own. Data that is split over several calls, like a job
+        sent in chunks, is sent within this context, so the `DLE EOT` of a status query can not end up inside a
+        command.
+
+        .. code-block:: Python
+
+            with printer.job():
+                for chunk in chunks:
+                    printer._raw(chunk)
+        """
+        with self.transport_lock:
+            yield self
+
+    def instrument(self, instrumentation=None):
+        """ Record size, duration and command category of every `_raw()` call
+
+        Uninstrumented printers pay nothing; the wrappers are only installed by this method.
+
+        :param instrumentation: collector to use, by default a new
+            :py:class:`~escpos.instrument.Instrumentation` is created
+        :returns: the collector
+        """
+        from . import instrument
+        self.uninstrument()
+        if instrumentation is None:
+            instrumentation = instrument.Instrumentation(type(self).__name__)
+        instrument.attach(self, instrumentation)
+        self.instrumentation = instrumentation
+        return instrumentation
+
+    def uninstrument(self):
+        """ Remove the instrumentation installed with :py:meth:`instrument` """
+        if self.instrumentation is not None:
+            from . import instrument
+            instrument.detach(self, self.instrumentation)
+            self.instrumentation = None
+
+    def start_profiling(self, profiler=None):
+        """ Measure time, output and allocations of every command call
+
+        See :py:mod:`escpos.profiling`.
+
+        :param profiler: profiler to use, by default a new :py:class:`~escpos.profiling.Profiler` is created
+        :returns: the profiler
+        """
+        from .profiling import Profiler
+        self.stop_profiling()
+        if profiler is None:
+            profiler = Profiler()
+        profiler.attach(self)
+        self.profiler = profiler
+        return profiler
+
+    def stop_profiling(self):
+        """ Remove the profiler installed with :py:meth:`start_profiling` """
+        if self.profiler is not None:
+            self.profiler.detach(self)
+            self.profiler = None
+
+    def replay(self, job_file, progress=None, segment_size=1024 * 1024):
+        """ Send a pre-rendered job file to the printer
+
+        The file is sent in segments of `segment_size` bytes. Transports that can do so send the segments straight
+        from the page cache without copying them into Python.
+
+        :param job_file: path of the file with the raw ESC/POS data
+        :param progress: optional callable, called as ``progress(sent, total)`` after every segment
+        :param segment_size: number of bytes sent between two progress callbacks
+        :returns: number of bytes sent
+        """
+        with open(job_file, 'rb') as job, self.job():
+            total = os.fstat(job.fileno()).st_size
+            sent = 0
+            while sent < total:
+                count = min(segment_size, total - sent)
+                end = sent + count
+                while sent < end:
+                    written = self._send_file_segment(job, sent, end - sent)
+                    if not written:
+                        raise IOError("Job file {0} was truncated while sending".format(job_file))
+                    sent += written
+                if progress is not None:
+                    progress(sent, total)
+        return sent
+
+    def _send_file_segment(self, job, offset, count):
+        """ Send a part of an open job file
+
+        The default implementation reads the data and passes it to :py:meth:`_raw`.
+
+        :param job: the job file, opened in binary mode
+        :param offset: position of the first byte to send
+        :param count: maximum number of bytes to send
+        :returns: number of bytes sent
+        """
+        job.seek(offset)
+        data = job.read(count)
+        if data:
+            self._raw(data)
+        return len(data)
+
+    def query_status(self, mode, timeout=1):
+        """ Query the printer for its real-time status
+
+        Sends one of the `RT_STATUS_*` commands from :py:mod:`escpos.constants` and returns the status byte the
+        printer answers with. Real-time commands are processed by the printer even when it is offline or busy.
+
+        While a :py:class:`~escpos.status.StatusPoller` runs, the query is answered through it, as it is the only
+        reader of the device. The query waits for a running job, see :py:meth:`job`.
+
+        :param mode: one of `RT_STATUS_PRINTER`, `RT_STATUS_OFFLINE`, `RT_STATUS_ERROR` or `RT_STATUS_PAPER`
+        :param timeout: time to wait for the answer in seconds
+        :returns: the status byte as integer, or None if the printer did not answer in time
+        """
+        poller = self.status_poller
+        if poller is not None and poller is not threading.current_thread():
+            return poller.query_status(mode, timeout)
+        return self._query_status(mode, timeout)
+
+    def _query_status(self, mode, timeout=1):
+        """ Send a real-time status query between two jobs and read the answer """
+        values = self._query_statuses([mode], timeout)
+        return values[0] if values else None
+
+    def _query_statuses(self, modes, timeout=1, wait=True):
+        """ Send real-time status queries between two jobs and read the answers
+
+        The queries are sent with a single write while no job is written. The answers are read without holding
+        the transport, so a job that starts meanwhile is not held up.
+
+        :param modes: `RT_STATUS_*` commands
+        :param timeout: time to wait for the transport and the answers in seconds
+        :param wait: wait for a running job, otherwise give up at once when the transport is busy
+        :returns: list of the status bytes that arrived in time, in the order of `modes`, or None if the queries
+            were not sent
+        """
+        deadline = time.time() + timeout
+        if not self._status_lock.acquire(True, timeout if wait else 0):
+            return None
+        try:
+            if not self.transport_lock.acquire(True, max(0, deadline - time.time()) if wait else 0):
+                return None
+            try:
+                self._raw(b''.join(modes))
+            finally:
+                self.transport_lock.release()
+            values = []
+            while len(values) < len(modes):
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                values.extend(value for value in six.iterbytes(self._read(remaining))
+                              if value & RT_FIXED_MASK == RT_FIXED_VALUE)
+            return values[:len(modes)]
+        finally:
+            self._status_lock.release()
+
+    def is_online(self, timeout=1):
+        """ Query the online status of the printer
+
+        :param timeout: time to wait for the answer in seconds
+        :returns: True if online, False if offline, None if the printer did not answer in time
+        """
+        status = self.query_status(RT_STATUS_PRINTER, timeout)
+        if status is None:
+            return None
+        return not status & RT_MASK_OFFLINE
+
+    def paper_status(self, timeout=1):
+        """ Query the roll paper sensor of the printer
+
+        :param timeout: time to wait for the answer in seconds
+        :returns: 2 if there is enough paper, 1 if the paper is near its end, 0 if there is no paper, None if the
+            printer did not answer in time
+        """
+        status = self.query_status(RT_STATUS_PAPER, timeout)
+        if status is None:
+            return None
+        if status & RT_MASK_PAPER_END:
+            return 0
+        if status & RT_MASK_PAPER_NEAR_END:
+            return 1
+        return 2
+
+    def automatic_status_back(self, enable=True):
+        """ Enable or disable Automatic Status Back (ASB)
+
+        With ASB enabled the printer sends four status bytes on its own whenever its state changes, so the status
+        can be followed by only reading from the device. See :py:class:`escpos.status.StatusPoller`.
+
+        :param enable: True to enable ASB for all status types, False to disable it
+        """
+        if enable:
+            self._raw(ASB_ENABLE)
+        else:
+            self._raw(ASB_DISABLE)
+
     def image(self, img_source, high_density_vertical=True, high_density_horizontal=True, impl="bitImageRaster",
               fragment_height=1024):
         """ Print an image
@@ -73,14 +299,17 @@ class Escpos(object):
             * `graphics`: prints with the `GS ( L`-command
             * `bitImageColumn`: prints with the `ESC *`-command
 
-        :param img_source: PIL image or filename to load: `jpg`, `gif`, `png` or `bmp`
+        :param img_source: PIL image or filename to load: `jpg`, `gif`, `png` or `bmp`, or an
+            :py:class:`~escpos.image.EscposImage` that was converted before
         :param high_density_vertical: print in high density in vertical direction *default:* True
         :param high_density_horizontal: print in high density in horizontal direction *default:* True
         :param impl: choose image printing mode between `bitImageRaster`, `graphics` or `bitImageColumn`
         :param fragment_height: Images larger than this will be split into multiple fragments *default:* 1024
 
         """       
-        im = EscposImage(img_source)
+        # PIL is only loaded when the first image is printed
+        from .image import EscposImage
+        im = img_source if isinstance(img_source, EscposImage) else EscposImage(img_source)
 
         if im.height > fragment_height:
             fragments = im.split(fragment_height)
@@ -123,11 +352,16 @@ class Escpos(object):
     def _image_send_graphics_data(self, m, fn, data):
         """
         Wrapper for GS ( L, to calculate and send correct data length.
+
+        Data that does not fit the two length bytes of GS ( L is sent with GS 8 L, which has four.
         
         :param m: Modifier//variant for function. Usually '0'
         :param fn: Function number to use, as byte
         :param data: Data to send
         """
+        if len(data) + 2 > 0xffff:
+            self._raw(GS + b'8L' + self._int_low_high(len(data) + 2, 4) + m + fn + data)
+            return
         header = self._int_low_high(len(data) + 2, 2)
         self._raw(GS + b'(L' + header + m + fn + data)
 
@@ -158,6 +392,7 @@ class Escpos(object):
             # Map ESC/POS error correction levels to python 'qrcode' library constant and render to an image
             if model != QR_MODEL_2:
                 raise ValueError("Invalid QR model for qrlib rendering (must be QR_MODEL_2)")
+            import qrcode
             python_qr_ec = {
                 QR_ECLEVEL_H: qrcode.constants.ERROR_CORRECT_H,
                 QR_ECLEVEL_L: qrcode.constants.ERROR_CORRECT_L,
@@ -407,19 +642,21 @@ class Escpos(object):
                 function_type=function_type,
             ))
 
-        self._raw(bc_types[bc.upper()])
+        # the command is sent in one piece, so no real-time command can end up inside
+        command = bc_types[bc.upper()]
 
         if function_type.upper() == "B":
-            self._raw(six.int2byte(len(code)))
+            command += six.int2byte(len(code))
 
         # Print Code
         if code:
-            self._raw(code.encode())
+            command += code.encode()
         else:
             raise BarcodeCodeError()
 
         if function_type.upper() == "A":
-            self._raw(NUL)
+            command += NUL
+        self._raw(command)
 
     def text(self, txt):
         """ Print alpha-numeric text
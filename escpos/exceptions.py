@@ -14,6 +14,8 @@ Result/Exit codes:
     - `80` = Invalid char code :py:exc:`~escpos.exceptions.CharCodeError`
     - `90` = USB device not found :py:exc:`~escpos.exceptions.USBNotFoundError`
     - `100` = Set variable out of range :py:exc:`~escpos.exceptions.SetVariableError`
+    - `110` = Transfer failed after all retries :py:exc:`~escpos.exceptions.TransferError`
+    - `120` = A row could not be merged into a layout :py:exc:`~escpos.exceptions.MergeError`
     - `200` = Configuration not found :py:exc:`~escpos.exceptions.ConfigNotFoundError`
     - `210` = Configuration syntax error :py:exc:`~escpos.exceptions.ConfigSyntaxError`
     - `220` = Configuration section not found :py:exc:`~escpos.exceptions.ConfigSectionMissingError`
@@ -194,6 +196,40 @@ class SetVariableError(Error):
         return "Set variable out of range"
 
 
+class TransferError(Error):
+    """ A job could not be sent
+
+    The connection failed more often than the retry policy allows.
+    The returncode for this exception is `110`.
+    """
+    def __init__(self, msg=""):
+        Error.__init__(self, msg)
+        self.msg = msg
+        self.resultcode = 110
+
+    def __str__(self):
+        return "Transfer failed ({msg})".format(msg=self.msg)
+
+
+class MergeError(Error):
+    """ A row of a mail merge could not be rendered
+
+    A field used by the layout is missing in the row, or a command rejected the merged value.
+    The returncode for this exception is `120`.
+    """
+    def __init__(self, msg=""):
+        Error.__init__(self, msg)
+        self.msg = msg
+        self.resultcode = 120
+
+    def __str__(self):
+        return "Merge failed ({msg})".format(msg=self.msg)
+
+    def __reduce__(self):
+        # raised in worker processes, the message has to survive pickling
+        return (MergeError, (self.msg,))
+
+
 # Configuration errors
 
 class ConfigNotFoundError(Error):
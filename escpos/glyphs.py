@@ -0,0 +1,193 @@
+""" User-defined characters
+
+This module contains :py:class:`GlyphCache`, which prints glyphs that are missing from the code pages of a printer,
+like currency signs or brand marks, as user-defined characters (``ESC &``). A glyph is downloaded into a character
+slot of the printer on first use and printed as a single byte after that, instead of an image per occurrence.
+
+The printer has a limited number of slots. When all of them are taken, the glyph that was used least recently is
+replaced. ``ESC @`` clears the user-defined characters, so :py:meth:`GlyphCache.reset` has to be called after the
+printer was initialized by other means than :py:meth:`~escpos.escpos.Escpos.hw` or the connection was opened again.
+
+Example:
+
+.. code-block:: Python
+
+    glyphs = GlyphCache(p)
+    glyphs.define('\\u20bf', 'bitcoin-sign.png')
+    glyphs.attach()
+    p.text('Total: \\u20bf 0.0012\\n')  # the sign is sent once, as ESC & ... and ESC % 1 n ESC % 0 later
+
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import collections
+
+import six
+
+from .constants import *
+from .instrument import unwrap_method, wrap_method
+
+
+class GlyphCache(object):
+    """ Downloads glyphs as user-defined characters and prints them in text """
+
+    def __init__(self, printer, font='a', slots=None):
+        """
+        :param printer: An Escpos-printer object
+        :param font: ``'a'`` or ``'b'``, the font the text with the glyphs is printed in. User-defined characters are
+            defined for the font that is selected when they are downloaded.
+        :param slots: number of character slots to use, all codes from 33 to 126 by default
+        """
+        if font not in FONT_CELLS:
+            raise ValueError("Unknown font {0!r}".format(font))
+        first, last = USER_CHAR_CODES
+        # a user-defined space is easy to miss when the data is inspected
+        codes = list(range(first + 1, last + 1))
+        if slots is not None:
+            if not 0 < slots <= len(codes):
+                raise ValueError("slots must be between 1 and {0}".format(len(codes)))
+            codes = codes[:slots]
+        self.printer = printer
+        self.font = font
+        self.codes = codes
+        self.glyphs = {}
+        # resident glyphs in the order of their last use, character to code
+        self._resident = collections.OrderedDict()
+        self.downloads = 0
+
+    def define(self, char, img_source):
+        """ Register the glyph of a character
+
+        The image is scaled to the height of the character cell, black or dark pixels are printed.
+
+        :param char: the character in the text, usually one that the code pages of the printer lack
+        :param img_source: PIL image or filename
+        """
+        if len(char) != 1:
+            raise ValueError("Glyphs replace a single character, not {0!r}".format(char))
+        self.glyphs[char] = self._encode(img_source)
+        # a glyph that changed is downloaded again
+        self._resident.pop(char, None)
+
+    def _encode(self, img_source):
+        """ Column data of ``ESC &``: the width in dots and ``y`` bytes per column, top dot in the high bit """
+        from PIL import Image
+        im = img_source if isinstance(img_source, Image.Image) else Image.open(img_source)
+        if im.mode in ('RGBA', 'LA', 'P'):
+            im = im.convert('RGBA')
+            background = Image.new('RGBA', im.size, (255, 255, 255, 255))
+            im = Image.alpha_composite(background, im)
+        im = im.convert('L')
+        cell_width, cell_height = FONT_CELLS[self.font]
+        scale = min(cell_width / im.width, cell_height / im.height)
+        width = max(1, min(cell_width, int(round(im.width * scale))))
+        height = max(1, min(cell_height, int(round(im.height * scale))))
+        im = im.resize((width, height), Image.LANCZOS)
+        column_bytes = (cell_height + 7) // 8
+        top = (cell_height - height) // 2
+        pixels = im.load()
+        data = bytearray()
+        for x in range(width):
+            column = 0
+            for y in range(height):
+                if pixels[x, y] < 128:
+                    column |= 1 << (column_bytes * 8 - 1 - top - y)
+            data += column.to_bytes(column_bytes, 'big')
+        return width, bytes(data)
+
+    def _download(self, needed):
+        """ Give every glyph of `needed` a slot, returns the commands to send """
+        commands = b''
+        used = set(six.itervalues(self._resident))
+        free = [code for code in self.codes if code not in used]
+        for char in needed:
+            if char in self._resident:
+                continue
+            if free:
+                code = free.pop(0)
+            else:
+                victim = next(resident for resident in self._resident if resident not in needed)
+                code = self._resident.pop(victim)
+            width, data = self.glyphs[char]
+            column_bytes = (FONT_CELLS[self.font][1] + 7) // 8
+            commands += USER_CHAR_DEFINE + six.int2byte(column_bytes) + six.int2byte(code) * 2 + \
+                six.int2byte(width) + data
+            self._resident[char] = code
+            self.downloads += 1
+        for char in needed:
+            self._resident.move_to_end(char)
+        return commands
+
+    def resident(self):
+        """ Characters stored in the printer, mapped to their code, least recently used first """
+        return collections.OrderedDict(self._resident)
+
+    def reset(self):
+        """ Forget the downloaded glyphs, e.g. after the printer was switched off """
+        self._resident.clear()
+
+    def text(self, txt):
+        """ Print text with :py:meth:`~escpos.escpos.Escpos.text`, the defined glyphs as user-defined characters
+
+        :raises: :py:exc:`ValueError` if the text uses more glyphs than there are slots
+        """
+        needed = collections.OrderedDict((char, None) for char in txt if char in self.glyphs)
+        if not needed:
+            return self._text(txt)
+        if len(needed) > len(self.codes):
+            raise ValueError("The text uses {0} glyphs, the printer has {1} slots".format(len(needed),
+                                                                                      len(self.codes)))
+        commands = self._download(needed)
+        if commands:
+            self.printer._raw(commands)
+        plain = []
+        codes = bytearray()
+        for char in txt:
+            if char in needed:
+                if plain:
+                    self._text(''.join(plain))
+                    plain = []
+                codes.append(self._resident[char])
+            else:
+                if codes:
+                    self.printer._raw(USER_CHAR_ON + bytes(codes) + USER_CHAR_OFF)
+                    codes = bytearray()
+                plain.append(char)
+        if plain:
+            self._text(''.join(plain))
+        if codes:
+            self.printer._raw(USER_CHAR_ON + bytes(codes) + USER_CHAR_OFF)
+
+    def _text(self, *args, **kwargs):
+        return self.printer.text(*args, **kwargs)
+
+    def _hw(self, *args, **kwargs):
+        return self.printer.hw(*args, **kwargs)
+
+    def hw(self, hw):
+        """ :py:meth:`~escpos.escpos.Escpos.hw` that resets the cache when the printer is initialized """
+        result = self._hw(hw)
+        if hw.upper() in ('INIT', 'RESET'):
+            self.reset()
+        return result
+
+    def attach(self):
+        """ Make `text()` of the printer print the defined glyphs """
+        def replacing(name, method):
+            setattr(self, '_' + name, method)
+
+            def wrapper(*args, **kwargs):
+                return getattr(self, name)(*args, **kwargs)
+            return wrapper
+        wrap_method(self.printer, 'text', replacing, self)
+        wrap_method(self.printer, 'hw', replacing, self)
+
+    def detach(self):
+        """ Remove the wrappers set by :py:meth:`attach` """
+        for name in ('hw', 'text'):
+            unwrap_method(self.printer, name, self)
+            self.__dict__.pop('_' + name, None)
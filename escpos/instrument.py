@@ -0,0 +1,320 @@
+""" Transport instrumentation
+
+This module contains the collector :py:class:`Instrumentation` that records every call of the `_raw()` method
+of a printer with its size, duration and command category, and the log-linear :py:class:`LatencyHistogram` used
+to keep the latency distribution in constant memory.
+
+Instrumentation is attached to a printer with :py:meth:`escpos.escpos.Escpos.instrument`. A printer that is not
+instrumented runs without any wrapper.
+
+Example:
+
+.. code-block:: Python
+
+    stats = printer.instrument()
+    printer.text('Hello')
+    stats.snapshot()['categories']['text']['p99_us']
+    stats.export('/tmp/escpos-stats.json')
+
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import functools
+import json
+import os
+import threading
+import time
+
+# Public methods of Escpos and the category their output is accounted to
+COMMAND_CATEGORIES = {
+    'text': 'text',
+    'block_text': 'text',
+    'image': 'image',
+    'barcode': 'barcode',
+    'qr': 'qr',
+    'cut': 'cut',
+}
+OTHER_CATEGORY = 'other'
+
+
+class LatencyHistogram(object):
+    """ Histogram with logarithmic buckets and a fixed relative precision
+
+    Like HDR histograms, values are grouped by their highest bits: every power of two is split into
+    ``2 ** (sub_bucket_bits - 1)`` linear buckets, so the relative error of a reported value stays below
+    ``2 ** (1 - sub_bucket_bits)`` for any magnitude. Recording a value is O(1).
+    """
+
+    def __init__(self, sub_bucket_bits=5):
+        """
+        :param sub_bucket_bits: precision of the histogram, 5 bits keep the error below 6.25 %
+        """
+        self.sub_bucket_bits = sub_bucket_bits
+        self._sub_buckets = 1 << sub_bucket_bits
+        self._half = self._sub_buckets >> 1
+        self.counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def _index(self, value):
+        if value < self._sub_buckets:
+            return value
+        shift = value.bit_length() - self.sub_bucket_bits
+        return self._sub_buckets + (shift - 1) * self._half + (value >> shift) - self._half
+
+    def _value(self, index):
+        """ Middle of the value range of a bucket """
+        if index < self._sub_buckets:
+            return index
+        shift = (index - self._sub_buckets) // self._half + 1
+        top = (index - self._sub_buckets) % self._half + self._half
+        return ((top << shift) + ((top + 1) << shift) - 1) // 2
+
+    def record(self, value):
+        """ Add a value
+
+        :param value: non-negative integer, e.g. a duration in nanoseconds
+        """
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def percentile(self, percent):
+        """ Value below which `percent` percent of the recorded values are
+
+        :param percent: 0 - 100
+        :returns: the value, or None if nothing was recorded
+        """
+        if not self.count:
+            return None
+        rank = max(1, int(round(self.count * percent / 100.0)))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(max(self._value(index), self.min), self.max)
+        return self.max
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def merge(self, other):
+        """ Add the values recorded by another histogram of the same precision """
+        if other.sub_bucket_bits != self.sub_bucket_bits:
+            raise ValueError("Histograms must have the same precision")
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+
+
+class Instrumentation(object):
+    """ Collects statistics about the `_raw()` calls of one printer
+
+    Besides the built-in counters and histograms, callables can be registered with :py:meth:`add_callback`. They
+    are called as ``callback(category, size, duration_ns)`` after every call.
+    """
+
+    def __init__(self, name=None):
+        """
+        :param name: name of the printer in snapshots, defaults to the class name of the printer
+        """
+        self.name = name
+        self.started = time.time()
+        self.callbacks = []
+        self.categories = {}
+        self._lock = threading.Lock()
+
+    def add_callback(self, callback):
+        """ Register a callable that is called after every `_raw()` call """
+        self.callbacks.append(callback)
+
+    def record(self, category, size, duration):
+        """ Account one call
+
+        :param category: command category, see :py:data:`COMMAND_CATEGORIES`
+        :param size: number of bytes sent
+        :param duration: duration of the call in nanoseconds
+        """
+        with self._lock:
+            stats = self.categories.get(category)
+            if stats is None:
+                stats = self.categories[category] = {'bytes': 0, 'histogram': LatencyHistogram()}
+            stats['bytes'] += size
+            stats['histogram'].record(duration)
+        for callback in self.callbacks:
+            callback(category, size, duration)
+
+    @staticmethod
+    def _summary(histogram, size):
+        def us(value):
+            return None if value is None else value / 1000.0
+        return {
+            'calls': histogram.count,
+            'bytes': size,
+            'total_us': us(histogram.total),
+            'mean_us': us(histogram.mean),
+            'min_us': us(histogram.min),
+            'p50_us': us(histogram.percentile(50)),
+            'p90_us': us(histogram.percentile(90)),
+            'p99_us': us(histogram.percentile(99)),
+            'max_us': us(histogram.max),
+        }
+
+    def snapshot(self):
+        """ Current statistics as a JSON-serializable dictionary """
+        with self._lock:
+            categories = dict((category, self._summary(stats['histogram'], stats['bytes']))
+                              for category, stats in self.categories.items())
+            total = LatencyHistogram()
+            for stats in self.categories.values():
+                total.merge(stats['histogram'])
+            total = self._summary(total, sum(stats['bytes'] for stats in self.categories.values()))
+        return {
+            'printer': self.name,
+            'started': self.started,
+            'time': time.time(),
+            'total': total,
+            'categories': categories,
+        }
+
+    def export(self, path):
+        """ Write a snapshot as JSON to a file
+
+        The file is replaced atomically, so a reader never sees a half written snapshot.
+
+        :param path: path of the file
+        """
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as snapshot_file:
+            json.dump(self.snapshot(), snapshot_file, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+
+
+class _Link(object):
+    """ Calls the next method of a chain of wrappers
+
+    Wrappers call the method below them through a link, so a wrapper in the middle of the chain can be removed by
+    pointing the link of the wrapper above it to the method below it.
+    """
+
+    def __init__(self, method):
+        self.method = method
+
+    def __call__(self, *args, **kwargs):
+        return self.method(*args, **kwargs)
+
+
+def wrap_method(printer, name, wrapper, owner):
+    """ Replace a method of a printer instance with a wrapped version
+
+    The replacement is set as instance attribute, so the class and other instances are not affected. Wrappers of
+    different owners can be stacked and removed in any order.
+
+    :param printer: An Escpos-printer object
+    :param name: name of the method
+    :param wrapper: callable, called as ``wrapper(name, method)`` and returning the replacement
+    :param owner: object identifying the wrapper for :py:func:`unwrap_method`
+    """
+    method = getattr(printer, name)
+    link = _Link(method)
+    replacement = functools.wraps(method)(wrapper(name, link))
+    replacement._escpos_owner = owner
+    replacement._escpos_link = link
+    setattr(printer, name, replacement)
+
+
+def unwrap_method(printer, name, owner):
+    """ Remove a wrapper set with :py:func:`wrap_method`
+
+    The wrappers of other owners stay in place, also those that were set afterwards. Nothing happens if the method
+    has no wrapper of `owner`.
+
+    :param printer: An Escpos-printer object
+    :param name: name of the method
+    :param owner: the owner that was passed to :py:func:`wrap_method`
+    """
+    above = None
+    current = printer.__dict__.get(name)
+    while getattr(current, '_escpos_link', None) is not None:
+        previous = current._escpos_link.method
+        if current._escpos_owner is owner:
+            if above is not None:
+                above._escpos_link.method = previous
+                above.__wrapped__ = previous
+            elif getattr(previous, '_escpos_link', None) is not None:
+                setattr(printer, name, previous)
+            else:
+                del printer.__dict__[name]
+            return
+        above = current
+        current = previous
+
+
+def wrap_commands(printer, wrapper, owner, names=None):
+    """ Wrap the public command methods of a printer instance, see :py:func:`wrap_method`
+
+    :param names: names of the methods to wrap, defaults to the keys of :py:data:`COMMAND_CATEGORIES`
+    """
+    for name in (COMMAND_CATEGORIES if names is None else names):
+        wrap_method(printer, name, wrapper, owner)
+
+
+def unwrap_commands(printer, owner, names=None):
+    """ Remove the wrappers set with :py:func:`wrap_commands` """
+    for name in (COMMAND_CATEGORIES if names is None else names):
+        unwrap_method(printer, name, owner)
+
+
+def attach(printer, instrumentation):
+    """ Instrument the `_raw()` method of a printer, see :py:meth:`escpos.escpos.Escpos.instrument` """
+    state = {'category': None}
+
+    def timed_raw(name, raw):
+        def wrapper(msg):
+            start = time.perf_counter_ns()
+            try:
+                raw(msg)
+            finally:
+                instrumentation.record(state['category'] or OTHER_CATEGORY, len(msg),
+                                       time.perf_counter_ns() - start)
+        return wrapper
+
+    def categorized(name, method):
+        category = COMMAND_CATEGORIES[name]
+
+        def wrapper(*args, **kwargs):
+            if state['category'] is not None:
+                # nested command, e.g. the image of a qr code: keep the outer category
+                return method(*args, **kwargs)
+            state['category'] = category
+            try:
+                return method(*args, **kwargs)
+            finally:
+                state['category'] = None
+        return wrapper
+
+    wrap_method(printer, '_raw', timed_raw, instrumentation)
+    wrap_commands(printer, categorized, instrumentation)
+
+
+def detach(printer, instrumentation):
+    """ Remove the wrappers set by :py:func:`attach` """
+    unwrap_commands(printer, instrumentation)
+    unwrap_method(printer, '_raw', instrumentation)
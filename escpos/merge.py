@@ -0,0 +1,264 @@
+""" Mail merge
+
+This module renders one print job per row of a table, e.g. price tags or shipping labels from a CSV export. The
+:py:class:`Layout` lists printer commands in the format of the batch files of the CLI, one JSON object per line,
+with ``{field}`` placeholders in their string arguments::
+
+    {"command": "set", "align": "center", "text_type": "B"}
+    {"command": "text", "txt": "{name}\\n"}
+    {"command": "text", "txt": "{price:>10}\\n"}
+    {"command": "barcode", "code": "{ean}", "bc": "EAN13"}
+    {"command": "qr", "content": "{url}", "size": "{qr_size:d}"}
+    {"command": "cut"}
+
+:py:func:`merge` renders the rows in a pool of processes and yields the jobs in the order of the rows. Only a
+bounded number of rows is in flight, so the rows are read and the jobs are consumed as a stream.
+
+Example:
+
+.. code-block:: Python
+
+    layout = Layout.from_file('price-tag.jsonl')
+    for job in merge(layout, read_rows('products.csv')):
+        printer._raw(job)
+
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import collections
+import csv
+import io
+import itertools
+import json
+import os
+import string
+from concurrent.futures import ProcessPoolExecutor
+
+import six
+
+from .constants import PUBLIC_COMMANDS
+from .exceptions import Error, MergeError
+from .printer import Dummy
+
+DEFAULT_CHUNK_SIZE = 64
+
+# types of single placeholders like "{size:d}"
+CONVERSIONS = {'d': int, 'f': float}
+
+
+class Layout(object):
+    """ Printer commands with placeholders for the fields of a row
+
+    Placeholders use the syntax of :py:meth:`str.format`, so ``{price:.2f}`` formats a number. An argument that
+    consists of a single placeholder keeps the type of the field. CSV fields are always strings, an argument like
+    the `size` of a QR code is converted with ``{size:d}`` to an integer or with ``{size:f}`` to a float.
+    """
+
+    def __init__(self, steps):
+        """
+        :param steps: list of ``(command, arguments)``, the commands are names of :py:class:`~escpos.escpos.Escpos`
+            methods
+        """
+        self.steps = []
+        formatter = string.Formatter()
+        fields = set()
+        for name, arguments in steps:
+            if name not in PUBLIC_COMMANDS:
+                raise ValueError('Unknown command {0!r}'.format(name))
+            templates = {}
+            for key, value in six.iteritems(arguments):
+                if isinstance(value, six.string_types):
+                    parsed = list(formatter.parse(value))
+                    names = [field for _, field, _, _ in parsed if field is not None]
+                    fields.update(field.split('.')[0].split('[')[0] for field in names if field)
+                    if len(parsed) == 1 and parsed[0][0] == '' and names and \
+                            (not parsed[0][2] or parsed[0][2] in CONVERSIONS) and not parsed[0][3]:
+                        # a plain "{field}" is passed on unchanged, "{field:d}" is converted
+                        templates[key] = ('field', (names[0], parsed[0][2]))
+                    elif names:
+                        templates[key] = ('format', value)
+                    else:
+                        templates[key] = ('value', value)
+                else:
+                    templates[key] = ('value', value)
+            self.steps.append((name, templates))
+        self.fields = fields
+
+    @classmethod
+    def from_entries(cls, entries):
+        """ Create a layout from dictionaries with a ``command`` key and the arguments """
+        steps = []
+        for number, entry in enumerate(entries, 1):
+            if not isinstance(entry, dict) or 'command' not in entry:
+                raise ValueError('Step {0}: expected an object with a "command"'.format(number))
+            arguments = dict(entry)
+            steps.append((arguments.pop('command'), arguments))
+        return cls(steps)
+
+    @classmethod
+    def from_text(cls, text):
+        """ Create a layout from JSON lines or from a JSON list """
+        text = text.strip()
+        if text.startswith('['):
+            return cls.from_entries(json.loads(text))
+        return cls.from_entries(json.loads(line) for line in text.splitlines() if line.strip())
+
+    @classmethod
+    def from_file(cls, path):
+        with io.open(path, encoding='utf-8') as layout_file:
+            return cls.from_text(layout_file.read())
+
+    def render(self, printer, row):
+        """ Run the commands of the layout for one row
+
+        :param printer: the printer the commands are issued on, usually a :py:class:`~escpos.printer.Dummy`
+        :param row: dictionary of field names to values
+        :raises: :py:exc:`~escpos.exceptions.MergeError` if a field is missing or a command fails
+        """
+        for name, templates in self.steps:
+            arguments = {}
+            try:
+                for key, (kind, value) in six.iteritems(templates):
+                    if kind == 'field':
+                        field, conversion = value
+                        arguments[key] = CONVERSIONS[conversion](row[field]) if conversion else row[field]
+                    elif kind == 'format':
+                        arguments[key] = value.format_map(row)
+                    else:
+                        arguments[key] = value
+                getattr(printer, name)(**arguments)
+            except KeyError as e:
+                raise MergeError('field {0} is missing'.format(e))
+            except (Error, ValueError, TypeError) as e:
+                raise MergeError('{0}: {1}'.format(name, e))
+
+
+def read_rows(path, format=None, encoding='utf-8', **csv_options):
+    """ Read the rows of a CSV or JSON lines file one by one
+
+    :param path: path of the file
+    :param format: ``'csv'`` or ``'jsonl'``, by default taken from the extension, ``.jsonl`` and ``.ndjson`` are
+        JSON lines
+    :param encoding: encoding of the file, the default ignores a byte order mark of CSV exports
+    :param csv_options: passed to :py:class:`csv.DictReader`, e.g. ``delimiter=';'``
+    :returns: iterator of dictionaries
+    """
+    if format is None:
+        format = 'jsonl' if os.path.splitext(path)[1].lower() in ('.jsonl', '.ndjson') else 'csv'
+    if format == 'jsonl':
+        with io.open(path, encoding=encoding) as rows_file:
+            for line in rows_file:
+                if line.strip():
+                    yield json.loads(line)
+    elif format == 'csv':
+        if encoding == 'utf-8':
+            encoding = 'utf-8-sig'
+        with io.open(path, encoding=encoding, newline='') as rows_file:
+            for row in csv.DictReader(rows_file, **csv_options):
+                yield row
+    else:
+        raise ValueError('Unknown row format {0!r}'.format(format))
+
+
+# layout and printer of a worker process, set by the initializer
+_worker = {}
+
+
+def _init_worker(layout, columns):
+    _worker['layout'] = layout
+    _worker['printer'] = Dummy(columns=columns)
+
+
+def _render_chunk(first, rows):
+    """ Render rows in a worker process, returns a list of jobs """
+    layout = _worker['layout']
+    printer = _worker['printer']
+    jobs = []
+    for number, row in enumerate(rows, first):
+        try:
+            layout.render(printer, row)
+        except MergeError as e:
+            printer.drain()
+            raise MergeError('row {0}: {1}'.format(number, e.msg))
+        jobs.append(bytes(printer.drain()))
+    return jobs
+
+
+def _chunks(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(itertools.islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def merge(layout, rows, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, max_pending=None, columns=32,
+          mp_context=None):
+    """ Render one job per row
+
+    The rows are sent to the worker processes in chunks, at most `max_pending` chunks are rendered or waiting to be
+    consumed at the same time.
+
+    :param layout: the :py:class:`Layout`
+    :param rows: iterable of dictionaries, e.g. from :py:func:`read_rows`
+    :param workers: number of processes, defaults to the number of CPUs. With 1 the rows are rendered in the
+        calling process.
+    :param chunk_size: rows per task of a worker
+    :param max_pending: chunks in flight, defaults to twice the number of workers
+    :param columns: text columns of the printer, used by `block_text`
+    :param mp_context: :py:mod:`multiprocessing` context of the pool, e.g. ``multiprocessing.get_context('spawn')``
+        in programs that run threads
+    :returns: iterator of the jobs as bytes, in the order of the rows
+    :raises: :py:exc:`~escpos.exceptions.MergeError` naming the first row (counted from 1) that can not be
+        rendered
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = _chunks(rows, chunk_size)
+    if workers == 1:
+        _init_worker(layout, columns)
+        first = 1
+        for chunk in chunks:
+            for job in _render_chunk(first, chunk):
+                yield job
+            first += len(chunk)
+        return
+
+    max_pending = max_pending or 2 * workers
+    pending = collections.deque()
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=mp_context, initializer=_init_worker,
+                                   initargs=(layout, columns))
+    try:
+        first = 1
+        for chunk in chunks:
+            pending.append(executor.submit(_render_chunk, first, chunk))
+            first += len(chunk)
+            if len(pending) >= max_pending:
+                for job in pending.popleft().result():
+                    yield job
+        while pending:
+            for job in pending.popleft().result():
+                yield job
+    finally:
+        # also reached when the consumer stops early
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+def merge_to(printer, layout, rows, **kwargs):
+    """ Render the rows with :py:func:`merge` and send every job to a printer
+
+    :param printer: An Escpos-printer object
+    :param kwargs: passed to :py:func:`merge`
+    :returns: number of jobs sent
+    """
+    count = 0
+    for job in merge(layout, rows, **kwargs):
+        printer._raw(job)
+        count += 1
+    return count
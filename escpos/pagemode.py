@@ -0,0 +1,196 @@
+""" Page mode layouts
+
+This module contains :py:class:`PageLayout`, which places text, barcodes, QR codes and small images side by side in
+rectangular regions of a page and prints them with the page mode of the printer (``ESC L``). Every region becomes a
+print area (``ESC W``) that its content is positioned in with ``ESC $`` and ``GS $``, so the page is sent as text
+and printer commands instead of a raster image of the full width.
+
+Positions and sizes are in dots. They are sent as motion units, which are dots on most printers; printers with other
+default units get them set with `units`.
+
+Example:
+
+.. code-block:: Python
+
+    page = PageLayout(p, width=576)
+    page.qr((0, 0, 160, 160), 'https://example.com/r/1234', size=6, align='center')
+    page.text((176, 0, 400, 160), 'Scan to rate your visit\\nand get 10 % off', font='b')
+    page.print_page()
+
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import textwrap
+
+import six
+
+from .constants import *
+
+ALIGNMENTS = ('left', 'center', 'right')
+
+# dots between the lines of a text region
+LINE_GAP = 6
+
+
+class PageLayout(object):
+    """ Regions of a page, printed in page mode """
+
+    def __init__(self, printer, width=None, units=None):
+        """
+        :param printer: An Escpos-printer object
+        :param width: printable width in dots, defaults to the columns of the printer in font A
+        :param units: dots per inch of the printer, sent as motion units if given
+        """
+        self.printer = printer
+        self.width = width or printer.columns * FONT_CELLS['a'][0]
+        self.units = units
+        self.regions = []
+
+    @property
+    def height(self):
+        """ Height of the page in dots """
+        return max([y + height for _, (_, y, _, height), _ in self.regions] or [0])
+
+    def _add(self, kind, box, arguments):
+        x, y, width, height = box
+        if x < 0 or y < 0 or width <= 0 or height <= 0 or x + width > self.width:
+            raise ValueError("Region {0!r} is not inside the page of {1} dots".format(box, self.width))
+        if arguments.get('align', 'left') not in ALIGNMENTS:
+            raise ValueError("Unknown alignment {0!r}".format(arguments['align']))
+        self.regions.append((kind, tuple(box), arguments))
+
+    def text(self, box, txt, align='left', font='a', text_type='normal', width=1, height=1):
+        """ Add a text region
+
+        The text is wrapped to the width of the region, lines that do not fit its height are dropped.
+
+        :param box: ``(x, y, width, height)`` of the region
+        :param txt: the text, may contain line breaks
+        :param align: ``'left'``, ``'center'`` or ``'right'`` within the region
+        :param font, text_type, width, height: as for :py:meth:`~escpos.escpos.Escpos.set`
+        """
+        if font.lower() not in FONT_CELLS:
+            raise ValueError("Unknown font {0!r}".format(font))
+        self._add('text', box, dict(txt=txt, align=align, font=font.lower(), text_type=text_type, width=width,
+                                    height=height))
+
+    def barcode(self, box, code, bc, height=64, width=3, pos='BELOW', font='A', function_type='A'):
+        """ Add a barcode, at the left of the region
+
+        The arguments are those of :py:meth:`~escpos.escpos.Escpos.barcode`, the region has to include the human
+        readable text.
+        """
+        self._add('barcode', box, dict(code=code, bc=bc, height=height, width=width, pos=pos, font=font,
+                                       function_type=function_type))
+
+    def qr(self, box, content, size=3, ec=QR_ECLEVEL_L, model=QR_MODEL_2, align='left'):
+        """ Add a QR code printed by the printer
+
+        :param align: horizontal alignment, needs the `qrcode` library to know the size of the symbol
+        """
+        self._add('qr', box, dict(content=content, size=size, ec=ec, model=model, align=align))
+
+    def image(self, box, img_source, align='left'):
+        """ Add an image, printed in raster format
+
+        :param img_source: PIL image or filename
+        """
+        from .image import EscposImage
+        self._add('image', box, dict(im=EscposImage(img_source), align=align))
+
+    @staticmethod
+    def _offset(align, free):
+        return (0, free // 2, free)[ALIGNMENTS.index(align)] if free > 0 else 0
+
+    def _position(self, x, y):
+        """ Move to `x` and the baseline `y` within the print area """
+        self.printer._raw(PAGE_POS_X + self.printer._int_low_high(x, 2) +
+                          PAGE_POS_Y + self.printer._int_low_high(y, 2))
+
+    def _send_text(self, box, txt, align, font, text_type, width, height):
+        cell_width, cell_height = FONT_CELLS[font]
+        cell_width, cell_height = cell_width * width, cell_height * height
+        columns = max(1, box[2] // cell_width)
+        lines = []
+        for paragraph in txt.splitlines():
+            lines.extend(textwrap.wrap(paragraph, columns) or [''])
+        self.printer.set(font=font, text_type=text_type, width=width, height=height)
+        for number, line in enumerate(lines):
+            baseline = (number + 1) * cell_height + number * LINE_GAP
+            if baseline > box[3]:
+                break
+            if line:
+                self._position(self._offset(align, box[2] - len(line) * cell_width), baseline)
+                self.printer.text(line)
+
+    def _send_barcode(self, box, height, **kwargs):
+        # the bars stand on the baseline, the human readable text is printed below it
+        above = kwargs['pos'].upper() in ('ABOVE', 'BOTH')
+        self._position(0, height + (FONT_CELLS[kwargs['font'].lower()][1] if above else 0))
+        self.printer.barcode(height=height, align_ct=False, **kwargs)
+
+    def _qr_size(self, content, size, ec, model):
+        """ Width of a QR code in dots, None if it is not known """
+        try:
+            import qrcode
+        except ImportError:
+            return None
+        if model != QR_MODEL_2:
+            return None
+        levels = {
+            QR_ECLEVEL_L: qrcode.constants.ERROR_CORRECT_L,
+            QR_ECLEVEL_M: qrcode.constants.ERROR_CORRECT_M,
+            QR_ECLEVEL_Q: qrcode.constants.ERROR_CORRECT_Q,
+            QR_ECLEVEL_H: qrcode.constants.ERROR_CORRECT_H,
+        }
+        code = qrcode.QRCode(border=0, error_correction=levels[ec])
+        code.add_data(content)
+        code.make(fit=True)
+        return code.modules_count * size
+
+    def _send_qr(self, box, content, size, ec, model, align):
+        symbol = self._qr_size(content, size, ec, model)
+        if symbol is None:
+            # the code is printed on the bottom of the region
+            self._position(0, box[3])
+        else:
+            self._position(self._offset(align, box[2] - symbol), min(symbol, box[3]))
+        self.printer.qr(content, ec=ec, size=size, model=model, native=True)
+
+    def _send_image(self, box, im, align):
+        self._position(self._offset(align, box[2] - im.width_bytes * 8), min(im.height, box[3]))
+        self.printer.image(im.img_original, impl='bitImageRaster')
+
+    def print_page(self, clear=True):
+        """ Send the page and print it
+
+        :param clear: remove the regions afterwards, False to print the page again later
+        """
+        if not self.regions:
+            return
+        commands = b''
+        if self.units is not None:
+            commands += MOTION_UNITS + six.int2byte(self.units) * 2
+        commands += PAGE_MODE + PAGE_DIRECTION + six.int2byte(0)
+        self.printer._raw(commands)
+        styled = False
+        for kind, box, arguments in self.regions:
+            self.printer._raw(PAGE_AREA + b''.join(self.printer._int_low_high(value, 2) for value in box))
+            if kind == 'text':
+                self._send_text(box, **arguments)
+                styled = True
+            elif kind == 'barcode':
+                self._send_barcode(box, **arguments)
+            elif kind == 'qr':
+                self._send_qr(box, **arguments)
+            else:
+                self._send_image(box, **arguments)
+        self.printer._raw(PAGE_PRINT)
+        if styled:
+            self.printer.set()
+        if clear:
+            self.regions = []
@@ -13,14 +13,20 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
 
-import usb.core
-import usb.util
-import serial
+import errno
+import os
+import select
 import socket
+import time
 
 from .escpos import Escpos
 from .exceptions import USBNotFoundError
 
+try:
+    IOV_MAX = max(os.sysconf('SC_IOV_MAX'), 16)
+except (AttributeError, ValueError, OSError):
+    IOV_MAX = 1024
+
 
 class Usb(Escpos):
     """ USB printer
@@ -52,6 +58,7 @@ class Usb(Escpos):
 
     def open(self):
         """ Search device on USB tree and set it as escpos device """
+        import usb.core
         self.device = usb.core.find(idVendor=self.idVendor, idProduct=self.idProduct)
         if self.device is None:
             raise USBNotFoundError("Device not found or cable not plugged in.")
@@ -82,11 +89,26 @@ class Usb(Escpos):
         :param msg: arbitrary code to be printed
         :type msg: bytes
         """
-        self.device.write(self.out_ep, msg, self.timeout)
+        with self.transport_lock:
+            self.device.write(self.out_ep, msg, self.timeout)
+
+    def _read(self, timeout=0):
+        """ Reads a data buffer from the input end point
+
+        :param timeout: maximum time to wait for data in seconds
+        :rtype: bytes
+        """
+        import usb.core
+        try:
+            data = self.device.read(self.in_ep, 64, max(1, int(timeout * 1000)))
+        except usb.core.USBTimeoutError:
+            return b''
+        return bytes(bytearray(data))
 
     def close(self):
         """ Release USB interface """
         if self.device:
+            import usb.util
             usb.util.dispose_resources(self.device)
         self.device = None
 
@@ -104,7 +126,7 @@ class Serial(Escpos):
     """
 
     def __init__(self, devfile="/dev/ttyS0", baudrate=9600, bytesize=8, timeout=1,
-                 parity=serial.PARITY_NONE, stopbits=serial.STOPBITS_ONE,
+                 parity='N', stopbits=1,
                  xonxoff=False, dsrdtr=True, *args, **kwargs):
         """
 
@@ -112,8 +134,8 @@ class Serial(Escpos):
         :param baudrate: Baud rate for serial transmission
         :param bytesize: Serial buffer size
         :param timeout:  Read/Write timeout
-        :param parity:   Parity checking
-        :param stopbits: Number of stop bits
+        :param parity:   Parity checking, one of the `serial.PARITY_*` constants
+        :param stopbits: Number of stop bits, one of the `serial.STOPBITS_*` constants
         :param xonxoff:  Software flow control
         :param dsrdtr:   Hardware flow control (False to enable RTS/CTS)
         """
@@ -131,6 +153,7 @@ class Serial(Escpos):
 
     def open(self):
         """ Setup serial port and set is as escpos device """
+        import serial
         self.device = serial.Serial(port=self.devfile, baudrate=self.baudrate,
                                     bytesize=self.bytesize, parity=self.parity,
                                     stopbits=self.stopbits, timeout=self.timeout,
@@ -147,11 +170,26 @@ class Serial(Escpos):
         :param msg: arbitrary code to be printed
         :type msg: bytes
         """
-        self.device.write(msg)
+        with self.transport_lock:
+            self.device.write(msg)
+
+    def _read(self, timeout=0):
+        """ Reads the data waiting in the serial input buffer
+
+        :param timeout: maximum time to wait for data in seconds
+        :rtype: bytes
+        """
+        deadline = time.time() + timeout
+        while not self.device.in_waiting and time.time() < deadline:
+            time.sleep(0.01)
+        waiting = self.device.in_waiting
+        if not waiting:
+            return b''
+        return self.device.read(waiting)
 
     def close(self):
         """ Close Serial interface """
-        if self.device is not None:
+        if self.device is not None and self.device.is_open:
             self.device.flush()
             self.device.close()
 
@@ -207,11 +245,41 @@ class Network(Escpos):
         :param msg: arbitrary code to be printed
         :type msg: bytes
         """
-        self.device.sendall(msg)
+        with self.transport_lock:
+            self.device.sendall(msg)
+
+    def _read(self, timeout=0):
+        """ Reads the data waiting on the socket
+
+        Uses ``select`` so the timeout of the socket (which also applies to writing) stays untouched.
+
+        :param timeout: maximum time to wait for data in seconds
+        :rtype: bytes
+        """
+        readable, _, _ = select.select([self.device], [], [], timeout)
+        if not readable:
+            return b''
+        return self.device.recv(64)
+
+    def _send_file_segment(self, job, offset, count):
+        """ Send a part of a job file with ``socket.sendfile``
+
+        :param job: the job file, opened in binary mode
+        :param offset: position of the first byte to send
+        :param count: maximum number of bytes to send
+        :returns: number of bytes sent
+        """
+        return self.device.sendfile(job, offset, count)
 
     def close(self):
         """ Close TCP connection """
-        self.device.shutdown(socket.SHUT_RDWR)
+        if self.device.fileno() == -1:
+            return
+        try:
+            self.device.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            # the peer closed the connection already
+            pass
         self.device.close()
 
 
@@ -229,19 +297,32 @@ class File(Escpos):
 
     """
 
-    def __init__(self, devfile="/dev/usb/lp0", auto_flush=True, *args, **kwargs):
+    def __init__(self, devfile="/dev/usb/lp0", auto_flush=True, batch=False, batch_size=65536, *args, **kwargs):
         """
 
         :param devfile : Device file under dev filesystem
         :param auto_flush: automatically call flush after every call of _raw()
+        :param batch: open the device unbuffered and collect the commands, they are written together with a single
+            ``writev`` call once `batch_size` bytes are pending, on :py:meth:`flush`, :py:meth:`cut` and
+            :py:meth:`close`. `auto_flush` is ignored in this mode.
+        :param batch_size: number of pending bytes that triggers a write in batch mode
         """
         Escpos.__init__(self, *args, **kwargs)
         self.devfile = devfile
         self.auto_flush = auto_flush
+        self.batch = batch
+        self.batch_size = batch_size
+        self._pending = []
+        self._pending_size = 0
         self.open()
 
     def open(self):
         """ Open system file """
+        if self.batch:
+            self.device = os.open(self.devfile, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0),
+                                  0o666)
+            return
+
         self.device = open(self.devfile, "wb")
 
         if self.device is None:
@@ -249,7 +330,40 @@ class File(Escpos):
 
     def flush(self):
         """ Flush printing content """
-        self.device.flush()
+        with self.transport_lock:
+            if self.batch:
+                if self._pending:
+                    pending = self._pending
+                    self._pending = []
+                    self._pending_size = 0
+                    self._write_all(pending)
+            else:
+                self.device.flush()
+
+    def _write_all(self, buffers):
+        """ Write the buffers to the device with as few system calls as possible
+
+        :param buffers: list of bytes-like objects
+        """
+        if not hasattr(os, 'writev'):
+            view = memoryview(b''.join(buffers))
+            while view:
+                view = view[os.write(self.device, view):]
+            return
+
+        views = [memoryview(buf).cast('B') for buf in buffers if len(buf)]
+        first = 0
+        while first < len(views):
+            written = os.writev(self.device, views[first:first + IOV_MAX])
+            # skip what was written, a partial write leaves the rest of a buffer for the next call
+            while written:
+                size = len(views[first])
+                if written >= size:
+                    written -= size
+                    first += 1
+                else:
+                    views[first] = views[first][written:]
+                    written = 0
 
     def _raw(self, msg):
         """ Print any command sent in raw format
@@ -257,14 +371,71 @@ class File(Escpos):
         :param msg: arbitrary code to be printed
         :type msg: bytes
         """
-        self.device.write(msg)
-        if self.auto_flush:
-            self.flush()
+        with self.transport_lock:
+            if self.batch:
+                if self._pending_size + len(msg) >= self.batch_size:
+                    # large data is written from where it is instead of being copied into the batch
+                    pending = self._pending
+                    pending.append(msg)
+                    self._pending = []
+                    self._pending_size = 0
+                    self._write_all(pending)
+                else:
+                    self._pending.append(bytes(msg))
+                    self._pending_size += len(msg)
+                return
+
+            self.device.write(msg)
+            if self.auto_flush:
+                self.flush()
+
+    def _send_file_segment(self, job, offset, count):
+        """ Send a part of a job file with ``os.sendfile``
+
+        Device files that do not support ``sendfile`` fall back to reading and writing the data.
+
+        :param job: the job file, opened in binary mode
+        :param offset: position of the first byte to send
+        :param count: maximum number of bytes to send
+        :returns: number of bytes sent
+        """
+        self.flush()
+        out_fd = self.device if self.batch else self.device.fileno()
+        if hasattr(os, 'sendfile'):
+            try:
+                return os.sendfile(out_fd, job.fileno(), offset, count)
+            except OSError as e:
+                if e.errno not in (errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP):
+                    raise
+        job.seek(offset)
+        data = job.read(count)
+        if self.batch:
+            self._write_all([data])
+        else:
+            self.device.write(data)
+            self.device.flush()
+        return len(data)
+
+    def cut(self, mode=''):
+        """ Cut paper and flush the job to the device
+
+        See :py:meth:`escpos.escpos.Escpos.cut`.
+        """
+        Escpos.cut(self, mode)
+        self.flush()
 
     def close(self):
         """ Close system file """
-        self.device.flush()
-        self.device.close()
+        if self.batch:
+            if self.device is not None:
+                self.flush()
+                os.close(self.device)
+                self.device = None
+            return
+
+        if self.device is not None and not self.device.closed:
+            self.device.flush()
+            self.device.close()
 
 
 class Dummy(Escpos):
@@ -285,7 +456,8 @@ class Dummy(Escpos):
         """
         """
         Escpos.__init__(self, *args, **kwargs)
-        self._output_list = []
+        self._buffer = bytearray()
+        self._marks = []
 
     def _raw(self, msg):
         """ Print any command sent in raw format
@@ -293,12 +465,69 @@ class Dummy(Escpos):
         :param msg: arbitrary code to be printed
         :type msg: bytes
         """
-        self._output_list.append(msg)
+        self._buffer += msg
 
     @property
     def output(self):
         """ Get the data that was sent to this printer """
-        return b''.join(self._output_list)
+        return bytes(self._buffer)
+
+    def getbuffer(self):
+        """ Get the data that was sent to this printer without copying it
+
+        No data can be added while the returned view is alive, so release it with ``view.release()`` or use it in
+        a `with`-statement.
+
+        :rtype: memoryview
+        """
+        return memoryview(self._buffer)
+
+    def __len__(self):
+        return len(self._buffer)
+
+    def clear(self):
+        """ Discard the data and the segment marks """
+        del self._buffer[:]
+        self._marks = []
+
+    def mark(self):
+        """ Mark the end of a segment at the current end of the data
+
+        :returns: offset of the mark
+        """
+        offset = len(self._buffer)
+        if not self._marks or self._marks[-1] != offset:
+            self._marks.append(offset)
+        return offset
+
+    def segments(self):
+        """ Get the data split at the marks set with :py:meth:`mark`
+
+        Data after the last mark is returned as last segment. Same as with :py:meth:`getbuffer`, the views have to be
+        released before new data is added.
+
+        :rtype: list of memoryview
+        """
+        view = memoryview(self._buffer)
+        start = 0
+        segments = []
+        for end in self._marks + [len(self._buffer)]:
+            if end > start:
+                segments.append(view[start:end])
+            start = end
+        return segments
+
+    def drain(self):
+        """ Take the data sent since the last drain out of the printer
+
+        The buffer is handed over instead of being copied and a new one is started.
+
+        :rtype: bytearray
+        """
+        data = self._buffer
+        self._buffer = bytearray()
+        self._marks = []
+        return data
 
     def close(self):
         pass
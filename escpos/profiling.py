@@ -0,0 +1,182 @@
+""" Per-command profiling
+
+This module contains the :py:class:`Profiler` that measures every call of a public command method of a printer:
+wall and CPU time, bytes emitted and memory allocated (with :py:mod:`tracemalloc`). The calls are grouped into
+jobs, a job ends with each :py:meth:`~escpos.escpos.Escpos.cut`.
+
+Profiling is switched on for all printers by setting the environment variable ``ESCPOS_PROFILE`` (the report of
+every job is then written to stderr), with the ``--profile`` flag of the CLI or for a single printer with
+:py:meth:`escpos.escpos.Escpos.start_profiling`.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import os
+import sys
+import time
+import tracemalloc
+
+from .constants import PUBLIC_COMMANDS
+from .instrument import unwrap_commands, unwrap_method, wrap_commands, wrap_method
+
+PROFILE_ENV = 'ESCPOS_PROFILE'
+
+
+class CallRecord(object):
+    """ Measurements of a single command call """
+    __slots__ = ('method', 'depth', 'wall', 'cpu', 'bytes', 'allocated', 'peak')
+
+    def __init__(self, method, depth):
+        self.method = method
+        self.depth = depth
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.bytes = 0
+        self.allocated = 0
+        self.peak = 0
+
+
+class Profiler(object):
+    """ Records the command calls of a printer
+
+    Times and sizes of nested calls (e.g. the `image()` of a non-native `qr()`) are included in the outer call.
+    """
+
+    def __init__(self, trace_allocations=True, output=None):
+        """
+        :param trace_allocations: measure allocations with :py:mod:`tracemalloc`. Tracing is started if needed and
+            slows everything down noticeably.
+        :param output: stream the report is written to at the end of every job, None to not write reports
+        """
+        self.trace_allocations = trace_allocations
+        self.output = output
+        self.jobs = []
+        self.current = []
+        self._stack = []
+        self._bytes = 0
+        self._started_tracing = False
+
+    def attach(self, printer):
+        """ Wrap the command methods and `_raw()` of a printer """
+        if self.trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        wrap_method(printer, '_raw', self._counting, self)
+        wrap_commands(printer, self._measuring, self, PUBLIC_COMMANDS)
+
+    def detach(self, printer):
+        """ Remove the wrappers set by :py:meth:`attach` """
+        unwrap_commands(printer, self, PUBLIC_COMMANDS)
+        unwrap_method(printer, '_raw', self)
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def _counting(self, name, raw):
+        def wrapper(msg):
+            self._bytes += len(msg)
+            return raw(msg)
+        return wrapper
+
+    def _measuring(self, name, method):
+        def wrapper(*args, **kwargs):
+            record = CallRecord(name, len(self._stack))
+            tracing = self.trace_allocations and tracemalloc.is_tracing()
+            if tracing:
+                current, peak = tracemalloc.get_traced_memory()
+                if self._stack:
+                    parent = self._stack[-1]
+                    parent.peak = max(parent.peak, peak)
+                tracemalloc.reset_peak()
+                record.allocated = current
+                record.peak = current
+            self._stack.append(record)
+            start_bytes = self._bytes
+            start_cpu = time.thread_time()
+            start_wall = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                record.wall = time.perf_counter() - start_wall
+                record.cpu = time.thread_time() - start_cpu
+                record.bytes = self._bytes - start_bytes
+                self._stack.pop()
+                if tracing:
+                    current, peak = tracemalloc.get_traced_memory()
+                    record.peak = max(record.peak, peak)
+                    if self._stack:
+                        self._stack[-1].peak = max(self._stack[-1].peak, record.peak)
+                    record.peak -= record.allocated
+                    record.allocated = current - record.allocated
+                self.current.append(record)
+                if name == 'cut' and not self._stack:
+                    self.end_job()
+        return wrapper
+
+    def end_job(self):
+        """ Close the current job and write its report if an output stream is set """
+        if not self.current:
+            return
+        self.jobs.append(self.current)
+        self.current = []
+        if self.output is not None:
+            self.output.write(self.report())
+            self.output.flush()
+
+    @staticmethod
+    def summarize(records):
+        """ Aggregate call records by method
+
+        :returns: list of dictionaries, sorted by wall time, slowest first
+        """
+        methods = {}
+        for record in records:
+            stats = methods.get(record.method)
+            if stats is None:
+                stats = methods[record.method] = {
+                    'method': record.method, 'calls': 0, 'wall': 0.0, 'cpu': 0.0, 'bytes': 0, 'allocated': 0,
+                    'peak': 0,
+                }
+            stats['calls'] += 1
+            stats['wall'] += record.wall
+            stats['cpu'] += record.cpu
+            stats['bytes'] += record.bytes
+            stats['allocated'] += record.allocated
+            stats['peak'] = max(stats['peak'], record.peak)
+        return sorted(methods.values(), key=lambda stats: stats['wall'], reverse=True)
+
+    def report(self, job=-1):
+        """ Format the profile of a job as table
+
+        :param job: index of the finished job, defaults to the last one. The calls of an unfinished job are
+            reported if no job was finished yet.
+        :rtype: str
+        """
+        records = self.jobs[job] if self.jobs else self.current
+        outer = [record for record in records if record.depth == 0]
+        lines = [
+            "escpos profile: job {0}, {1} calls, {2:.3f} ms".format(
+                len(self.jobs) if self.jobs else 0, len(records), sum(r.wall for r in outer) * 1000),
+            "{0:<14} {1:>6} {2:>10} {3:>10} {4:>10} {5:>12} {6:>12}".format(
+                'method', 'calls', 'wall ms', 'cpu ms', 'bytes', 'alloc B', 'peak B'),
+        ]
+        for stats in self.summarize(records):
+            lines.append("{method:<14} {calls:>6} {wall_ms:>10.3f} {cpu_ms:>10.3f} {bytes:>10} {allocated:>12} "
+                         "{peak:>12}".format(wall_ms=stats['wall'] * 1000, cpu_ms=stats['cpu'] * 1000, **stats))
+        return "\n".join(lines) + "\n"
+
+
+def profiler_from_environment():
+    """ Create the profiler requested with ``ESCPOS_PROFILE``
+
+    ``ESCPOS_PROFILE=notrace`` profiles without allocation tracing.
+
+    :returns: a :py:class:`Profiler` writing to stderr, or None if the variable is not set
+    """
+    value = os.environ.get(PROFILE_ENV, '')
+    if not value or value == '0':
+        return None
+    return Profiler(trace_allocations=value != 'notrace', output=sys.stderr)
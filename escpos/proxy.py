@@ -0,0 +1,233 @@
+""" Raw print proxy
+
+This module contains :py:class:`ProxyServer`, a daemon that accepts raw ESC/POS jobs on TCP ports (like the port
+9100 of network printers) and forwards them to local printers.
+
+Every client connection is one job. Jobs for the same printer are queued and sent one after another, so data
+of different clients never gets mixed. The data of a client is read in chunks into a small bounded buffer; when
+the buffer is full the proxy stops reading from the socket and TCP flow control slows the client down.
+
+Example:
+
+.. code-block:: Python
+
+    server = ProxyServer({9100: printer.Usb(0x04b8, 0x0202), 9101: printer.Serial('/dev/ttyUSB0')})
+    server.serve_forever()
+
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import logging
+import socket
+import threading
+
+try:
+    import queue
+except ImportError:  # Python 2
+    import Queue as queue
+
+logger = logging.getLogger(__name__)
+
+
+class _Job(object):
+    """ Data of one client connection on its way to the printer """
+
+    def __init__(self, peer, max_chunks):
+        self.peer = peer
+        self.chunks = queue.Queue(max_chunks)
+        self.failed = False
+
+    def __iter__(self):
+        while True:
+            chunk = self.chunks.get()
+            if chunk is None:
+                return
+            yield chunk
+
+
+class PrinterQueue(threading.Thread):
+    """ Sends the jobs for one printer in the order they arrived """
+
+    def __init__(self, printer, max_jobs=16):
+        """
+        :param printer: An Escpos-printer object
+        :param max_jobs: number of jobs that may wait for the printer. Further clients are not read from until a
+            job is finished.
+        """
+        threading.Thread.__init__(self, name="escpos-proxy-{0}".format(type(printer).__name__))
+        self.daemon = True
+        self.printer = printer
+        self.jobs = queue.Queue(max_jobs)
+        self.sent_jobs = 0
+        self.sent_bytes = 0
+        self._stopping = threading.Event()
+
+    def run(self):
+        while not (self._stopping.is_set() and self.jobs.empty()):
+            job = self.jobs.get()
+            if job is None:
+                return
+            for chunk in job:
+                if job.failed:
+                    # keep draining so the client is not blocked forever
+                    continue
+                try:
+                    self.printer._raw(chunk)
+                    self.sent_bytes += len(chunk)
+                except Exception as e:
+                    logger.error("Job from %s failed: %s", job.peer, e)
+                    job.failed = True
+            if job.failed:
+                self._reopen()
+            else:
+                self.sent_jobs += 1
+
+    def _reopen(self):
+        """ Try to reconnect the printer after a transport error """
+        try:
+            self.printer.close()
+        except Exception as e:
+            # the connection is broken already
+            logger.debug("Closing %s failed: %s", type(self.printer).__name__, e)
+        try:
+            self.printer.open()
+        except Exception as e:
+            logger.error("Could not reopen %s: %s", type(self.printer).__name__, e)
+
+    def stop(self):
+        """ Stop after the jobs that are queued, without blocking """
+        self._stopping.set()
+        try:
+            self.jobs.put_nowait(None)
+        except queue.Full:
+            # the thread is busy with the queued jobs and checks the flag after each of them
+            pass
+
+
+class ProxyServer(object):
+    """ Accepts raw print jobs over TCP and forwards them to local printers """
+
+    def __init__(self, printers, host='0.0.0.0', max_clients=64, max_jobs=16, chunk_size=4096, max_chunks=16,
+                 client_timeout=30):
+        """
+        :param printers: dictionary mapping TCP ports to Escpos-printer objects
+        :param host: address to listen on
+        :param max_clients: maximum number of connections over all ports, further connections are closed
+            immediately
+        :param max_jobs: maximum number of jobs waiting for a single printer
+        :param chunk_size: number of bytes read from a client at once
+        :param max_chunks: number of chunks buffered per client before reading from it is paused
+        :param client_timeout: seconds of silence after which a client connection is considered finished
+        """
+        self.host = host
+        self.chunk_size = chunk_size
+        self.max_chunks = max_chunks
+        self.client_timeout = client_timeout
+        self.queues = dict((port, PrinterQueue(printer, max_jobs)) for port, printer in printers.items())
+        self._clients = threading.BoundedSemaphore(max_clients)
+        self._listeners = []
+        self._stopped = threading.Event()
+
+    @classmethod
+    def from_config(cls, config, port=9100, ports=None, **kwargs):
+        """ Create a proxy for the printers of a configuration
+
+        :param config: A loaded :py:class:`escpos.config.Config`
+        :param port: TCP port for the default printer, used if `ports` is not given
+        :param ports: dictionary of TCP ports and names of printers in the `printers:` section
+        :param kwargs: passed to the constructor
+        """
+        if ports is None:
+            return cls({port: config.printer()}, **kwargs)
+        return cls(dict((port, config.printer(name)) for port, name in ports.items()), **kwargs)
+
+    def start(self):
+        """ Open the listening sockets and start accepting clients in background threads
+
+        :returns: dictionary of requested port to the port that is actually listened on. They only differ when
+            port `0` was requested to let the system choose a free port.
+        """
+        ports = {}
+        self._stopped.clear()
+        for port, printer_queue in self.queues.items():
+            listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            listener.bind((self.host, port))
+            listener.listen(16)
+            self._listeners.append(listener)
+            ports[port] = listener.getsockname()[1]
+            printer_queue.start()
+            thread = threading.Thread(target=self._accept, args=(listener, printer_queue),
+                                      name="escpos-proxy-accept-{0}".format(ports[port]))
+            thread.daemon = True
+            thread.start()
+        return ports
+
+    def serve_forever(self):
+        """ Start the proxy and block until :py:meth:`shutdown` is called """
+        self.start()
+        try:
+            while not self._stopped.wait(1):
+                pass
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        """ Stop accepting clients. Jobs that are already queued are still sent. """
+        self._stopped.set()
+        for listener in self._listeners:
+            try:
+                # wakes up the thread blocked in accept()
+                listener.shutdown(socket.SHUT_RDWR)
+            except (OSError, socket.error):
+                pass
+            listener.close()
+        self._listeners = []
+        for printer_queue in self.queues.values():
+            if printer_queue.is_alive():
+                printer_queue.stop()
+
+    def _accept(self, listener, printer_queue):
+        while not self._stopped.is_set():
+            try:
+                client, peer = listener.accept()
+            except (OSError, socket.error):
+                return
+            if not self._clients.acquire(False):
+                logger.warning("Too many clients, rejecting %s", peer)
+                client.close()
+                continue
+            thread = threading.Thread(target=self._handle, args=(client, peer, printer_queue),
+                                      name="escpos-proxy-client")
+            thread.daemon = True
+            thread.start()
+
+    def _handle(self, client, peer, printer_queue):
+        """ Read one job from a client and feed it to the printer queue """
+        job = None
+        try:
+            client.settimeout(self.client_timeout)
+            while True:
+                try:
+                    data = client.recv(self.chunk_size)
+                except socket.timeout:
+                    break
+                if not data:
+                    break
+                if job is None:
+                    job = _Job(peer, self.max_chunks)
+                    printer_queue.jobs.put(job)
+                job.chunks.put(data)
+        except (OSError, socket.error) as e:
+            logger.warning("Connection to %s lost: %s", peer, e)
+        finally:
+            if job is not None:
+                job.chunks.put(None)
+            client.close()
+            self._clients.release()
@@ -0,0 +1,22 @@
+""" Printer simulators
+
+Local stand-ins for the transports in :py:mod:`escpos.printer`, for load and latency tests without hardware.
+All of them can throttle the consumption to a byte rate, add latency, cut the link and record what they receive.
+
+    * :py:class:`~escpos.simulator.network.NetworkPrinterSimulator`: TCP listener for
+      :py:class:`~escpos.printer.Network`
+    * :py:class:`~escpos.simulator.serialport.SerialPrinterSimulator`: pseudo-terminal pair for
+      :py:class:`~escpos.printer.Serial`
+    * :py:class:`~escpos.simulator.sink.FilePrinterSimulator`: named pipe for :py:class:`~escpos.printer.File`
+
+"""
+
+from __future__ import absolute_import
+
+from .model import Disconnect, PrinterModel
+from .network import NetworkPrinterSimulator
+from .serialport import SerialPrinterSimulator
+from .sink import FilePrinterSimulator
+
+__all__ = ["Disconnect", "PrinterModel", "NetworkPrinterSimulator", "SerialPrinterSimulator",
+           "FilePrinterSimulator"]
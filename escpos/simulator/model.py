@@ -0,0 +1,182 @@
+""" Simulated printer behaviour
+
+This module contains :py:class:`PrinterModel`, the part of the printer simulators that is shared by all stand-ins:
+it consumes the data at a limited rate, records it, answers status queries and injects latency and disconnects.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import threading
+import time
+
+import six
+
+from ..constants import DLE, EOT, GS
+
+
+class Disconnect(Exception):
+    """ Raised by :py:meth:`PrinterModel.consume` when the simulated link should be cut """
+
+
+class PrinterModel(object):
+    """ Behaviour of a simulated printer
+
+    The transport of a simulator passes every chunk it receives to :py:meth:`consume` and sends back what it returns.
+    """
+
+    def __init__(self, byte_rate=None, latency=0, disconnect_after=None, record=True, **status):
+        """
+        :param byte_rate: maximum number of bytes consumed per second, None for unlimited
+        :param latency: delay in seconds before every received chunk is processed
+        :param disconnect_after: cut the link after this many bytes of a connection, None to never do so
+        :param record: keep the received data in :py:attr:`received`
+        :param status: initial status fields, see :py:meth:`set_status`
+        """
+        self.byte_rate = byte_rate
+        self.latency = latency
+        self.disconnect_after = disconnect_after
+        self.record = record
+        self.received = bytearray()
+        self.bytes_received = 0
+        self.connections = 0
+        self.status = {
+            'online': True,
+            'cover_open': False,
+            'paper_feed': False,
+            'paper_near_end': False,
+            'paper_out': False,
+            'error': False,
+            'drawer': False,
+        }
+        self.status.update(status)
+        self.asb_enabled = False
+        self.on_asb = None
+        self._lock = threading.Lock()
+        self._tail = b''
+        self._connection_bytes = 0
+        self._rate_start = None
+        self._rate_bytes = 0
+
+    def connect(self):
+        """ Start a new connection, resets the per-connection counters """
+        with self._lock:
+            self.connections += 1
+            self._connection_bytes = 0
+            self._tail = b''
+            self._rate_start = None
+            self._rate_bytes = 0
+
+    def consume(self, data):
+        """ Process a chunk of received data
+
+        Blocks as long as needed to keep the byte rate and the latency.
+
+        :param data: the received bytes
+        :returns: bytes to send back to the client
+        :raises: :py:exc:`Disconnect` if the link should be cut. The part of the chunk up to the limit is recorded.
+        """
+        if self.latency:
+            time.sleep(self.latency)
+        disconnect = False
+        if self.disconnect_after is not None and self._connection_bytes + len(data) >= self.disconnect_after:
+            data = data[:max(0, self.disconnect_after - self._connection_bytes)]
+            disconnect = True
+        self._throttle(len(data))
+        with self._lock:
+            self._connection_bytes += len(data)
+            self.bytes_received += len(data)
+            if self.record:
+                self.received += data
+            response = self._parse(data)
+        if disconnect:
+            raise Disconnect()
+        return response
+
+    def _throttle(self, size):
+        if not self.byte_rate:
+            return
+        now = time.time()
+        if self._rate_start is None:
+            self._rate_start = now
+        self._rate_bytes += size
+        delay = self._rate_start + self._rate_bytes / self.byte_rate - now
+        if delay > 0:
+            time.sleep(delay)
+
+    def _parse(self, data):
+        """ Find status queries and ASB settings. Commands split over two chunks are recognized as well. """
+        data = self._tail + bytes(data)
+        response = b''
+        pos = data.find(DLE + EOT)
+        while pos != -1 and pos + 2 < len(data):
+            response += six.int2byte(self.status_byte(six.indexbytes(data, pos + 2)))
+            pos = data.find(DLE + EOT, pos + 3)
+        pos = data.find(GS + b'a')
+        while pos != -1 and pos + 2 < len(data):
+            self.asb_enabled = six.indexbytes(data, pos + 2) != 0
+            if self.asb_enabled:
+                response += self.asb_frame()
+            pos = data.find(GS + b'a', pos + 3)
+        self._tail = data[-2:]
+        return response
+
+    @property
+    def offline(self):
+        return not self.status['online'] or self.status['cover_open'] or self.status['paper_out']
+
+    def status_byte(self, n):
+        """ The answer to `DLE EOT n` for the current status
+
+        :param n: status type 1-4
+        :rtype: int
+        """
+        value = 0x12
+        status = self.status
+        if n == 1:
+            value |= (0x04 if status['drawer'] else 0) | (0x08 if self.offline else 0)
+        elif n == 2:
+            value |= (0x04 if status['cover_open'] else 0) | (0x08 if status['paper_feed'] else 0) | \
+                (0x20 if status['paper_out'] else 0) | (0x40 if status['error'] else 0)
+        elif n == 3:
+            value |= 0x20 if status['error'] else 0
+        elif n == 4:
+            value |= (0x0c if status['paper_near_end'] else 0) | (0x60 if status['paper_out'] else 0)
+        return value
+
+    def asb_frame(self):
+        """ The Automatic Status Back frame for the current status
+
+        :rtype: bytes
+        """
+        status = self.status
+        first = 0x10 | (0x04 if status['drawer'] else 0) | (0x08 if self.offline else 0) | \
+            (0x20 if status['cover_open'] else 0) | (0x40 if status['paper_feed'] else 0)
+        second = 0x20 if status['error'] else 0
+        third = (0x03 if status['paper_near_end'] else 0) | (0x0c if status['paper_out'] else 0)
+        return six.int2byte(first) + six.int2byte(second) + six.int2byte(third) + b'\x00'
+
+    def set_status(self, **status):
+        """ Change the simulated status
+
+        If ASB is enabled the new status is pushed to the client.
+
+        :param status: any of `online`, `cover_open`, `paper_feed`, `paper_near_end`, `paper_out`, `error` and
+            `drawer`
+        """
+        unknown = set(status) - set(self.status)
+        if unknown:
+            raise TypeError("Unknown status fields: {0}".format(", ".join(unknown)))
+        with self._lock:
+            self.status.update(status)
+            frame = self.asb_frame() if self.asb_enabled else None
+        if frame is not None and self.on_asb is not None:
+            self.on_asb(frame)
+
+    def reset(self):
+        """ Forget the recorded data """
+        with self._lock:
+            self.received = bytearray()
+            self.bytes_received = 0
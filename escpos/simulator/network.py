@@ -0,0 +1,121 @@
+""" Simulated network printer
+
+This module contains :py:class:`NetworkPrinterSimulator`, a TCP listener to be used with
+:py:class:`escpos.printer.Network`.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import socket
+import threading
+
+from .model import Disconnect, PrinterModel
+
+
+class NetworkPrinterSimulator(object):
+    """ TCP stand-in for a network printer
+
+    Like most network printers it serves one connection at a time, further clients wait in the backlog.
+
+    .. code-block:: Python
+
+        with NetworkPrinterSimulator(byte_rate=20000) as sim:
+            p = printer.Network(sim.host, sim.port)
+            ...
+        sim.model.received
+
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, chunk_size=4096, **kwargs):
+        """
+        :param host: address to listen on
+        :param port: port to listen on, `0` lets the system choose a free one
+        :param chunk_size: number of bytes read from the socket at once
+        :param kwargs: passed to :py:class:`~escpos.simulator.model.PrinterModel`
+        """
+        self.host = host
+        self.port = port
+        self.chunk_size = chunk_size
+        self.model = PrinterModel(**kwargs)
+        self.model.on_asb = self._send_asb
+        self._listener = None
+        self._client = None
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        """ Start listening in a background thread
+
+        :returns: self
+        """
+        self._listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._listener.bind((self.host, self.port))
+        self._listener.listen(8)
+        self.port = self._listener.getsockname()[1]
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._serve, name="escpos-sim-network")
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """ Close the listener and the current connection """
+        self._stopped.set()
+        for sock in (self._listener, self._client):
+            if sock is not None:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except (OSError, socket.error):
+                    pass
+                sock.close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def disconnect(self):
+        """ Drop the current connection, as if the cable was pulled """
+        client = self._client
+        if client is not None:
+            try:
+                client.shutdown(socket.SHUT_RDWR)
+            except (OSError, socket.error):
+                pass
+
+    def _send_asb(self, frame):
+        client = self._client
+        if client is not None:
+            try:
+                client.sendall(frame)
+            except (OSError, socket.error):
+                pass
+
+    def _serve(self):
+        while not self._stopped.is_set():
+            try:
+                client, _ = self._listener.accept()
+            except (OSError, socket.error):
+                return
+            self._client = client
+            self.model.connect()
+            try:
+                while True:
+                    data = client.recv(self.chunk_size)
+                    if not data:
+                        break
+                    response = self.model.consume(data)
+                    if response:
+                        client.sendall(response)
+            except (Disconnect, OSError, socket.error):
+                pass
+            finally:
+                self._client = None
+                client.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, type, value, traceback):
+        self.stop()
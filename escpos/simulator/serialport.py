@@ -0,0 +1,109 @@
+""" Simulated serial printer
+
+This module contains :py:class:`SerialPrinterSimulator`, a pseudo-terminal pair to be used with
+:py:class:`escpos.printer.Serial`. Only available on POSIX systems.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import os
+import select
+import threading
+
+from .model import Disconnect, PrinterModel
+
+
+class SerialPrinterSimulator(object):
+    """ Pseudo-terminal stand-in for a serial printer
+
+    :py:attr:`port` is the device file to pass to :py:class:`escpos.printer.Serial`. A disconnect closes the
+    pseudo-terminal, so further writes of the client fail like with an unplugged adapter.
+
+    .. code-block:: Python
+
+        with SerialPrinterSimulator(byte_rate=960) as sim:
+            p = printer.Serial(sim.port, dsrdtr=False)
+            ...
+
+    """
+
+    def __init__(self, chunk_size=4096, **kwargs):
+        """
+        :param chunk_size: number of bytes read from the terminal at once
+        :param kwargs: passed to :py:class:`~escpos.simulator.model.PrinterModel`
+        """
+        self.chunk_size = chunk_size
+        self.model = PrinterModel(**kwargs)
+        self.model.on_asb = self._send
+        self.port = None
+        self._master = None
+        self._slave = None
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        """ Create the terminal pair and start reading in a background thread
+
+        :returns: self
+        """
+        import tty
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._master)
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+        self.model.connect()
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._serve, name="escpos-sim-serial")
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """ Stop reading and close the terminal pair """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.disconnect()
+        if self._slave is not None:
+            os.close(self._slave)
+            self._slave = None
+
+    def disconnect(self):
+        """ Close the terminal, as if the adapter was unplugged """
+        self._stopped.set()
+        if self._master is not None:
+            os.close(self._master)
+            self._master = None
+
+    def _send(self, data):
+        if self._master is not None:
+            os.write(self._master, data)
+
+    def _serve(self):
+        while not self._stopped.is_set():
+            master = self._master
+            if master is None:
+                return
+            try:
+                readable, _, _ = select.select([master], [], [], 0.1)
+                if not readable:
+                    continue
+                data = os.read(master, self.chunk_size)
+            except (OSError, ValueError):
+                return
+            try:
+                response = self.model.consume(data)
+            except Disconnect:
+                self.disconnect()
+                return
+            if response:
+                self._send(response)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, type, value, traceback):
+        self.stop()
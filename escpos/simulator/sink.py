@@ -0,0 +1,121 @@
+""" Simulated device file
+
+This module contains :py:class:`FilePrinterSimulator`, a named pipe to be used with :py:class:`escpos.printer.File`.
+Only available on POSIX systems.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import os
+import select
+import shutil
+import tempfile
+import threading
+
+from .model import Disconnect, PrinterModel
+
+
+class FilePrinterSimulator(object):
+    """ Named pipe stand-in for a device file
+
+    :py:attr:`path` is the device file to pass to :py:class:`escpos.printer.File`. Since the pipe only carries data to
+    the printer, status queries are recorded but can not be answered. A disconnect closes the reading end, so the
+    next write of the client fails with a broken pipe.
+
+    .. code-block:: Python
+
+        with FilePrinterSimulator(byte_rate=100000) as sim:
+            p = printer.File(sim.path)
+            ...
+
+    """
+
+    def __init__(self, chunk_size=4096, reconnect_delay=0.5, **kwargs):
+        """
+        :param chunk_size: number of bytes read from the pipe at once
+        :param reconnect_delay: seconds the pipe stays without reader after a disconnect
+        :param kwargs: passed to :py:class:`~escpos.simulator.model.PrinterModel`
+        """
+        self.chunk_size = chunk_size
+        self.reconnect_delay = reconnect_delay
+        self.model = PrinterModel(**kwargs)
+        self.path = None
+        self._directory = None
+        self._thread = None
+        self._stopped = threading.Event()
+        self._disconnecting = threading.Event()
+
+    def start(self):
+        """ Create the pipe and start reading in a background thread
+
+        :returns: self
+        """
+        self._directory = tempfile.mkdtemp(prefix='escpos-sim-')
+        self.path = os.path.join(self._directory, 'lp0')
+        os.mkfifo(self.path)
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._serve, name="escpos-sim-file")
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        """ Stop reading and remove the pipe
+
+        :param timeout: seconds to wait for the reading thread
+        """
+        self._stopped.set()
+        # a reader blocked in open() only returns once a writer shows up
+        try:
+            fd = os.open(self.path, os.O_WRONLY | os.O_NONBLOCK)
+            os.close(fd)
+        except OSError:
+            pass
+        if self._thread is not None:
+            self._thread.join(timeout)
+        shutil.rmtree(self._directory, ignore_errors=True)
+
+    def disconnect(self):
+        """ Close the reading end of the pipe
+
+        The reading thread closes it the next time it checks, within 0.1 seconds.
+        """
+        self._disconnecting.set()
+
+    def _serve(self):
+        while not self._stopped.is_set():
+            # every open of the pipe by a writer is one connection
+            fd = os.open(self.path, os.O_RDONLY)
+            if self._stopped.is_set():
+                os.close(fd)
+                break
+            self._disconnecting.clear()
+            self.model.connect()
+            try:
+                while not self._stopped.is_set():
+                    if self._disconnecting.is_set():
+                        raise Disconnect()
+                    readable, _, _ = select.select([fd], [], [], 0.1)
+                    if not readable:
+                        continue
+                    data = os.read(fd, self.chunk_size)
+                    if not data:
+                        break
+                    self.model.consume(data)
+            except (Disconnect, OSError):
+                os.close(fd)
+                fd = None
+                # stay away long enough for the writer to notice
+                self._stopped.wait(self.reconnect_delay)
+            finally:
+                if fd is not None:
+                    os.close(fd)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, type, value, traceback):
+        self.stop()
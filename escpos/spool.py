@@ -0,0 +1,386 @@
+""" Crash-safe print spool
+
+This module contains the persistent spool :py:class:`Spool`, its consumer side :py:class:`SpoolReader` and the
+:py:class:`SpoolWriter` process that drains the spool to a printer.
+
+Jobs are appended to a log that is split into segment files. Every job is stored as one record::
+
+    <length: uint32> <crc32: uint32> <job id: uint64> <payload>
+
+Records are written with a single call and flushed to disk in batches by a background thread, so enqueueing a
+job only costs a buffered write. Incomplete records at the end of the log are detected by their length and
+checksum and cut off when the spool is opened again. The reader keeps a cursor file that is replaced atomically
+after a job has been sent, so after a restart the writer resumes with the first job that was not acknowledged.
+
+Example:
+
+.. code-block:: Python
+
+    spool = Spool('/var/spool/escpos')
+    writer = SpoolWriter('/var/spool/escpos', {'type': 'network', 'host': '192.168.1.100'})
+    writer.start()
+    spool.enqueue(job_bytes)
+
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import multiprocessing
+import os
+import struct
+import threading
+import zlib
+
+from .exceptions import TransferError
+from .transfer import RetryPolicy
+
+RECORD_HEADER = struct.Struct('<IIQ')
+CURSOR = struct.Struct('<QQQ')
+
+SEGMENT_PREFIX = 'segment-'
+SEGMENT_SUFFIX = '.log'
+CURSOR_FILE = 'cursor'
+
+
+def _segment_name(index):
+    return '{0}{1:010d}{2}'.format(SEGMENT_PREFIX, index, SEGMENT_SUFFIX)
+
+
+def _list_segments(path):
+    """ Return the indices of all segment files in the spool directory, sorted """
+    indices = []
+    for name in os.listdir(path):
+        if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+            indices.append(int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]))
+    return sorted(indices)
+
+
+def _fsync_dir(path):
+    """ Persist directory entries (new or renamed files), where the platform supports it """
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def read_record(segment_file):
+    """ Read the next record of a segment file
+
+    :param segment_file: segment opened in binary mode, positioned at the start of a record
+    :returns: tuple of job id and payload, or None if there is no complete and valid record at this position.
+        In that case the position of the file is not advanced.
+    """
+    start = segment_file.tell()
+    header = segment_file.read(RECORD_HEADER.size)
+    if len(header) == RECORD_HEADER.size:
+        length, crc, job_id = RECORD_HEADER.unpack(header)
+        payload = segment_file.read(length)
+        if len(payload) == length and zlib.crc32(payload) & 0xffffffff == crc:
+            return job_id, payload
+    segment_file.seek(start)
+    return None
+
+
+def read_cursor(path):
+    """ Read the position of the first unacknowledged job
+
+    :param path: spool directory
+    :returns: tuple of segment index, offset in that segment and id of the last acknowledged job
+    """
+    try:
+        with open(os.path.join(path, CURSOR_FILE), 'rb') as cursor_file:
+            data = cursor_file.read()
+    except EnvironmentError:
+        return 0, 0, 0
+    if len(data) != CURSOR.size:
+        return 0, 0, 0
+    return CURSOR.unpack(data)
+
+
+class Spool(object):
+    """ Producer side of the spool
+
+    Only one process should append to a spool directory at a time. Enqueueing is thread-safe.
+    """
+
+    def __init__(self, path, segment_size=16 * 1024 * 1024, sync_interval=0.05, sync_batch=64):
+        """
+        :param path: spool directory, created if missing
+        :param segment_size: a new segment file is started once the current one is larger than this
+        :param sync_interval: maximum time in seconds an enqueued job waits before it is flushed to disk
+        :param sync_batch: number of jobs after which the flush is started early
+        """
+        self.path = path
+        self.segment_size = segment_size
+        self.sync_interval = sync_interval
+        self.sync_batch = sync_batch
+
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._wakeup = threading.Event()
+        self._closed = False
+
+        self._segment_index, self._next_id = self._recover()
+        self._segment = open(os.path.join(path, _segment_name(self._segment_index)), 'ab')
+
+        self._flusher = threading.Thread(target=self._flush_loop, name="escpos-spool-sync")
+        self._flusher.daemon = True
+        self._flusher.start()
+
+    def _recover(self):
+        """ Find the last segment and the next job id, and cut off a torn record at the end of the log """
+        segment_index, _, last_acked = read_cursor(self.path)
+        next_id = last_acked + 1
+        segments = _list_segments(self.path)
+        if segments:
+            segment_index = segments[-1]
+        for index in reversed(segments):
+            last_id = 0
+            with open(os.path.join(self.path, _segment_name(index)), 'r+b') as segment_file:
+                record = read_record(segment_file)
+                while record is not None:
+                    last_id = record[0]
+                    record = read_record(segment_file)
+                if index == segment_index:
+                    segment_file.truncate(segment_file.tell())
+                    segment_file.flush()
+                    os.fsync(segment_file.fileno())
+            if last_id:
+                next_id = max(next_id, last_id + 1)
+                break
+        return segment_index, next_id
+
+    def enqueue(self, data):
+        """ Append a job to the spool
+
+        The job is durable at the latest `sync_interval` seconds after this call returns, or after :py:meth:`sync`.
+
+        :param data: the complete ESC/POS job
+        :type data: bytes
+        :returns: id of the job
+        """
+        data = bytes(data)
+        with self._lock:
+            if self._closed:
+                raise ValueError("Spool is closed")
+            job_id = self._next_id
+            self._next_id += 1
+            self._segment.write(RECORD_HEADER.pack(len(data), zlib.crc32(data) & 0xffffffff, job_id) + data)
+            self._pending += 1
+            if self._segment.tell() >= self.segment_size:
+                self._rotate()
+        if self._pending >= self.sync_batch:
+            self._wakeup.set()
+        return job_id
+
+    def _rotate(self):
+        """ Persist the current segment and start the next one. Called with the lock held. """
+        self._sync_locked()
+        self._segment.close()
+        self._segment_index += 1
+        self._segment = open(os.path.join(self.path, _segment_name(self._segment_index)), 'ab')
+        _fsync_dir(self.path)
+
+    def _sync_locked(self):
+        if self._pending:
+            self._segment.flush()
+            os.fsync(self._segment.fileno())
+            self._pending = 0
+
+    def sync(self):
+        """ Flush all enqueued jobs to disk """
+        with self._lock:
+            if not self._closed:
+                self._sync_locked()
+
+    def _flush_loop(self):
+        while not self._closed:
+            self._wakeup.wait(self.sync_interval)
+            self._wakeup.clear()
+            self.sync()
+
+    def close(self):
+        """ Flush the spool and stop the background thread """
+        self.sync()
+        with self._lock:
+            self._closed = True
+            self._segment.close()
+        self._wakeup.set()
+        self._flusher.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+
+class SpoolReader(object):
+    """ Consumer side of the spool
+
+    Reads the jobs in order starting at the cursor. Only one reader may consume a spool directory at a time.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: spool directory
+        """
+        self.path = path
+        self._segment_index, offset, self.last_acked = read_cursor(path)
+        segments = _list_segments(path)
+        if segments and self._segment_index not in segments:
+            # The cursor points to a segment that was already consumed and deleted
+            self._segment_index, offset = segments[0], 0
+        self._segment = None
+        self._open_segment(offset)
+
+    def _open_segment(self, offset):
+        if self._segment is not None:
+            self._segment.close()
+        try:
+            self._segment = open(os.path.join(self.path, _segment_name(self._segment_index)), 'rb')
+            self._segment.seek(offset)
+        except EnvironmentError:
+            self._segment = None
+
+    def next_job(self):
+        """ Return the next unacknowledged job
+
+        Calling this again without :py:meth:`ack` returns the following job, so the caller has to acknowledge the
+        jobs in the order they were read.
+
+        :returns: tuple of job id and payload, or None if the spool is drained
+        """
+        while True:
+            if self._segment is None:
+                self._open_segment(0)
+                if self._segment is None:
+                    return None
+            record = read_record(self._segment)
+            if record is not None:
+                job_id, payload = record
+                if job_id > self.last_acked:
+                    return job_id, payload
+                continue
+            if not any(index > self._segment_index for index in _list_segments(self.path)):
+                # The producer may still be writing to this segment
+                return None
+            # The producer moved on, whatever is left here is a torn record
+            self._segment_index += 1
+            self._open_segment(0)
+
+    def ack(self, job_id):
+        """ Mark all jobs up to `job_id` as sent and persist the cursor
+
+        :param job_id: id of the last job that was sent
+        """
+        self.last_acked = job_id
+        offset = self._segment.tell() if self._segment is not None else 0
+        tmp_path = os.path.join(self.path, CURSOR_FILE + '.tmp')
+        with open(tmp_path, 'wb') as cursor_file:
+            cursor_file.write(CURSOR.pack(self._segment_index, offset, job_id))
+            cursor_file.flush()
+            os.fsync(cursor_file.fileno())
+        os.replace(tmp_path, os.path.join(self.path, CURSOR_FILE))
+        for index in _list_segments(self.path):
+            if index < self._segment_index:
+                os.remove(os.path.join(self.path, _segment_name(index)))
+
+    def close(self):
+        if self._segment is not None:
+            self._segment.close()
+            self._segment = None
+
+
+def _build_printer(printer_config):
+    """ Create a printer from a configuration section like the `printer:` section of the config file """
+    from .config import Config
+    return Config.build_printer(printer_config)
+
+
+class SpoolWriter(multiprocessing.Process):
+    """ Process that drains a spool to a printer
+
+    The printer is created inside the process from a configuration section with
+    :py:meth:`escpos.config.Config.build_printer`. A job is acknowledged after it was handed to the transport; if the
+    process dies before that, the job is sent again after a restart.
+
+    When sending fails, the printer is closed and created again after the delay of the
+    :py:class:`~escpos.transfer.RetryPolicy`, and the job is sent again. When the policy gives up, the process ends
+    with a :py:exc:`~escpos.exceptions.TransferError` and the job stays in the spool.
+    """
+
+    def __init__(self, path, printer_config, poll_interval=0.05, policy=None):
+        """
+        :param path: spool directory
+        :param printer_config: dictionary with the printer `type` and the arguments of its class, e.g.
+            ``{'type': 'network', 'host': '192.168.1.100'}``
+        :param poll_interval: time in seconds to wait before looking for new jobs when the spool is drained
+        :param policy: the :py:class:`~escpos.transfer.RetryPolicy`, defaults to the default policy
+        """
+        multiprocessing.Process.__init__(self, name="escpos-spool-writer")
+        self.daemon = True
+        self.path = path
+        self.printer_config = printer_config
+        self.poll_interval = poll_interval
+        self.policy = policy or RetryPolicy()
+        self._stopped = multiprocessing.Event()
+
+    def stop(self, timeout=None):
+        """ Ask the process to stop after the current job and wait for it
+
+        :param timeout: maximum time to wait in seconds
+        """
+        self._stopped.set()
+        self.join(timeout)
+
+    @staticmethod
+    def _close(printer):
+        try:
+            printer.close()
+        except EnvironmentError:
+            pass
+
+    def run(self):
+        reader = SpoolReader(self.path)
+        printer = None
+        job = None
+        failures = 0
+        try:
+            while not self._stopped.is_set():
+                if job is None:
+                    job = reader.next_job()
+                    if job is None:
+                        self._stopped.wait(self.poll_interval)
+                        continue
+                job_id, payload = job
+                try:
+                    if printer is None:
+                        printer = _build_printer(self.printer_config)
+                    printer._raw(payload)
+                except self.policy.errors as e:
+                    failures += 1
+                    delay = self.policy.delay_before(failures)
+                    if printer is not None:
+                        self._close(printer)
+                        printer = None
+                    if delay is None:
+                        raise TransferError("spooled job {0} was not sent: {1}".format(job_id, e))
+                    self._stopped.wait(delay)
+                    continue
+                failures = 0
+                reader.ack(job_id)
+                job = None
+        finally:
+            reader.close()
+            if printer is not None:
+                self._close(printer)
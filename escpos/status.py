@@ -0,0 +1,309 @@
+""" Printer status tracking
+
+This module contains the status snapshot :py:class:`PrinterStatus`, the parsers for real-time (`DLE EOT`) and
+Automatic Status Back (`GS a`) replies and the background :py:class:`StatusPoller`.
+
+Example:
+
+.. code-block:: Python
+
+    poller = StatusPoller(printer.Network('192.168.1.100'))
+    poller.start()
+    if not poller.ready:
+        # skip or reroute the job instead of waiting for the socket timeout
+        ...
+
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import collections
+import threading
+import time
+
+import six
+
+from .constants import *
+
+
+class PrinterStatus(object):
+    """ Snapshot of the printer state
+
+    Every field is `None` as long as it is unknown. Snapshots are never modified, :py:meth:`update` returns a new
+    one, so a snapshot can be handed to other threads without locking.
+    """
+    _fields = ('online', 'cover_open', 'paper_feed', 'paper_near_end', 'paper_out', 'error', 'drawer')
+
+    def __init__(self, timestamp=None, **kwargs):
+        """
+        :param timestamp: time of the update, defaults to now
+        :param kwargs: values of the status fields
+        """
+        for field in self._fields:
+            setattr(self, field, kwargs.pop(field, None))
+        if kwargs:
+            raise TypeError("Unknown status fields: {0}".format(", ".join(kwargs)))
+        self.timestamp = time.time() if timestamp is None else timestamp
+
+    def update(self, **kwargs):
+        """ Return a new snapshot with the given fields replaced """
+        values = self.as_dict()
+        values.update(kwargs)
+        return PrinterStatus(**values)
+
+    def as_dict(self):
+        """ Return the status fields as dictionary """
+        return dict((field, getattr(self, field)) for field in self._fields)
+
+    @property
+    def ready(self):
+        """ True if the printer is known to be online and able to print """
+        return self.online is True and not self.cover_open and not self.paper_out and not self.error
+
+    def __eq__(self, other):
+        return isinstance(other, PrinterStatus) and self.as_dict() == other.as_dict()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "PrinterStatus({0})".format(", ".join(
+            "{0}={1!r}".format(field, getattr(self, field)) for field in self._fields))
+
+
+def parse_rt_status(mode, value):
+    """ Translate the answer to a real-time status query into status fields
+
+    :param mode: the `RT_STATUS_*` command that was sent
+    :param value: status byte received from the printer
+    :returns: dictionary with the fields known from this answer
+    """
+    if mode == RT_STATUS_PRINTER:
+        return {
+            'online': not value & RT_MASK_OFFLINE,
+            'drawer': bool(value & RT_MASK_DRAWER),
+        }
+    if mode == RT_STATUS_OFFLINE:
+        return {
+            'cover_open': bool(value & RT_MASK_COVER_OPEN),
+            'paper_feed': bool(value & RT_MASK_FEED_BUTTON),
+            'error': bool(value & RT_MASK_ERROR),
+        }
+    if mode == RT_STATUS_ERROR:
+        return {
+            'error': bool(value & (RT_MASK_CUTTER_ERROR | RT_MASK_UNRECOVERABLE_ERROR | RT_MASK_AUTORECOVER_ERROR)),
+        }
+    if mode == RT_STATUS_PAPER:
+        return {
+            'paper_near_end': bool(value & RT_MASK_PAPER_NEAR_END),
+            'paper_out': bool(value & RT_MASK_PAPER_END),
+        }
+    raise ValueError("Unknown real-time status command")
+
+
+def parse_asb(frame):
+    """ Translate an Automatic Status Back frame into status fields
+
+    :param frame: the four status bytes sent by the printer
+    :returns: dictionary with all status fields
+    """
+    first, second, third, _ = six.iterbytes(frame)
+    return {
+        'drawer': bool(first & 0x04),
+        'online': not first & 0x08,
+        'cover_open': bool(first & 0x20),
+        'paper_feed': bool(first & 0x40),
+        'error': bool(second & 0x68),
+        'paper_near_end': bool(third & 0x03),
+        'paper_out': bool(third & 0x0c),
+    }
+
+
+def next_reply(buf):
+    """ Take the next Automatic Status Back frame or real-time status byte from a receive buffer
+
+    The two can be told apart by their fixed bits. Bytes that start neither are discarded.
+
+    :param buf: receive buffer, it is consumed in place
+    :type buf: bytearray
+    :returns: ``('asb', frame)``, ``('rt', value)`` or None if the buffer does not contain a complete reply
+    """
+    while buf:
+        first = buf[0]
+        if first & RT_FIXED_MASK == RT_FIXED_VALUE:
+            del buf[:1]
+            return 'rt', first
+        if first & ASB_FIXED_MASK == ASB_FIXED_VALUE:
+            if len(buf) < 4:
+                return None
+            if all(b & ASB_TAIL_MASK == 0 for b in buf[1:4]):
+                frame = bytes(buf[:4])
+                del buf[:4]
+                return 'asb', frame
+        del buf[:1]
+    return None
+
+
+class StatusPoller(threading.Thread):
+    """ Keeps a cached status of a printer up to date in the background
+
+    Two modes are supported:
+
+        * `asb`: Automatic Status Back is enabled once and the poller only reads from the device afterwards. This
+          never injects data into the output stream and is the mode to use while jobs are sent.
+        * `dle`: `DLE EOT` queries are sent every `interval` seconds. Use this for printers without ASB support. A
+          query is only sent while no data is written (see :py:meth:`~escpos.escpos.Escpos.job`), a poll that
+          finds the printer busy is skipped.
+
+    While the poller runs, it is the only reader of the device: :py:meth:`~escpos.escpos.Escpos.query_status` of the
+    printer is answered through :py:meth:`query_status`.
+
+    Callers never block on the device: :py:attr:`status` and :py:attr:`ready` return the cached state immediately.
+    """
+
+    def __init__(self, printer, mode='asb', interval=1.0, timeout=0.5, on_change=None):
+        """
+        :param printer: An Escpos-printer object that implements `_read()`
+        :param mode: `asb` or `dle`, see above
+        :param interval: seconds between two polls in `dle` mode and maximum blocking time of a read in `asb` mode
+        :param timeout: time to wait for the answer of a single query in `dle` mode
+        :param on_change: optional callable, called from the poller thread with the new
+            :py:class:`PrinterStatus` whenever the state changes
+        """
+        if mode not in ('asb', 'dle'):
+            raise ValueError("mode must be either 'asb' or 'dle'")
+        threading.Thread.__init__(self, name="escpos-status")
+        self.daemon = True
+        self.printer = printer
+        self.mode = mode
+        self.interval = interval
+        self.timeout = timeout
+        self.on_change = on_change
+        self.last_error = None
+        self._status = PrinterStatus(timestamp=0)
+        self._changed = threading.Condition()
+        self._stopped = threading.Event()
+        self._buffer = bytearray()
+        # one query at a time, its answer is handed over by the poller thread in `asb` mode
+        self._query_lock = threading.Lock()
+        self._replies = collections.deque()
+        self._replied = threading.Condition()
+
+    @property
+    def status(self):
+        """ The latest :py:class:`PrinterStatus` """
+        return self._status
+
+    @property
+    def ready(self):
+        """ True if the latest status says the printer is able to print """
+        return self._status.ready
+
+    def wait_ready(self, timeout=None):
+        """ Wait until the printer becomes ready
+
+        :param timeout: maximum time to wait in seconds, None to wait forever
+        :returns: True if the printer is ready
+        """
+        with self._changed:
+            return self._changed.wait_for(lambda: self._status.ready, timeout)
+
+    def start(self):
+        """ Start polling, status queries of the printer go through the poller from now on """
+        self.printer.status_poller = self
+        threading.Thread.start(self)
+
+    def query_status(self, mode, timeout=1):
+        """ Send a real-time status query for another thread, see :py:meth:`~escpos.escpos.Escpos.query_status`
+
+        :returns: the status byte as integer, or None if the printer did not answer in time
+        """
+        with self._query_lock:
+            if self.mode == 'dle' or not self.is_alive():
+                return self.printer._query_status(mode, timeout)
+            with self._replied:
+                self._replies.clear()
+            if not self.printer.transport_lock.acquire(timeout=timeout):
+                return None
+            try:
+                self.printer._raw(mode)
+            finally:
+                self.printer.transport_lock.release()
+            with self._replied:
+                if not self._replied.wait_for(lambda: self._replies, timeout):
+                    return None
+                return self._replies.popleft()
+
+    def stop(self, timeout=None):
+        """ Stop polling and wait for the thread to finish
+
+        :param timeout: maximum time to wait for the thread in seconds
+        """
+        self._stopped.set()
+        if self.is_alive():
+            self.join(timeout)
+        if self.mode == 'asb' and self.last_error is None:
+            self.printer.automatic_status_back(False)
+
+    def run(self):
+        try:
+            if self.mode == 'asb':
+                self.printer.automatic_status_back(True)
+            while not self._stopped.is_set():
+                if self.mode == 'asb':
+                    self._poll_asb()
+                else:
+                    self._poll_dle()
+                    self._stopped.wait(self.interval)
+        except Exception as e:
+            self.last_error = e
+            self._publish(PrinterStatus(online=False))
+        finally:
+            if self.printer.status_poller is self:
+                self.printer.status_poller = None
+
+    def _poll_asb(self):
+        """ Read pending ASB frames and publish them, hand real-time status bytes to the waiting query """
+        self._buffer.extend(self.printer._read(self.interval))
+        reply = next_reply(self._buffer)
+        while reply is not None:
+            kind, value = reply
+            if kind == 'asb':
+                self._publish(self._status.update(**parse_asb(value)))
+            else:
+                with self._replied:
+                    self._replies.append(value)
+                    self._replied.notify_all()
+            reply = next_reply(self._buffer)
+
+    def _poll_dle(self):
+        """ Query printer status, offline cause and paper sensor and publish the result
+
+        Nothing is sent while a job is written, the poll is skipped then. The answers are read after the transport
+        is released, so a job does not wait for them.
+        """
+        modes = (RT_STATUS_PRINTER, RT_STATUS_OFFLINE, RT_STATUS_PAPER)
+        with self._query_lock:
+            values = self.printer._query_statuses(modes, self.timeout, wait=False)
+        if values is None:
+            return
+        if len(values) < len(modes):
+            # No answer: the printer is switched off or disconnected
+            self._publish(PrinterStatus(online=False))
+            return
+        fields = {}
+        for mode, value in zip(modes, values):
+            fields.update(parse_rt_status(mode, value))
+        self._publish(PrinterStatus(**fields))
+
+    def _publish(self, status):
+        """ Replace the cached status and notify waiters and the callback on changes """
+        changed = status != self._status
+        with self._changed:
+            self._status = status
+            self._changed.notify_all()
+        if changed and self.on_change is not None:
+            self.on_change(status)
@@ -0,0 +1,258 @@
+""" Resumable transfers
+
+This module contains :py:class:`ResumableJob`, a print job that is split into segments at command boundaries, and
+:py:class:`ResumableSender`, which sends such jobs segment by segment. When the link fails, the sender reconnects
+according to its :py:class:`RetryPolicy` and resumes with the first segment that was not acknowledged, so a command
+is never split and the part of the receipt that was already printed is not printed again.
+
+Example:
+
+.. code-block:: Python
+
+    job = ResumableJob('order-4711')
+    job.printer.text('Hello\\n')
+    job.printer.image('logo.png')
+    job.printer.cut()
+
+    sender = ResumableSender(printer.Network('192.168.1.100'), RetryPolicy(attempts=10))
+    sender.send(job)
+
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import collections
+import time
+import uuid
+
+from .constants import PUBLIC_COMMANDS, RT_STATUS_PRINTER
+from .exceptions import TransferError
+from .instrument import wrap_commands
+from .printer import Dummy
+
+# Commands that set an absolute printer state, their last output is sent again before a resumed segment
+STATE_COMMANDS = ('set', 'charcode', 'line_spacing')
+
+
+class RetryPolicy(object):
+    """ How often and how fast a failed transfer is retried
+
+    The delays grow exponentially: ``delay``, ``delay * backoff``, ... up to ``max_delay``.
+    """
+
+    def __init__(self, attempts=5, delay=0.5, backoff=2.0, max_delay=30.0, errors=(EnvironmentError,)):
+        """
+        :param attempts: number of reconnects after consecutive failures, before the transfer is given up
+        :param delay: seconds to wait before the first reconnect
+        :param backoff: factor the delay grows with every further failure
+        :param max_delay: upper limit of the delay in seconds
+        :param errors: exception classes that are treated as link failures. The default covers socket, serial and
+            USB errors.
+        """
+        self.attempts = attempts
+        self.delay = delay
+        self.backoff = backoff
+        self.max_delay = max_delay
+        self.errors = errors
+
+    def delay_before(self, failures):
+        """ Delay before the reconnect after a number of consecutive failures
+
+        :param failures: number of consecutive failures, starting with 1
+        :returns: the delay in seconds, or None if no further attempt is allowed
+        """
+        if failures > self.attempts:
+            return None
+        return min(self.delay * self.backoff ** (failures - 1), self.max_delay)
+
+
+class ResumableJob(object):
+    """ A print job split into segments at command boundaries
+
+    Commands are issued on :py:attr:`printer`, a :py:class:`~escpos.printer.Dummy`. Every completed command call ends a
+    segment with :py:meth:`~escpos.printer.Dummy.mark`, this includes the fragments of large images. The progress of
+    the transfer is kept in the job, so it can be stored with :py:meth:`checkpoint` and continued later, also by
+    another process.
+    """
+
+    def __init__(self, job_id=None):
+        """
+        :param job_id: identifier used to not print a job twice, a random one is generated by default
+        """
+        self.job_id = job_id or uuid.uuid4().hex
+        self.printer = Dummy()
+        self.acked = 0
+        self._state = collections.OrderedDict()
+        self._states = {}
+        self._segments = None
+        self._offsets = None
+        wrap_commands(self.printer, self._marking, self, PUBLIC_COMMANDS)
+
+    def _marking(self, name, method):
+        printer = self.printer
+
+        def wrapper(*args, **kwargs):
+            start = len(printer)
+            result = method(*args, **kwargs)
+            if name in STATE_COMMANDS:
+                with printer.getbuffer() as data:
+                    self._state[name] = data[start:].tobytes()
+            # state in effect for the segment starting here
+            self._states[printer.mark()] = b''.join(self._state.values())
+            return result
+        return wrapper
+
+    def finish(self):
+        """ End the job, no more commands can be added
+
+        Called by the sender before the first segment is sent.
+        """
+        if self._segments is not None:
+            return
+        self._segments = self.printer.segments()
+        self._offsets = []
+        offset = 0
+        for segment in self._segments:
+            self._offsets.append(offset)
+            offset += len(segment)
+
+    @property
+    def segments(self):
+        """ The segments of the finished job
+
+        :rtype: list of memoryview
+        """
+        self.finish()
+        return self._segments
+
+    @property
+    def done(self):
+        return self.acked >= len(self.segments)
+
+    @property
+    def offset(self):
+        """ Number of bytes acknowledged by the printer """
+        self.finish()
+        if self.done:
+            return sum(len(segment) for segment in self._segments)
+        return self._offsets[self.acked]
+
+    def resume_state(self, segment):
+        """ Output of the state commands issued before a segment
+
+        :param segment: index of the segment
+        :rtype: bytes
+        """
+        self.finish()
+        return self._states.get(self._offsets[segment], b'')
+
+    def checkpoint(self):
+        """ Progress of the transfer as JSON-serializable dictionary """
+        return {'job_id': self.job_id, 'segment': self.acked, 'offset': self.offset}
+
+    def restore(self, checkpoint):
+        """ Continue from a checkpoint
+
+        :param checkpoint: dictionary returned by :py:meth:`checkpoint` of the same job
+        """
+        if checkpoint['job_id'] != self.job_id:
+            raise ValueError("Checkpoint belongs to job {0}".format(checkpoint['job_id']))
+        self.finish()
+        if self._offsets and checkpoint['segment'] < len(self._offsets) \
+                and self._offsets[checkpoint['segment']] != checkpoint['offset']:
+            raise ValueError("Checkpoint does not match the segments of the job")
+        self.acked = checkpoint['segment']
+
+
+class ResumableSender(object):
+    """ Sends :py:class:`ResumableJob` to a printer and resumes after link failures
+
+    A segment counts as acknowledged when the transport accepted it or, with `confirm`, when the printer answered a
+    real-time status request after it. Real-time requests are answered as soon as they are received, so the answer
+    proves that the bytes before reached the printer, not that they were printed. Without `confirm`, data buffered by
+    the operating system when a network link breaks is lost unnoticed.
+
+    The ids of the last completed jobs are remembered, sending one of them again does nothing.
+    """
+
+    def __init__(self, printer, policy=None, confirm=False, confirm_timeout=1, resume_prefix=b'',
+                 on_checkpoint=None, remember=1024):
+        """
+        :param printer: An Escpos-printer object with working `close()` and `open()`
+        :param policy: the :py:class:`RetryPolicy`, defaults to the default policy
+        :param confirm: acknowledge segments by querying the status of the printer, needs a transport that can read
+        :param confirm_timeout: seconds to wait for the status, a missing answer counts as link failure
+        :param resume_prefix: bytes sent after a reconnect, before the resumed segment, e.g. to discard a partly
+            received command on printers that keep it
+        :param on_checkpoint: callable that is called with :py:meth:`ResumableJob.checkpoint` after every
+            acknowledged segment, e.g. to persist the progress
+        :param remember: number of completed job ids that are remembered
+        """
+        self.printer = printer
+        self.policy = policy or RetryPolicy()
+        self.confirm = confirm
+        self.confirm_timeout = confirm_timeout
+        self.resume_prefix = resume_prefix
+        self.on_checkpoint = on_checkpoint
+        self.remember = remember
+        self.completed = collections.OrderedDict()
+        self.reconnects = 0
+
+    def _reconnect(self):
+        try:
+            self.printer.close()
+        except EnvironmentError:
+            pass
+        self.printer.open()
+        self.reconnects += 1
+
+    def _send_segment(self, job, resumed):
+        segment = job.segments[job.acked]
+        if resumed:
+            self.printer._raw(self.resume_prefix + job.resume_state(job.acked))
+        self.printer._raw(segment)
+        if self.confirm and self.printer.query_status(RT_STATUS_PRINTER, self.confirm_timeout) is None:
+            raise IOError("No status response from the printer")
+
+    def send(self, job):
+        """ Send the unacknowledged segments of a job
+
+        :param job: the :py:class:`ResumableJob`, it is finished if needed
+        :returns: False if the job was already completed, True otherwise
+        :raises: :py:exc:`~escpos.exceptions.TransferError` when the retry policy gives up, the job keeps its progress
+        """
+        if job.job_id in self.completed:
+            return False
+        job.finish()
+        # a job restored from a checkpoint continues on a fresh connection
+        resumed = job.acked > 0
+        connected = True
+        failures = 0
+        while not job.done:
+            try:
+                if not connected:
+                    self._reconnect()
+                    connected = True
+                    resumed = True
+                self._send_segment(job, resumed)
+            except self.policy.errors as e:
+                failures += 1
+                delay = self.policy.delay_before(failures)
+                if delay is None:
+                    raise TransferError("job {0} stopped at segment {1}/{2}: {3}".format(
+                        job.job_id, job.acked, len(job.segments), e))
+                connected = False
+                time.sleep(delay)
+                continue
+            resumed = False
+            failures = 0
+            job.acked += 1
+            if self.on_checkpoint is not None:
+                self.on_checkpoint(job.checkpoint())
+        self.completed[job.job_id] = True
+        while len(self.completed) > self.remember:
+            self.completed.popitem(last=False)
+        return True
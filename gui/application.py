@@ -1,9 +1,8 @@
+import functools
 import logging
 import sys
 import typing
 
-import importlib.resources
-
 from PyQt5.QtCore import (
     Qt, QRegExp, pyqtSignal, pyqtSlot
 )
@@ -16,11 +15,15 @@ from PyQt5.QtWidgets import (
     QWidget, QComboBox, QLineEdit, QCheckBox, QPushButton, QMessageBox
 )
 
+from escpos.discovery import local_networks
+
 from printer import (
     PRINTER_TYPES, SERIAL_BYTESIZES, SERIAL_PARITIES, SERIAL_STOPBITS,
-    PrinterBuilder, Printer
+    Printer
 )
 
+from gui.discovery import ConnectWorker, DiscoveryWorker
+from gui.preview import PreviewPane
 from gui.rightbar import RightBar
 from gui.tabs import Tabs
 
@@ -29,8 +32,10 @@ logger = logging.getLogger(__name__)
 
 
 class Resources(object):
-    """ Resources importlib loader """
+    """ Resources importlib loader, use resources() to share one instance """
     def __init__(self) -> None:
+        import importlib.resources
+
         logger.info("Resources - start")
 
         ref = importlib.resources.files('gui.images') / 'favicon.ico'
@@ -40,6 +45,12 @@ class Resources(object):
         logger.info("Resources - loaded")
 
 
+@functools.lru_cache(maxsize=None)
+def resources() -> Resources:
+    """ The resources of the process, loaded on first use """
+    return Resources()
+
+
 class MainApp(QApplication):
     """ QApplication with styling. """
 
@@ -69,15 +80,16 @@ class MainApp(QApplication):
 class MainWindow(QMainWindow):
     """ QMainWindow wraps all of the widgets for the application. """
 
-    def __init__(self, parent=None):
+    def __init__(self, driver=None, parent=None):
         super(MainWindow, self).__init__(parent)
 
-        self.res = Resources()
-        self.driver = None
+        self.res = resources()
+        self.driver = driver
 
-        self.configDialog = ConfigDialog()
-        self.configDialog.signalConfigured.connect(lambda driver: self.config_dialog_slot(driver))
-        self.configDialog.exec_()
+        if self.driver is None:
+            self.configDialog = ConfigDialog()
+            self.configDialog.signalConfigured.connect(lambda driver: self.config_dialog_slot(driver))
+            self.configDialog.exec_()
 
         if self.driver is not None:
             self.printer = Printer(self.driver)
@@ -87,7 +99,7 @@ class MainWindow(QMainWindow):
             QApplication.quit()
             sys.exit()
 
-        self.resize(1024, 768)
+        self.resize(1440, 768)
         self.setWindowTitle(f'pyqt-escpos')
         self.setWindowIcon(self.res.favicon)
         
@@ -98,13 +110,21 @@ class MainWindow(QMainWindow):
 
         self.bar = RightBar(self.printer, parent=self.widget)
         self.tabs = Tabs(self.printer, self.bar.add_to_queue, parent=self.widget)
+        self.preview = PreviewPane(self.printer, self.bar.model, parent=self.widget)
 
         layout.addWidget(self.tabs, 0, 0)
         layout.addWidget(self.bar, 0, 1)
+        layout.addWidget(self.preview, 0, 2)
         layout.setColumnStretch(0, 2)
         layout.setColumnStretch(1, 1)
         self.widget.setLayout(layout)
 
+    def closeEvent(self, event) -> None:
+        self.tabs.shutdown()
+        self.preview.shutdown()
+        self.bar.shutdown()
+        super(MainWindow, self).closeEvent(event)
+
     @pyqtSlot()
     def config_dialog_slot(self, driver):
         self.driver = driver
@@ -118,17 +138,16 @@ class ConfigDialog(QDialog):
     def __init__(self, parent=None) -> None:
         super(ConfigDialog, self).__init__(parent)
 
-        self.printer = PrinterBuilder()
-        self.res = Resources()
+        self.res = resources()
 
         self.setWindowTitle('Config')
         self.setWindowFlags(self.windowFlags() & ~Qt.WindowContextHelpButtonHint)
         self.setWindowIcon(self.res.favicon)
 
         lblConnection = QLabel('Connection:')
-        cmbConnection = QComboBox()
-        cmbConnection.addItems(PRINTER_TYPES)
-        cmbConnection.currentIndexChanged.connect(self.display)
+        self.cmbConnection = QComboBox()
+        self.cmbConnection.addItems(PRINTER_TYPES)
+        self.cmbConnection.currentIndexChanged.connect(self.display)
 
         self.pagesStack = QStackedWidget(self)
         self.pagesStack.addWidget(self.build_usb_page())
@@ -136,19 +155,48 @@ class ConfigDialog(QDialog):
         self.pagesStack.addWidget(self.build_serial_page())
         self.pagesStack.addWidget(self.build_file_page())
 
-        btnConnect = QPushButton("Connect")
-        btnConnect.clicked.connect(self.connect)
+        discoverLayout = QHBoxLayout()
+        self.cmbFound = QComboBox()
+        self.cmbFound.setPlaceholderText("No devices found yet")
+        self.cmbFound.activated.connect(self.fill_found)
+        discoverLayout.addWidget(self.cmbFound, 1)
+
+        self.btnDiscover = QPushButton("Discover")
+        self.btnDiscover.clicked.connect(self.discover)
+        discoverLayout.addWidget(self.btnDiscover)
+
+        self.btnConnect = QPushButton("Connect")
+        self.btnConnect.clicked.connect(self.connect)
+
+        self.btnCancel = QPushButton("Cancel")
+        self.btnCancel.setEnabled(False)
+        self.btnCancel.clicked.connect(self.cancel)
+
+        btnLayout = QHBoxLayout()
+        btnLayout.addWidget(self.btnConnect)
+        btnLayout.addWidget(self.btnCancel)
+
+        self.lblStatus = QLabel("")
 
         self.layout = QVBoxLayout()
         self.layout.setAlignment(Qt.AlignVCenter)
 
         self.layout.addWidget(lblConnection)
-        self.layout.addWidget(cmbConnection)
+        self.layout.addWidget(self.cmbConnection)
         self.layout.addWidget(self.pagesStack)
-        self.layout.addWidget(btnConnect)
+        self.layout.addLayout(discoverLayout)
+        self.layout.addLayout(btnLayout)
+        self.layout.addWidget(self.lblStatus)
         self.setLayout(self.layout)
 
-        self.resize(300, 300)
+        # probing and connecting run in the background, the dialog stays responsive
+        self.discoveryWorker: typing.Optional[DiscoveryWorker] = None
+        self.connectWorker = ConnectWorker(self)
+        self.connectWorker.connected.connect(self.connected)
+        self.connectWorker.failed.connect(self.connect_failed)
+        self.connecting = False
+
+        self.resize(320, 380)
         self.setFixedSize(self.size())
 
     def connect(self) -> None:
@@ -160,13 +208,97 @@ class ConfigDialog(QDialog):
             kwargs[k] = v() # convert functions to return values by calling them
 
         logger.info(f"Trying to connect with type {conn} and kwargs {kwargs.items()}")
-        isSuccess = self.printer.build(conn, **kwargs)
-        if isSuccess == True:
-            logger.info("Connection success, configuration complete.")
-            self.signalConfigured.emit(self.printer.get())
-            self.accept() # closing window
-        else:
-            self.show_alert(f"Failed to connect with {conn}! Double check you configuration!")
+        self.connecting = True
+        self.connectWorker.start(conn, **kwargs)
+        self.btnConnect.setEnabled(False)
+        self.__update_cancel()
+        self.lblStatus.setText(f"Connecting with {conn}...")
+
+    def connected(self, driver) -> None:
+        logger.info("Connection success, configuration complete.")
+        self.connecting = False
+        self.signalConfigured.emit(driver)
+        self.accept() # closing window
+
+    def connect_failed(self, msg: str) -> None:
+        self.connecting = False
+        self.btnConnect.setEnabled(True)
+        self.__update_cancel()
+        self.lblStatus.setText("")
+        self.show_alert(msg)
+
+    def cancel(self) -> None:
+        """ Stop discovery and a connection attempt """
+        if self.discoveryWorker is not None:
+            self.discoveryWorker.cancel()
+        if self.connecting:
+            self.connectWorker.cancel()
+            self.connecting = False
+            self.btnConnect.setEnabled(True)
+            self.lblStatus.setText("Connection attempt cancelled")
+        self.__update_cancel()
+
+    def __update_cancel(self) -> None:
+        self.btnCancel.setEnabled(self.connecting or self.discoveryWorker is not None)
+
+    def discover(self) -> None:
+        if self.discoveryWorker is not None:
+            return
+        self.cmbFound.clear()
+        # besides the local network, look at the host that was typed in
+        hosts = [f"{network}" for network in local_networks()]
+        host = self.pagesStack.widget(PRINTER_TYPES.index("Network")).fields["host"].text()
+        if host and host not in hosts:
+            hosts.append(host)
+        self.discoveryWorker = DiscoveryWorker(hosts, parent=self)
+        self.discoveryWorker.found.connect(self.add_found)
+        self.discoveryWorker.finished.connect(self.discovery_finished)
+        self.discoveryWorker.start()
+        self.btnDiscover.setEnabled(False)
+        self.__update_cancel()
+        self.lblStatus.setText("Looking for printers...")
+
+    def add_found(self, candidates: list) -> None:
+        for candidate in candidates:
+            self.cmbFound.addItem(f"{candidate.kind}: {candidate.description}", candidate)
+        if self.cmbFound.currentIndex() < 0:
+            self.cmbFound.setCurrentIndex(0)
+            self.fill_found(0)
+
+    def discovery_finished(self) -> None:
+        self.discoveryWorker = None
+        self.btnDiscover.setEnabled(True)
+        self.__update_cancel()
+        count = self.cmbFound.count()
+        self.lblStatus.setText(f"{count} device(s) found" if count else "No devices found")
+
+    def fill_found(self, index: int) -> None:
+        """ Put the parameters of a found device into the form """
+        candidate = self.cmbFound.itemData(index)
+        if candidate is None:
+            return
+        page = PRINTER_TYPES.index(candidate.kind)
+        fields = self.pagesStack.widget(page).fields
+        values = {
+            "vid": candidate.params.get("idVendor"),
+            "pid": candidate.params.get("idProduct"),
+            "host": candidate.params.get("host"),
+            "port": candidate.params.get("port", candidate.params.get("devfile")),
+            "baudrate": candidate.params.get("baudrate"),
+        }
+        for name, value in values.items():
+            if value is None or name not in fields:
+                continue
+            fields[name].setText(f"0x{value:04X}" if name in ("vid", "pid") else str(value))
+        self.cmbConnection.setCurrentIndex(page)
+
+    def done(self, result: int) -> None:
+        self.cancel()
+        if self.discoveryWorker is not None:
+            # the probes stop within their timeout, the dialog does not wait for them
+            self.discoveryWorker.detach()
+            self.discoveryWorker = None
+        super(ConfigDialog, self).done(result)
 
     def show_alert(self, msg: str) -> None:
         mb = QMessageBox()
@@ -200,6 +332,7 @@ class ConfigDialog(QDialog):
 
         widget.setLayout(layout)
         widget.params = {"vid" : vid.text, "pid" : pid.text, "timeout" : timeout.text }
+        widget.fields = {"vid" : vid, "pid" : pid}
         return widget
 
     def build_network_page(self) -> QWidget:  
@@ -223,6 +356,7 @@ class ConfigDialog(QDialog):
 
         widget.setLayout(layout)
         widget.params = {"host" : host.text, "port" : port.text, "timeout" : timeout.text }
+        widget.fields = {"host" : host, "port" : port}
         return widget
 
     def build_serial_page(self) -> QWidget:
@@ -274,6 +408,7 @@ class ConfigDialog(QDialog):
             "xonoff"    : xonoff.isChecked,
             "dsrdtr"    : dsrdtr.isChecked
         }
+        widget.fields = {"port" : port, "baudrate" : baudrate}
         return widget
 
     def build_file_page(self) -> QWidget:
@@ -288,8 +423,12 @@ class ConfigDialog(QDialog):
         flush.setChecked(True)
         layout.addRow("Auto-flush", flush)
 
+        batch = QCheckBox()
+        batch.setChecked(False)
+        layout.addRow("Batch writes", batch)
+
         widget.setLayout(layout)
-        widget.params = {"file" : file.text, "flush" : flush.isChecked}
+        widget.params = {"file" : file.text, "flush" : flush.isChecked, "batch" : batch.isChecked}
         return widget
 
 
@@ -0,0 +1,137 @@
+""" GUI benchmarks
+
+Run without a display with:
+
+    QT_QPA_PLATFORM=offscreen python -m gui.bench [queue] [items]
+    QT_QPA_PLATFORM=offscreen python -m gui.bench startup [runs]
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+from PyQt5.QtCore import QEvent, QEventLoop, QObject, QTimer
+from PyQt5.QtWidgets import QApplication
+
+from escpos.printer import Dummy
+from printer import Printer
+from gui.rightbar import RightBar
+
+
+def bench_queue(app: QApplication, items: int = 50000, frames: int = 200) -> dict:
+    """ Queue `items` text lines in the right bar, then scroll through the list """
+    printer = Printer(Dummy())
+    bar = RightBar(printer)
+    bar.resize(400, 700)
+    bar.show()
+    app.processEvents()
+
+    start = time.perf_counter()
+    for i in range(items):
+        printer.textline(f"Label {i}")
+        bar.add_to_queue(lambda i=i: f"Line <Label {i}>...")
+    queued = time.perf_counter() - start
+    # the batched insert is announced to the view here
+    app.processEvents(QEventLoop.AllEvents)
+    shown = time.perf_counter() - start
+    assert bar.model.rowCount() == items
+
+    view = bar.listQueue
+    scrollBar = view.verticalScrollBar()
+    durations = []
+    for frame in range(frames):
+        before = time.perf_counter()
+        scrollBar.setValue(scrollBar.maximum() * frame // (frames - 1))
+        view.viewport().repaint()
+        app.processEvents()
+        durations.append(time.perf_counter() - before)
+    durations.sort()
+
+    bar.shutdown()
+    return {
+        "items": items,
+        "queue_s": queued,
+        "queue_and_show_s": shown,
+        "frame_p50_ms": durations[len(durations) // 2] * 1000,
+        "frame_max_ms": durations[-1] * 1000,
+    }
+
+
+class FirstPaint(QObject):
+    """ Quits the application after the first paint event of a window """
+
+    def __init__(self, window) -> None:
+        super(FirstPaint, self).__init__()
+        self.window = window
+        self.painted = None
+
+    def eventFilter(self, obj, event) -> bool:
+        if self.painted is None and event.type() == QEvent.Paint \
+                and obj.isWidgetType() and obj.window() is self.window:
+            self.painted = time.time()
+            QTimer.singleShot(0, QApplication.quit)
+        return False
+
+
+def startup_child(started: float) -> None:
+    """ Start the main window like main() does and report the time stamps as JSON """
+    marks = {"started": started}
+    from gui import application
+    marks["imported"] = time.time()
+    app = application.MainApp(sys.argv[:1])
+    window = application.MainWindow(Dummy())
+    marks["constructed"] = time.time()
+    firstPaint = FirstPaint(window)
+    app.installEventFilter(firstPaint)
+    window.show()
+    app.exec_()
+    marks["painted"] = firstPaint.painted
+    window.close()
+    marks["modules"] = sorted(name for name in ("PIL", "qrcode", "usb", "serial") if name in sys.modules)
+    print(json.dumps(marks))
+
+
+def bench_startup(runs: int = 5) -> dict:
+    """ Time from launching a fresh interpreter to the first paint of the main window """
+    env = dict(os.environ, QT_QPA_PLATFORM=os.environ.get("QT_QPA_PLATFORM", "offscreen"))
+    totals = []
+    for run in range(runs):
+        launched = time.time()
+        # the child takes its first time stamp before importing anything
+        code = "import time; started = time.time(); from gui.bench import startup_child; startup_child(started)"
+        output = subprocess.run([sys.executable, "-c", code], env=env, stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, check=True).stdout
+        marks = json.loads(output.decode().strip().splitlines()[-1])
+        totals.append({
+            "interpreter_s": marks["started"] - launched,
+            "import_s": marks["imported"] - marks["started"],
+            "construct_s": marks["constructed"] - marks["imported"],
+            "first_paint_s": marks["painted"] - launched,
+        })
+    result = {"runs": runs}
+    for key in totals[0]:
+        values = sorted(total[key] for total in totals)
+        result[f"{key[:-2]}_p50_ms"] = values[len(values) // 2] * 1000
+    result["heavy_modules"] = ",".join(marks["modules"]) or "none"
+    return result
+
+
+def main() -> None:
+    args = sys.argv[1:]
+    if args and args[0] == "startup":
+        result = bench_startup(int(args[1]) if len(args) > 1 else 5)
+    else:
+        if args and args[0] == "queue":
+            args = args[1:]
+        app = QApplication(sys.argv[:1])
+        result = bench_queue(app, int(args[0]) if args else 50000)
+    for key, value in result.items():
+        if isinstance(value, float):
+            print(f"{key:<22} {value:10.3f}")
+        else:
+            print(f"{key:<22} {value:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import logging
+import threading
+import typing
+
+from PyQt5.QtCore import QObject, QThread, pyqtSignal
+
+from escpos.discovery import DEFAULT_PORT, discover
+
+from printer import PrinterBuilder
+
+
+logger = logging.getLogger(__name__)
+
+
+class DiscoveryWorker(QThread):
+    """ Looks for USB, network and serial printers in the background.
+
+    The probes run at the same time, the devices of each one are reported
+    as soon as it is done.
+    """
+    found = pyqtSignal(list) # list of escpos.discovery.Candidate
+
+    # workers left to finish on their own, referenced until they are done
+    detached: typing.Set["DiscoveryWorker"] = set()
+
+    def __init__(self, hosts: typing.Optional[typing.List[str]] = None, port: int = DEFAULT_PORT,
+                 timeout: float = 0.5, parent = None) -> None:
+        super(DiscoveryWorker, self).__init__(parent)
+
+        self.hosts = hosts
+        self.port = port
+        self.timeout = timeout
+        self.cancelEvent = threading.Event()
+
+    def cancel(self) -> None:
+        """ Stop the probes, they finish within their timeout """
+        self.cancelEvent.set()
+
+    def detach(self) -> None:
+        """ Cancel and stop reporting, without waiting for the probes.
+
+        The worker drops its parent, so the parent can be deleted while the
+        probes run into their timeout.
+        """
+        self.cancel()
+        for signal in (self.found, self.finished):
+            try:
+                signal.disconnect()
+            except TypeError:
+                # nothing connected
+                pass
+        self.setParent(None)
+        DiscoveryWorker.detached.add(self)
+        self.finished.connect(self.__release)
+
+    def __release(self) -> None:
+        # finished is emitted right before the thread ends
+        self.wait()
+        DiscoveryWorker.detached.discard(self)
+
+    def run(self) -> None:
+        try:
+            discover(self.hosts, self.port, on_found=self.found.emit, cancelled=self.cancelEvent.is_set,
+                     timeout=self.timeout)
+        except Exception as e:
+            logger.error(f"Discovery failed: {e}")
+
+
+class ConnectWorker(QObject):
+    """ Builds a printer without blocking the GUI thread.
+
+    Opening a connection can not be interrupted, a cancelled attempt is left
+    to run into its timeout and the printer is closed if it connects after
+    all. A daemon thread is used instead of a QThread, so an attempt still
+    running does not keep the application from quitting.
+    """
+    connected = pyqtSignal(object) # the driver
+    failed = pyqtSignal(str)
+
+    # attempt, driver or None, connection type; delivered in the GUI thread
+    attemptDone = pyqtSignal(int, object, str)
+
+    def __init__(self, parent = None) -> None:
+        super(ConnectWorker, self).__init__(parent)
+        self.attempt = 0
+        self.attemptLock = threading.Lock()
+        self.attemptDone.connect(self.__deliver)
+
+    def start(self, conn: str, **kwargs) -> None:
+        """ Start an attempt, the result of an earlier one is dropped """
+        with self.attemptLock:
+            self.attempt += 1
+            attempt = self.attempt
+        thread = threading.Thread(target=self.__build, args=(attempt, conn, kwargs), name="printer-connect")
+        thread.daemon = True
+        thread.start()
+
+    def cancel(self) -> None:
+        with self.attemptLock:
+            self.attempt += 1
+
+    def __build(self, attempt: int, conn: str, kwargs: dict) -> None:
+        builder = PrinterBuilder()
+        driver = builder.get() if builder.build(conn, **kwargs) else None
+        with self.attemptLock:
+            if attempt == self.attempt:
+                self.attemptDone.emit(attempt, driver, conn)
+                return
+        self.__close(driver, conn)
+
+    def __deliver(self, attempt: int, driver, conn: str) -> None:
+        # the attempt can be cancelled while the result is queued
+        with self.attemptLock:
+            current = attempt == self.attempt
+        if not current:
+            self.__close(driver, conn)
+        elif driver is not None:
+            self.connected.emit(driver)
+        else:
+            self.failed.emit(f"Failed to connect with {conn}! Double check you configuration!")
+
+    def __close(self, driver, conn: str) -> None:
+        if driver is not None:
+            logger.info(f"Closing {conn} connection that was cancelled")
+            driver.close()
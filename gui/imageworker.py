@@ -0,0 +1,105 @@
+import typing
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, Qt, pyqtSignal
+from PyQt5.QtGui import QImage, qRgb
+
+from escpos.printer import Dummy
+
+
+# width of the thumbnails of the encoded images
+THUMBNAIL_WIDTH = 192
+
+
+class ImageSettings(typing.NamedTuple):
+    """ Parameters an image is encoded with """
+    width: int                  # dots, 0 keeps the size of the image
+    highDensityVertical: bool
+    highDensityHorizontal: bool
+    fragmentHeight: int
+    impl: str = "bitImageRaster"
+
+
+def encode_image(path: str, settings: ImageSettings) -> typing.Tuple[bytearray, QImage]:
+    """ Decode, scale and threshold an image.
+
+    Returns the ESC/POS output and a thumbnail made from the same 1-bit raster
+    that is sent to the printer.
+    """
+    from PIL import Image
+    from escpos.image import EscposImage
+
+    source = Image.open(path)
+    source.load()
+    if settings.width and source.width != settings.width:
+        height = max(1, round(source.height * settings.width / source.width))
+        source = source.resize((settings.width, height), Image.LANCZOS)
+
+    # converted once, for the printer and the thumbnail
+    im = EscposImage(source)
+
+    buf = Dummy()
+    buf.image(
+        im,
+        high_density_vertical=settings.highDensityVertical,
+        high_density_horizontal=settings.highDensityHorizontal,
+        impl=settings.impl,
+        fragment_height=settings.fragmentHeight
+    )
+
+    raster = im.to_raster_format()
+    # set bits are printed dots, shown black
+    mono = QImage(raster, im.width, im.height, im.width_bytes, QImage.Format_Mono)
+    mono.setColorTable([qRgb(255, 255, 255), qRgb(0, 0, 0)])
+    # the converted image owns its pixels, mono only borrows the raster bytes
+    thumbnail = mono.convertToFormat(QImage.Format_Grayscale8)
+    if thumbnail.width() > THUMBNAIL_WIDTH:
+        thumbnail = thumbnail.scaledToWidth(THUMBNAIL_WIDTH, Qt.SmoothTransformation)
+    return buf.drain(), thumbnail
+
+
+class ImageEncodeSignals(QObject):
+    encoded = pyqtSignal(int, str, object, QImage) # ticket, path, payload, thumbnail
+    failed = pyqtSignal(int, str, str)             # ticket, path, error message
+
+
+class ImageEncodeTask(QRunnable):
+    """ Encodes one image on the thread pool """
+
+    def __init__(self, ticket: int, path: str, settings: ImageSettings, signals: ImageEncodeSignals) -> None:
+        super(ImageEncodeTask, self).__init__()
+        self.ticket = ticket
+        self.path = path
+        self.settings = settings
+        self.signals = signals
+
+    def run(self) -> None:
+        try:
+            payload, thumbnail = encode_image(self.path, self.settings)
+        except Exception as e:
+            self.signals.failed.emit(self.ticket, self.path, str(e))
+            return
+        self.signals.encoded.emit(self.ticket, self.path, payload, thumbnail)
+
+
+class ImageEncoder(QObject):
+    """ Encodes images in parallel on a QThreadPool.
+
+    Every request gets a ticket, results are delivered on the GUI thread with
+    the ticket, so outdated results can be told apart.
+    """
+    encoded = pyqtSignal(int, str, object, QImage)
+    failed = pyqtSignal(int, str, str)
+
+    def __init__(self, pool: typing.Optional[QThreadPool] = None, parent = None) -> None:
+        super(ImageEncoder, self).__init__(parent)
+        self.pool = pool or QThreadPool.globalInstance()
+        self.nextTicket = 1
+        self.signals = ImageEncodeSignals()
+        self.signals.encoded.connect(self.encoded)
+        self.signals.failed.connect(self.failed)
+
+    def encode(self, path: str, settings: ImageSettings) -> int:
+        ticket = self.nextTicket
+        self.nextTicket += 1
+        self.pool.start(ImageEncodeTask(ticket, path, settings, self.signals))
+        return ticket
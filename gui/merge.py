@@ -0,0 +1,69 @@
+import logging
+import multiprocessing
+import os
+import threading
+import typing
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LAYOUT = """\
+{"command": "set", "align": "center", "text_type": "B", "width": 2, "height": 2}
+{"command": "text", "txt": "{name}\\n"}
+{"command": "set", "align": "center"}
+{"command": "text", "txt": "{price}\\n"}
+{"command": "barcode", "code": "{ean}", "bc": "EAN13"}
+{"command": "qr", "content": "{sku}", "size": 4, "native": true}
+{"command": "cut"}
+"""
+
+
+class MergeWorker(QThread):
+    """ Renders a mail merge in the background.
+
+    The rows are rendered by a pool of processes, the jobs are handed to the
+    GUI thread in batches, so queueing thousands of labels stays smooth.
+    """
+    rendered = pyqtSignal(list)   # list of (label, job bytes)
+    failed = pyqtSignal(str)      # error message
+
+    def __init__(self, layout, path: str, workers: int = 0, batchSize: int = 256, parent = None) -> None:
+        super(MergeWorker, self).__init__(parent)
+
+        self.layout = layout
+        self.path = path
+        self.workers = workers or os.cpu_count() or 1
+        self.batchSize = batchSize
+        self.cancelEvent = threading.Event()
+
+    def cancel(self) -> None:
+        self.cancelEvent.set()
+
+    def run(self) -> None:
+        from escpos.merge import merge, read_rows
+
+        name = os.path.basename(self.path)
+        # forking a process that runs Qt threads is not safe
+        jobs = merge(self.layout, read_rows(self.path), workers=self.workers,
+                     mp_context=multiprocessing.get_context("spawn"))
+        batch: typing.List[typing.Tuple[str, bytes]] = []
+        try:
+            for number, job in enumerate(jobs, 1):
+                if self.cancelEvent.is_set():
+                    break
+                batch.append((f"Merge {name} row {number}", job))
+                if len(batch) >= self.batchSize:
+                    self.rendered.emit(batch)
+                    batch = []
+            if batch:
+                self.rendered.emit(batch)
+        except Exception as e:
+            # the rows before the failing one are queued
+            if batch:
+                self.rendered.emit(batch)
+            logger.error(f"Merge of {self.path} failed: {e}")
+            self.failed.emit(str(e))
+        finally:
+            jobs.close()
@@ -0,0 +1,184 @@
+import collections
+import hashlib
+import threading
+import time
+import typing
+
+from PyQt5.QtCore import QThread, QTimer, Qt, pyqtSignal
+from PyQt5.QtGui import QImage, QPainter, QPixmap
+from PyQt5.QtWidgets import QLabel, QScrollArea, QVBoxLayout, QWidget
+
+from printer import Printer
+from gui.queuemodel import QueueModel
+
+
+class PreviewRenderer(QThread):
+    """ Renders the queued segments to a receipt image in the background.
+
+    Every segment is emulated once per printer state it starts in, the strips
+    are kept in an LRU cache keyed by a hash of the data and that state. When
+    segments are only appended, the last receipt is extended with the new
+    strips instead of being composed again.
+
+    Requests coming in while a rendering runs replace each other, only the
+    newest one is rendered.
+    """
+    rendered = pyqtSignal(QImage, int, float) # receipt, number of segments, seconds
+
+    def __init__(self, paperWidth: int = 384, cacheSize: int = 1024, parent = None) -> None:
+        super(PreviewRenderer, self).__init__(parent)
+
+        # created with the first rendering, so PIL is not imported at startup
+        self.emulator = None
+        self.paperWidth = paperWidth
+        self.cacheSize = cacheSize
+        self.cache: collections.OrderedDict = collections.OrderedDict()
+
+        # keys and image of the last rendered receipt
+        self.keys: typing.List[tuple] = []
+        self.receipt: typing.Optional[QImage] = None
+
+        self.condition = threading.Condition()
+        self.pending: typing.Optional[typing.List[bytes]] = None
+        self.stopped = False
+
+    def request(self, segments: typing.List[bytes]) -> None:
+        """ Render these segments, replaces a request that was not started yet """
+        with self.condition:
+            self.pending = segments
+            self.condition.notify()
+
+    def stop(self) -> None:
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+        self.wait()
+
+    def run(self) -> None:
+        while True:
+            with self.condition:
+                while self.pending is None and not self.stopped:
+                    self.condition.wait()
+                if self.stopped:
+                    return
+                segments, self.pending = self.pending, None
+            start = time.perf_counter()
+            receipt = self.render(segments)
+            if receipt is not None:
+                self.rendered.emit(receipt, len(segments), time.perf_counter() - start)
+
+    def __superseded(self) -> bool:
+        return self.pending is not None or self.stopped
+
+    def __strip(self, data: bytes, state) -> typing.Tuple[tuple, typing.Optional[QImage], typing.Any]:
+        key = (hashlib.blake2b(data, digest_size=16).digest(), state)
+        entry = self.cache.get(key)
+        if entry is not None:
+            self.cache.move_to_end(key)
+            return (key,) + entry
+        if self.emulator is None:
+            from escpos.emulator import Emulator
+            self.emulator = Emulator(self.paperWidth)
+        im, end = self.emulator.render(data, state)
+        strip = None
+        if im.height:
+            # the QImage has to own its pixels, the PIL buffer is freed
+            strip = QImage(im.tobytes(), im.width, im.height, im.width, QImage.Format_Grayscale8).copy()
+        self.cache[key] = (strip, end)
+        while len(self.cache) > self.cacheSize:
+            self.cache.popitem(last=False)
+        return key, strip, end
+
+    def render(self, segments: typing.List[bytes]) -> typing.Optional[QImage]:
+        """ Receipt image of the segments, None if a newer request came in meanwhile """
+        keys = []
+        strips = []
+        state = None
+        for data in segments:
+            if self.__superseded():
+                return None
+            key, strip, state = self.__strip(data, state)
+            keys.append(key)
+            strips.append(strip)
+
+        # extend the last receipt if the segments were only appended
+        reused = len(self.keys) if self.receipt is not None and keys[:len(self.keys)] == self.keys else 0
+        height = sum(strip.height() for strip in strips[reused:] if strip is not None)
+        top = self.receipt.height() if reused else 0
+        receipt = QImage(self.paperWidth, max(top + height, 1), QImage.Format_Grayscale8)
+        receipt.fill(Qt.white)
+        painter = QPainter(receipt)
+        if reused:
+            painter.drawImage(0, 0, self.receipt)
+        y = top
+        for strip in strips[reused:]:
+            if strip is not None:
+                painter.drawImage(0, y, strip)
+                y += strip.height()
+        painter.end()
+
+        self.keys = keys
+        self.receipt = receipt if top + height else None
+        return receipt
+
+
+class PreviewPane(QWidget):
+    """ Shows how the print queue will come out of the printer. """
+
+    # delay before rendering, so a burst of queue changes is rendered once
+    delay = 50
+
+    def __init__(self, printer: Printer, model: QueueModel, paperWidth: int = 384, parent = None) -> None:
+        super(PreviewPane, self).__init__(parent)
+
+        self.printer = printer
+        self.model = model
+
+        self.layout = QVBoxLayout()
+
+        self.lblTitle = QLabel("Preview:")
+        self.layout.addWidget(self.lblTitle)
+
+        self.lblReceipt = QLabel()
+        self.lblReceipt.setAlignment(Qt.AlignTop | Qt.AlignHCenter)
+        self.scrollArea = QScrollArea()
+        self.scrollArea.setWidget(self.lblReceipt)
+        self.scrollArea.setWidgetResizable(True)
+        self.scrollArea.setMinimumWidth(paperWidth + 24)
+        self.layout.addWidget(self.scrollArea)
+        self.setLayout(self.layout)
+
+        self.renderer = PreviewRenderer(paperWidth, parent=self)
+        self.renderer.rendered.connect(self.__show)
+        self.renderer.start()
+
+        self.updateTimer = QTimer(self)
+        self.updateTimer.setSingleShot(True)
+        self.updateTimer.timeout.connect(self.refresh)
+        for signal in (model.rowsInserted, model.rowsRemoved, model.rowsMoved, model.modelReset):
+            signal.connect(self.schedule)
+
+    def schedule(self, *args) -> None:
+        if not self.updateTimer.isActive():
+            self.updateTimer.start(self.delay)
+
+    def refresh(self) -> None:
+        """ Render the rows of the queue the model shows """
+        self.renderer.request([segment.data for segment in self.printer.segments[:self.model.rows]])
+
+    def __show(self, receipt: QImage, count: int, seconds: float) -> None:
+        scrollBar = self.scrollArea.verticalScrollBar()
+        atEnd = scrollBar.value() >= scrollBar.maximum()
+        if count:
+            self.lblReceipt.setPixmap(QPixmap.fromImage(receipt))
+            self.lblTitle.setText(f"Preview: {count} items, rendered in {seconds * 1000:.0f} ms")
+        else:
+            self.lblReceipt.clear()
+            self.lblTitle.setText("Preview:")
+        if atEnd:
+            # follow the end of the receipt while items are queued
+            QTimer.singleShot(0, lambda: scrollBar.setValue(scrollBar.maximum()))
+
+    def shutdown(self) -> None:
+        """ Stop the renderer thread """
+        self.renderer.stop()
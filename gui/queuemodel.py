@@ -0,0 +1,127 @@
+import typing
+
+from PyQt5.QtCore import QAbstractListModel, QModelIndex, Qt, QTimer, pyqtSignal
+
+from printer import Label, Printer
+
+
+class QueueModel(QAbstractListModel):
+    """ List model of the segments queued in a Printer.
+
+    Every row is one encoded segment, edits move the encoded data around
+    without rendering anything again.
+
+    Appended segments are announced to the views in one batch when control
+    returns to the event loop, so queueing thousands of items costs a single
+    beginInsertRows(). Labels are formatted only for the rows that are shown.
+    """
+    sizeChanged = pyqtSignal(int, int) # number of segments, bytes
+
+    # longest label shown in the list
+    labelLength = 120
+
+    def __init__(self, printer: Printer, parent = None) -> None:
+        super(QueueModel, self).__init__(parent)
+        self.printer = printer
+        # rows the views know about, segments after them are not announced yet
+        self.rows = len(printer.segments)
+        self.size = printer.size()
+
+        self.flushTimer = QTimer(self)
+        self.flushTimer.setSingleShot(True)
+        self.flushTimer.timeout.connect(self.flush)
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return self.rows
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole) -> typing.Any:
+        if not index.isValid() or not 0 <= index.row() < self.rows:
+            return None
+        segment = self.printer.segments[index.row()]
+        if role == Qt.DisplayRole:
+            text = segment.text()
+            line = text.split("\n", 1)[0]
+            if len(line) > self.labelLength or len(line) < len(text.rstrip("\n")):
+                line = line[:self.labelLength] + "..."
+            return line
+        if role == Qt.ToolTipRole:
+            return f"{len(segment)} bytes"
+        return None
+
+    def __changed(self) -> None:
+        self.sizeChanged.emit(self.rows, self.size)
+
+    def flush(self) -> None:
+        """ Announce the segments appended since the last flush """
+        self.flushTimer.stop()
+        count = len(self.printer.segments)
+        if count <= self.rows:
+            return
+        self.beginInsertRows(QModelIndex(), self.rows, count - 1)
+        self.size += sum(len(segment) for segment in self.printer.segments[self.rows:])
+        self.rows = count
+        self.endInsertRows()
+        self.__changed()
+
+    def commit(self, label: Label) -> None:
+        """ Append the output rendered since the last commit """
+        if self.printer.commit(label) is not None and not self.flushTimer.isActive():
+            self.flushTimer.start(0)
+
+    def extend(self, segments: typing.Iterable[typing.Tuple[Label, bytearray]]) -> None:
+        """ Append already encoded segments """
+        for label, data in segments:
+            self.printer.append(label, data)
+        self.flush()
+
+    def removeItem(self, row: int) -> None:
+        self.flush()
+        if not 0 <= row < self.rows:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        self.size -= len(self.printer.segments[row])
+        self.printer.remove(row)
+        self.rows -= 1
+        self.endRemoveRows()
+        self.__changed()
+
+    def moveItem(self, row: int, destination: int) -> bool:
+        self.flush()
+        if row == destination or not 0 <= row < self.rows or not 0 <= destination < self.rows:
+            return False
+        # Qt counts the destination before the move, one past the item when moving down
+        self.beginMoveRows(QModelIndex(), row, row, QModelIndex(),
+                           destination + 1 if destination > row else destination)
+        self.printer.move(row, destination)
+        self.endMoveRows()
+        return True
+
+    def duplicateItem(self, row: int) -> None:
+        self.flush()
+        if not 0 <= row < self.rows:
+            return
+        self.beginInsertRows(QModelIndex(), row + 1, row + 1)
+        self.printer.duplicate(row)
+        self.size += len(self.printer.segments[row])
+        self.rows += 1
+        self.endInsertRows()
+        self.__changed()
+
+    def __reset(self, action: typing.Callable[[], typing.Any]) -> typing.Any:
+        self.flushTimer.stop()
+        self.beginResetModel()
+        result = action()
+        self.rows = len(self.printer.segments)
+        self.size = self.printer.size()
+        self.endResetModel()
+        self.__changed()
+        return result
+
+    def clearAll(self) -> None:
+        self.__reset(self.printer.make_new_buffer)
+
+    def takeJob(self) -> typing.List[bytearray]:
+        """ Hand the queued segments over for printing and empty the queue """
+        return self.__reset(self.printer.take_job)
@@ -2,14 +2,18 @@ import typing
 
 from PyQt5.QtWidgets import (
     QWidget,
-    QListWidget,
+    QAbstractItemView,
+    QListView,
     QLabel,
+    QProgressBar,
     QPushButton,
     QHBoxLayout,
     QVBoxLayout
 )
 
-from printer import Printer
+from printer import Label, Printer
+from gui.queuemodel import QueueModel
+from gui.worker import PrintWorker
 
 
 class RightBar(QWidget):
@@ -20,12 +24,29 @@ class RightBar(QWidget):
 
         self.layout = QVBoxLayout()
 
-        lblTitle = QLabel("Print queue:")
-        self.layout.addWidget(lblTitle)
+        self.lblTitle = QLabel("Print queue:")
+        self.layout.addWidget(self.lblTitle)
 
-        self.listQueue = QListWidget()
+        self.model = QueueModel(self.printer, parent=self)
+        self.model.sizeChanged.connect(self.__size_changed)
+
+        self.listQueue = QListView()
+        self.listQueue.setModel(self.model)
+        self.listQueue.setSelectionMode(QAbstractItemView.SingleSelection)
+        # all rows have the same height, so the view never measures them one by one
+        self.listQueue.setUniformItemSizes(True)
+        self.listQueue.setLayoutMode(QListView.Batched)
+        self.listQueue.setBatchSize(256)
         self.layout.addWidget(self.listQueue)
 
+        editLayout = QHBoxLayout()
+        for text, handler in (("Up", self.__up_handler), ("Down", self.__down_handler),
+                              ("Duplicate", self.__duplicate_handler), ("Remove", self.__remove_handler)):
+            btn = QPushButton(text)
+            btn.clicked.connect(handler)
+            editLayout.addWidget(btn)
+        self.layout.addLayout(editLayout)
+
         self.btnCut = QPushButton("Cut")
         self.btnCut.clicked.connect(self.__cut_handler)
         self.layout.addWidget(self.btnCut)
@@ -40,22 +61,102 @@ class RightBar(QWidget):
         btnLayout.addWidget(self.btnClear)
 
         self.layout.addLayout(btnLayout)
+
+        self.lblStatus = QLabel("Idle")
+        self.layout.addWidget(self.lblStatus)
+
+        progressLayout = QHBoxLayout()
+        self.pbJob = QProgressBar()
+        self.pbJob.setValue(0)
+        progressLayout.addWidget(self.pbJob)
+
+        self.btnCancel = QPushButton("Cancel")
+        self.btnCancel.setEnabled(False)
+        self.btnCancel.clicked.connect(self.__cancel_handler)
+        progressLayout.addWidget(self.btnCancel)
+
+        self.layout.addLayout(progressLayout)
         self.setLayout(self.layout)
 
+        self.activeJobs = 0
+        self.worker = PrintWorker(self.printer, parent=self)
+        self.worker.jobStarted.connect(self.__job_started)
+        self.worker.jobProgress.connect(self.__job_progress)
+        self.worker.jobFinished.connect(lambda jobId: self.__job_done(jobId, "sent"))
+        self.worker.jobCancelled.connect(lambda jobId: self.__job_done(jobId, "cancelled"))
+        self.worker.jobFailed.connect(lambda jobId, msg: self.__job_done(jobId, f"failed: {msg}"))
+        self.worker.start()
+
     def __cut_handler(self) -> None:
         self.printer.cut()
-        self.listQueue.addItem("Cut paper")
+        self.add_to_queue("Cut paper")
 
     def __clear(self) -> None:
-        self.printer.make_new_buffer() # inefficient
-        self.listQueue.clear()
+        self.model.clearAll()
+
+    def add_to_queue(self, text: Label) -> None:
+        self.model.commit(text)
+
+    def __selected_row(self) -> int:
+        index = self.listQueue.currentIndex()
+        return index.row() if index.isValid() else -1
+
+    def __select(self, row: int) -> None:
+        self.listQueue.setCurrentIndex(self.model.index(row))
+
+    def __up_handler(self) -> None:
+        row = self.__selected_row()
+        if self.model.moveItem(row, row - 1):
+            self.__select(row - 1)
+
+    def __down_handler(self) -> None:
+        row = self.__selected_row()
+        if self.model.moveItem(row, row + 1):
+            self.__select(row + 1)
+
+    def __duplicate_handler(self) -> None:
+        row = self.__selected_row()
+        if row >= 0:
+            self.model.duplicateItem(row)
+            self.__select(row + 1)
+
+    def __remove_handler(self) -> None:
+        self.model.removeItem(self.__selected_row())
 
-    def add_to_queue(self, text: str) -> None:
-        self.listQueue.addItem(text)
+    def __size_changed(self, count: int, size: int) -> None:
+        self.lblTitle.setText(f"Print queue: {count} items, {size} bytes" if count else "Print queue:")
 
     def __print_handler(self) -> None:
-        self.printer.output()
-        self.__clear()
+        job = self.model.takeJob()
+        if not job:
+            return
+        jobId = self.worker.submit(job)
+        self.activeJobs += 1
+        self.btnCancel.setEnabled(True)
+        size = sum(len(data) for data in job)
+        self.lblStatus.setText(f"Job {jobId} queued ({size} bytes), {self.worker.pending()} waiting")
+
+    def __cancel_handler(self) -> None:
+        self.worker.cancel()
+
+    def __job_started(self, jobId: int, size: int) -> None:
+        self.pbJob.setMaximum(max(size, 1))
+        self.pbJob.setValue(0)
+        self.lblStatus.setText(f"Job {jobId}: sending {size} bytes")
+
+    def __job_progress(self, jobId: int, sent: int, size: int, throughput: float) -> None:
+        self.pbJob.setValue(sent)
+        self.lblStatus.setText(f"Job {jobId}: {sent}/{size} bytes, {throughput / 1000:.1f} kB/s")
+
+    def __job_done(self, jobId: int, result: str) -> None:
+        self.activeJobs -= 1
+        pending = self.worker.pending()
+        self.lblStatus.setText(f"Job {jobId} {result}" + (f", {pending} waiting" if pending else ""))
+        self.btnCancel.setEnabled(self.activeJobs > 0)
+
+    def shutdown(self) -> None:
+        """ Stop the print worker, jobs not yet sent are dropped """
+        self.worker.stop()
 
     def __clear_handler(self) -> None:
         self.__clear()
\ No newline at end of file
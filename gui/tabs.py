@@ -1,29 +1,74 @@
 import typing
 import os.path
 
-from PyQt5.QtCore import QRegExp, Qt
-from PyQt5.QtGui import QRegExpValidator
+from PyQt5.QtCore import QRegExp, QSize, Qt, pyqtSignal
+from PyQt5.QtGui import QIcon, QImage, QPixmap, QRegExpValidator
 
 from PyQt5.QtWidgets import (
-    QWidget, QTabWidget, QFrame, QHBoxLayout, QGridLayout, QFormLayout,
-    QPushButton, QLabel, QLineEdit, QCheckBox, QComboBox, QPlainTextEdit,
-    QFileDialog
+    QWidget, QTabWidget, QFrame, QHBoxLayout, QVBoxLayout, QGridLayout, QFormLayout,
+    QPushButton, QLabel, QLineEdit, QCheckBox, QComboBox, QSpinBox, QPlainTextEdit,
+    QFileDialog, QListWidget, QListWidgetItem, QAbstractItemView, QMessageBox
 )
 
-from printer import Printer
+from printer import Label, Printer
+from gui.imageworker import THUMBNAIL_WIDTH, ImageEncoder, ImageSettings
+from gui.merge import DEFAULT_LAYOUT, MergeWorker
+
+
+class ImageDropList(QListWidget):
+    """ List of images that accepts files dropped from a file manager """
+    filesDropped = pyqtSignal(list)
+
+    def __init__(self, parent = None) -> None:
+        super(ImageDropList, self).__init__(parent)
+        self.setAcceptDrops(True)
+        self.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.setIconSize(QSize(THUMBNAIL_WIDTH, THUMBNAIL_WIDTH))
+
+    def dragEnterEvent(self, event) -> None:
+        if event.mimeData().hasUrls():
+            event.acceptProposedAction()
+        else:
+            super(ImageDropList, self).dragEnterEvent(event)
+
+    def dragMoveEvent(self, event) -> None:
+        if event.mimeData().hasUrls():
+            event.acceptProposedAction()
+        else:
+            super(ImageDropList, self).dragMoveEvent(event)
+
+    def dropEvent(self, event) -> None:
+        if event.mimeData().hasUrls():
+            paths = [url.toLocalFile() for url in event.mimeData().urls() if url.isLocalFile()]
+            event.acceptProposedAction()
+            self.filesDropped.emit(paths)
+        else:
+            super(ImageDropList, self).dropEvent(event)
 
 
 class Tabs(QTabWidget):
-    def __init__(self, printer: Printer, addTo: typing.Callable[[str], None], parent = None) -> None:
+    def __init__(self, printer: Printer, addTo: typing.Callable[[Label], None], parent = None) -> None:
         super(Tabs, self).__init__(parent)
 
         self.printer = printer
         self.addTo = addTo
 
-        self.addTab(self.__buildTabText(), "Text")
-        self.addTab(self.__buildTabImage(), "Image")
-        self.addTab(self.__buildTabQR(), "QR")
-        self.addTab(self.__buildTabBarcode(), "Barcode")
+        # a tab is built when it is shown the first time, until then it is an empty page
+        self.builders: typing.Dict[int, typing.Callable[[], QWidget]] = {}
+        for build, title in ((self.__buildTabText, "Text"), (self.__buildTabImage, "Image"),
+                             (self.__buildTabQR, "QR"), (self.__buildTabBarcode, "Barcode"),
+                             (self.__buildTabMerge, "Merge")):
+            page = QWidget()
+            pageLayout = QVBoxLayout(page)
+            pageLayout.setContentsMargins(0, 0, 0, 0)
+            self.builders[self.addTab(page, title)] = build
+        self.currentChanged.connect(self.__buildTab)
+        self.__buildTab(self.currentIndex())
+
+    def __buildTab(self, index: int) -> None:
+        build = self.builders.pop(index, None)
+        if build is not None:
+            self.widget(index).layout().addWidget(build())
 
     def __buildTabText(self) -> QWidget:
         w = QWidget()
@@ -170,72 +215,142 @@ class Tabs(QTabWidget):
         w = QWidget()
         layout = QGridLayout()
 
-        leImagePath = QLineEdit()
-        btnImageSelect = QPushButton("...")
+        self.imageEncoder = ImageEncoder(parent=self)
+        self.imageEncoder.encoded.connect(self.__imageEncoded)
+        self.imageEncoder.failed.connect(self.__imageFailed)
+
+        self.lstImages = ImageDropList()
+        self.lstImages.filesDropped.connect(self.__addImages)
+        layout.addWidget(self.lstImages, 0, 0, 1, 4)
 
-        imageSelect = lambda: leImagePath.setText(str(self.__openImage()))
-        btnImageSelect.clicked.connect(imageSelect)
+        btnImageSelect = QPushButton("Add images...")
+        btnImageSelect.clicked.connect(lambda: self.__addImages(self.__openImages()))
+        layout.addWidget(btnImageSelect, 1, 0, 1, 2)
 
-        layout.addWidget(leImagePath, 0, 0, 1, 3) 
-        layout.addWidget(btnImageSelect, 0, 3, 1, 1)
+        btnImageRemove = QPushButton("Remove")
+        btnImageRemove.clicked.connect(self.__removeImages)
+        layout.addWidget(btnImageRemove, 1, 2, 1, 2)
 
         lblHighDensity = QLabel("High density")
-        cbVertical = QCheckBox("Vertical")
-        cbVertical.setChecked(True)
-        cbHorizontal = QCheckBox("Horizontal")
-        cbHorizontal.setChecked(True)
-        layout.addWidget(lblHighDensity, 1, 0, 1, 1) 
-        layout.addWidget(cbVertical, 1, 1, 1, 1) 
-        layout.addWidget(cbHorizontal, 1, 2, 1, 1) 
+        self.cbVertical = QCheckBox("Vertical")
+        self.cbVertical.setChecked(True)
+        self.cbHorizontal = QCheckBox("Horizontal")
+        self.cbHorizontal.setChecked(True)
+        layout.addWidget(lblHighDensity, 2, 0, 1, 1) 
+        layout.addWidget(self.cbVertical, 2, 1, 1, 1) 
+        layout.addWidget(self.cbHorizontal, 2, 2, 1, 1) 
 
-        lblFragmentHeight = QLabel("Fragment height")
-        leFragmentHeight = QLineEdit("1024")
         decimalValidator = QRegExpValidator(QRegExp("[0-9]+"))
-        leFragmentHeight.setValidator(decimalValidator)
-        layout.addWidget(lblFragmentHeight, 2, 0, 1, 1) 
-        layout.addWidget(leFragmentHeight, 2, 1, 1, 1) 
 
-        btnImagePrint = QPushButton("Print")
-        layout.addWidget(btnImagePrint, 2, 2, 1, 1) 
+        lblWidth = QLabel("Width (0 = original)")
+        self.leImageWidth = QLineEdit("0")
+        self.leImageWidth.setValidator(decimalValidator)
+        layout.addWidget(lblWidth, 3, 0, 1, 1) 
+        layout.addWidget(self.leImageWidth, 3, 1, 1, 1) 
 
-        printImage = lambda: self.__printImage(
-            leImagePath.text(),
-            highDensityVertical=cbVertical.isChecked(),
-            highDensityHorizontal=cbHorizontal.isChecked(),
-            fragmentHeight=leFragmentHeight.text()
-        )
-        btnImagePrint.clicked.connect(printImage)
+        lblFragmentHeight = QLabel("Fragment height")
+        self.leFragmentHeight = QLineEdit("1024")
+        self.leFragmentHeight.setValidator(decimalValidator)
+        layout.addWidget(lblFragmentHeight, 4, 0, 1, 1) 
+        layout.addWidget(self.leFragmentHeight, 4, 1, 1, 1) 
+
+        # every change of the settings encodes the images again
+        self.cbVertical.stateChanged.connect(lambda _: self.__encodeImages())
+        self.cbHorizontal.stateChanged.connect(lambda _: self.__encodeImages())
+        self.leImageWidth.editingFinished.connect(self.__encodeImages)
+        self.leFragmentHeight.editingFinished.connect(self.__encodeImages)
+
+        btnImagePrint = QPushButton("Print")
+        btnImagePrint.clicked.connect(self.__printImages)
+        layout.addWidget(btnImagePrint, 4, 2, 1, 2) 
 
         layout.setAlignment(Qt.AlignTop)
         w.setLayout(layout)
         return w
 
-    def __printImage(self, path: str, highDensityVertical: bool, highDensityHorizontal: bool,
-                    fragmentHeight: int):
-        if os.path.isfile(path):
-            self.printer.image(
-                path, 
-                high_density_vertical=bool(highDensityVertical), 
-                high_density_horizontal=bool(highDensityHorizontal), 
-                fragment_height=int(fragmentHeight)
-            )
-            self.addTo(f"Image {path}")
-        else:
-           self.__showError("Image path is not a file!")           
+    def __imageSettings(self) -> ImageSettings:
+        return ImageSettings(
+            width=int(self.leImageWidth.text() or 0),
+            highDensityVertical=self.cbVertical.isChecked(),
+            highDensityHorizontal=self.cbHorizontal.isChecked(),
+            fragmentHeight=max(1, int(self.leFragmentHeight.text() or 1024))
+        )
 
-    def __openImage(self) -> str:
-        path, accepted = QFileDialog.getOpenFileName(self, 'Open image')
-        if accepted:
-            return os.path.abspath(path)
+    def __encodeImage(self, item: QListWidgetItem, settings: ImageSettings) -> None:
+        path = item.data(Qt.UserRole)["path"]
+        ticket = self.imageEncoder.encode(path, settings)
+        item.setData(Qt.UserRole, {"path": path, "ticket": ticket, "payload": None})
+        item.setText(f"{os.path.basename(path)}\nencoding...")
+
+    def __encodeImages(self) -> None:
+        settings = self.__imageSettings()
+        for row in range(self.lstImages.count()):
+            self.__encodeImage(self.lstImages.item(row), settings)
+
+    def __addImages(self, paths: typing.List[str]) -> None:
+        settings = self.__imageSettings()
+        for path in paths:
+            if not os.path.isfile(path):
+                continue
+            item = QListWidgetItem()
+            item.setData(Qt.UserRole, {"path": path})
+            item.setToolTip(path)
+            self.lstImages.addItem(item)
+            self.__encodeImage(item, settings)
+
+    def __removeImages(self) -> None:
+        for item in self.lstImages.selectedItems():
+            self.lstImages.takeItem(self.lstImages.row(item))
+
+    def __findImage(self, ticket: int) -> typing.Optional[QListWidgetItem]:
+        for row in range(self.lstImages.count()):
+            item = self.lstImages.item(row)
+            if item.data(Qt.UserRole).get("ticket") == ticket:
+                return item
+        return None
+
+    def __imageEncoded(self, ticket: int, path: str, payload: bytearray, thumbnail: QImage) -> None:
+        item = self.__findImage(ticket)
+        if item is None:
+            # removed or encoded again in the meantime
+            return
+        item.setData(Qt.UserRole, {"path": path, "ticket": ticket, "payload": payload})
+        item.setIcon(QIcon(QPixmap.fromImage(thumbnail)))
+        item.setText(f"{os.path.basename(path)}\n{len(payload)} bytes")
+
+    def __imageFailed(self, ticket: int, path: str, error: str) -> None:
+        item = self.__findImage(ticket)
+        if item is not None:
+            item.setText(f"{os.path.basename(path)}\nfailed: {error}")
+
+    def __printImages(self) -> None:
+        items = self.lstImages.selectedItems()
+        if items:
+            items.sort(key=self.lstImages.row)
         else:
-            self.__showError("No path selected")
-            return ""
+            items = [self.lstImages.item(row) for row in range(self.lstImages.count())]
+        if not items:
+            self.__showError("No images selected")
+            return
+        if any(item.data(Qt.UserRole).get("payload") is None for item in items):
+            self.__showError("Images are still being encoded or failed")
+            return
+        for item in items:
+            image = item.data(Qt.UserRole)
+            # the payload is ready, printing only appends it
+            self.printer.raw(image["payload"])
+            self.addTo(f"Image {image['path']}")
+
+    def __openImages(self) -> typing.List[str]:
+        paths, _ = QFileDialog.getOpenFileNames(self, 'Open images', "",
+                                                "Images (*.png *.jpg *.jpeg *.gif *.bmp);;All files (*)")
+        return [os.path.abspath(path) for path in paths]
 
     def __showError(self, error: str) -> None:
         mb = QMessageBox()
-        mb.setIcon(QMessageBox.Icon.Error)
+        mb.setIcon(QMessageBox.Icon.Critical)
         mb.setWindowTitle("Error")
-        mb.setText(f"{msg}")
+        mb.setText(f"{error}")
         mb.setStandardButtons(QMessageBox.Ok)
         mb.exec_()
 
@@ -293,10 +408,10 @@ class Tabs(QTabWidget):
         ]) # NW7 is not supported by QR701
         layout.addRow("Format", cmbFormat)
 
-        cmbHeight = QComboBox()
-        cmbHeight.addItems(map(str, range(1,256))) # default 64
-        cmbHeight.setCurrentIndex(64 - 1)
-        layout.addRow("Height", cmbHeight)
+        sbHeight = QSpinBox()
+        sbHeight.setRange(1, 255)
+        sbHeight.setValue(64) # default 64
+        layout.addRow("Height", sbHeight)
 
         cmbWidth = QComboBox()
         cmbWidth.addItems(map(str, range(2,7))) # default 3
@@ -324,7 +439,7 @@ class Tabs(QTabWidget):
             self.printer.barcode(
                 leContent.text(),
                 cmbFormat.currentText(),
-                height=int(cmbHeight.currentText()),
+                height=sbHeight.value(),
                 width=int(cmbWidth.currentText()),
                 pos=str(cmbPos.currentText()),
                 font=str(cmbFont.currentText()),
@@ -336,3 +451,101 @@ class Tabs(QTabWidget):
 
         w.setLayout(layout)
         return w
+
+    def __buildTabMerge(self) -> QWidget:
+        w = QWidget()
+        layout = QGridLayout()
+
+        layout.addWidget(QLabel("Rows (CSV or JSON lines)"), 0, 0, 1, 4)
+        self.leMergeRows = QLineEdit()
+        layout.addWidget(self.leMergeRows, 1, 0, 1, 3)
+        btnRows = QPushButton("Browse...")
+        btnRows.clicked.connect(self.__openMergeRows)
+        layout.addWidget(btnRows, 1, 3)
+
+        layout.addWidget(QLabel("Layout, one command per line, {field} is replaced by the value of the row"),
+                         2, 0, 1, 3)
+        btnLayout = QPushButton("Load layout...")
+        btnLayout.clicked.connect(self.__openMergeLayout)
+        layout.addWidget(btnLayout, 2, 3)
+        self.pteMergeLayout = QPlainTextEdit(DEFAULT_LAYOUT)
+        layout.addWidget(self.pteMergeLayout, 3, 0, 1, 4)
+
+        layout.addWidget(QLabel("Processes"), 4, 0)
+        self.sbMergeWorkers = QSpinBox()
+        self.sbMergeWorkers.setRange(1, max(1, os.cpu_count() or 1) * 2)
+        self.sbMergeWorkers.setValue(os.cpu_count() or 1)
+        layout.addWidget(self.sbMergeWorkers, 4, 1)
+
+        self.btnMerge = QPushButton("Render to queue")
+        self.btnMerge.clicked.connect(self.__startMerge)
+        layout.addWidget(self.btnMerge, 4, 2)
+
+        self.btnMergeCancel = QPushButton("Cancel")
+        self.btnMergeCancel.setEnabled(False)
+        self.btnMergeCancel.clicked.connect(lambda: self.mergeWorker.cancel())
+        layout.addWidget(self.btnMergeCancel, 4, 3)
+
+        self.lblMergeStatus = QLabel("")
+        layout.addWidget(self.lblMergeStatus, 5, 0, 1, 4)
+
+        self.mergeWorker: typing.Optional[MergeWorker] = None
+        self.mergeCount = 0
+
+        w.setLayout(layout)
+        return w
+
+    def __openMergeRows(self) -> None:
+        path, _ = QFileDialog.getOpenFileName(self, 'Open rows', "",
+                                              "Rows (*.csv *.jsonl *.ndjson);;All files (*)")
+        if path:
+            self.leMergeRows.setText(os.path.abspath(path))
+
+    def __openMergeLayout(self) -> None:
+        path, _ = QFileDialog.getOpenFileName(self, 'Open layout', "", "Layouts (*.jsonl *.json);;All files (*)")
+        if path:
+            with open(path, encoding="utf-8") as layoutFile:
+                self.pteMergeLayout.setPlainText(layoutFile.read())
+
+    def __startMerge(self) -> None:
+        from escpos.merge import Layout
+
+        path = self.leMergeRows.text()
+        if not os.path.isfile(path):
+            self.__showError("Select a file with rows")
+            return
+        try:
+            mergeLayout = Layout.from_text(self.pteMergeLayout.toPlainText())
+        except ValueError as e:
+            self.__showError(f"Invalid layout: {e}")
+            return
+
+        self.mergeCount = 0
+        self.mergeWorker = MergeWorker(mergeLayout, path, self.sbMergeWorkers.value(), parent=self)
+        self.mergeWorker.rendered.connect(self.__mergeRendered)
+        self.mergeWorker.failed.connect(self.__showError)
+        self.mergeWorker.finished.connect(self.__mergeFinished)
+        self.mergeWorker.start()
+        self.btnMerge.setEnabled(False)
+        self.btnMergeCancel.setEnabled(True)
+        self.lblMergeStatus.setText("Rendering...")
+
+    def __mergeRendered(self, jobs: list) -> None:
+        for label, job in jobs:
+            self.printer.raw(job)
+            self.addTo(label)
+        self.mergeCount += len(jobs)
+        self.lblMergeStatus.setText(f"{self.mergeCount} rows queued")
+
+    def __mergeFinished(self) -> None:
+        cancelled = self.mergeWorker.cancelEvent.is_set()
+        self.mergeWorker = None
+        self.btnMerge.setEnabled(True)
+        self.btnMergeCancel.setEnabled(False)
+        self.lblMergeStatus.setText(f"{self.mergeCount} rows queued" + (", cancelled" if cancelled else ""))
+
+    def shutdown(self) -> None:
+        """ Stop a running merge """
+        if getattr(self, "mergeWorker", None) is not None:
+            self.mergeWorker.cancel()
+            self.mergeWorker.wait()
@@ -0,0 +1,116 @@
+import logging
+import queue
+import threading
+import time
+import typing
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from printer import Printer
+
+
+logger = logging.getLogger(__name__)
+
+
+class PrintWorker(QThread):
+    """ Sends print jobs to the printer in the background.
+
+    Jobs are queued with submit() and sent one after another in chunks, so the
+    GUI thread never waits for the printer. Progress is reported after every chunk.
+
+    cancel() stops every job submitted before it, also one that the thread has
+    just taken from the queue: the jobs carry the cancel generation they were
+    submitted in.
+    """
+    jobStarted = pyqtSignal(int, int)              # job id, size in bytes
+    jobProgress = pyqtSignal(int, int, int, float) # job id, bytes sent, size, throughput in bytes/s
+    jobFinished = pyqtSignal(int)                  # job id
+    jobCancelled = pyqtSignal(int)                 # job id
+    jobFailed = pyqtSignal(int, str)               # job id, error message
+
+    def __init__(self, printer: Printer, chunkSize: int = 1024, parent = None) -> None:
+        super(PrintWorker, self).__init__(parent)
+
+        self.printer = printer
+        self.chunkSize = chunkSize
+
+        self.jobs: queue.Queue = queue.Queue()
+        self.nextId = 1
+        self.currentId: typing.Optional[int] = None
+        # incremented by cancel(), a job is cancelled when it differs from the one it was submitted in
+        self.generation = 0
+        self.cancelLock = threading.Lock()
+        self.stopEvent = threading.Event()
+
+    def submit(self, job: typing.Sequence[bytearray]) -> int:
+        """ Queue a job made of segments, returns its id """
+        with self.cancelLock:
+            jobId = self.nextId
+            self.nextId += 1
+            self.jobs.put((jobId, self.generation, job))
+        return jobId
+
+    def pending(self) -> int:
+        return self.jobs.qsize()
+
+    def cancel(self) -> None:
+        """ Stop the current job after the segment in transfer and drop the queued ones """
+        with self.cancelLock:
+            self.generation += 1
+            dropped = []
+            while True:
+                try:
+                    job = self.jobs.get_nowait()
+                except queue.Empty:
+                    break
+                if job is None:
+                    # keep the end marker of stop()
+                    self.jobs.put(None)
+                    break
+                dropped.append(job[0])
+        for jobId in dropped:
+            self.jobCancelled.emit(jobId)
+
+    def stop(self) -> None:
+        """ Cancel everything and end the thread """
+        self.stopEvent.set()
+        self.cancel()
+        self.jobs.put(None)
+        self.wait()
+
+    def run(self) -> None:
+        while not self.stopEvent.is_set():
+            job = self.jobs.get()
+            if job is None:
+                break
+            jobId, generation, segments = job
+            self.currentId = jobId
+            self.__send(jobId, segments, lambda: self.generation != generation)
+            self.currentId = None
+
+    def __send(self, jobId: int, segments: typing.Sequence[bytearray],
+               cancelled: typing.Callable[[], bool]) -> None:
+        if cancelled():
+            self.jobCancelled.emit(jobId)
+            return
+        size = sum(len(data) for data in segments)
+        start = time.perf_counter()
+        self.jobStarted.emit(jobId, size)
+
+        def progress(sent: int) -> None:
+            elapsed = time.perf_counter() - start
+            self.jobProgress.emit(jobId, sent, size, sent / elapsed if elapsed > 0 else 0.0)
+
+        try:
+            completed = self.printer.send(segments, self.chunkSize, progress, cancelled)
+        except Exception as e:
+            logger.error(f"Print job {jobId} failed: {e}")
+            self.jobFailed.emit(jobId, str(e))
+            return
+
+        if completed:
+            logger.info(f"Print job {jobId} sent, {size} bytes in {time.perf_counter() - start:.2f} s")
+            self.jobFinished.emit(jobId)
+        else:
+            logger.warning(f"Print job {jobId} cancelled")
+            self.jobCancelled.emit(jobId)
@@ -1,4 +1,5 @@
 import logging
+import threading
 import typing
 
 from escpos.constants import *
@@ -53,8 +54,9 @@ class PrinterBuilder(object):
                 elif printer_type == "File":
                     file = kwargs.get("file")
                     flush = kwargs.get("flush")
+                    batch = bool(kwargs.get("batch"))
                     
-                    self.printer = File(file, auto_flush=flush)    
+                    self.printer = File(file, auto_flush=flush, batch=batch)    
                     return True    
             except:
                 logger.error(f"Failed to build with type <{printer_type}>")        
@@ -66,15 +68,75 @@ class PrinterBuilder(object):
         return self.printer
 
 
+Label = typing.Union[str, typing.Callable[[], str]]
+
+
+class Segment(object):
+    """ Encoded output of one queued action
+
+    The label may be a callable, it is then only formatted when it is shown.
+    """
+    __slots__ = ('label', 'data')
+
+    def __init__(self, label: Label, data: bytearray) -> None:
+        self.label = label
+        self.data = data
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def text(self) -> str:
+        return self.label() if callable(self.label) else self.label
+
+
 class Printer(object):
-    """ Wrapper around python-escpos """
+    """ Wrapper around python-escpos
+
+    Commands are rendered into a buffer and commit() turns the buffered output
+    into a labeled segment of the queue. Segments are never re-rendered, they
+    can be removed, moved or duplicated until the queue is sent.
+    """
 
     def __init__(self, driver) -> None:
         self.printer = driver
         self.buf = Dummy()
+        self.segments: typing.List[Segment] = []
+        # held while data is written to the device, jobs are sent from a worker thread
+        self.lock = threading.Lock()
 
     def make_new_buffer(self) -> None:
-        self.buf = Dummy()
+        self.buf.clear()
+        self.segments = []
+
+    def commit(self, label: Label) -> typing.Optional[Segment]:
+        """ Queue the output rendered since the last commit as a segment """
+        if not len(self.buf):
+            return None
+        return self.append(label, self.buf.drain())
+
+    def append(self, label: Label, data: bytearray) -> Segment:
+        """ Queue already encoded data as a segment """
+        segment = Segment(label, data)
+        self.segments.append(segment)
+        return segment
+
+    def remove(self, index: int) -> None:
+        del self.segments[index]
+
+    def move(self, index: int, destination: int) -> None:
+        self.segments.insert(destination, self.segments.pop(index))
+
+    def duplicate(self, index: int) -> None:
+        # the data is never modified, so the copy can share it
+        segment = self.segments[index]
+        self.segments.insert(index + 1, Segment(segment.label, segment.data))
+
+    def size(self) -> int:
+        return sum(len(segment) for segment in self.segments)
+
+    def raw(self, data) -> None:
+        """ Add already encoded output """
+        self.buf._raw(data)
 
     def text(self, text) -> None:
         self.buf.text(f"{text}")
@@ -109,6 +171,39 @@ class Printer(object):
     def charset(self, charset: str):
         self.buf.charcode(charset)
 
+    def take_job(self) -> typing.List[bytearray]:
+        """ Hand over the queued segments as a job and start a new queue """
+        self.commit("Uncommitted output")
+        job = [segment.data for segment in self.segments]
+        self.segments = []
+        return job
+
+    def send(self, job: typing.Sequence[bytearray], chunkSize: int = 1024,
+        progress: typing.Optional[typing.Callable[[int], None]] = None,
+        cancelled: typing.Optional[typing.Callable[[], bool]] = None) -> bool:
+        """ Write the segments of a job to the device in order and in chunks,
+        returns False if it was cancelled
+
+        A cancel takes effect between two segments: a segment is the output of
+        complete commands, stopping within it could leave the printer waiting
+        for the rest of an image. Status queries wait for the job to finish.
+        """
+        sent = 0
+        with self.lock, self.printer.job():
+            for data in job:
+                if cancelled is not None and cancelled():
+                    return False
+                with memoryview(data) as view:
+                    for start in range(0, len(view), chunkSize):
+                        chunk = view[start:start + chunkSize]
+                        self.printer._raw(chunk)
+                        sent += len(chunk)
+                        if progress is not None:
+                            progress(sent)
+            if isinstance(self.printer, File):
+                self.printer.flush()
+        return True
+
     def output(self) -> None:
-        #print(str(self.buf.output))
-        self.printer._raw(self.buf.output)
\ No newline at end of file
+        job = self.take_job()
+        self.send(job, chunkSize=max([len(data) for data in job] + [1]))
\ No newline at end of file
@@ -0,0 +1,106 @@
+""" Tests of the graphics stored in the printer """
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import json
+
+from PIL import Image
+
+from escpos.assets import AssetManager, AssetRegistry
+from escpos.printer import Dummy
+
+# 8 x 2 black dots: a kc1 kc2 b xL xH yL yH c d1 d2
+LOGO_DATA = b'0!!\x01\x08\x00\x02\x001\xff\xff'
+
+
+def logo():
+    return Image.new('1', (8, 2), 0)
+
+
+def test_short_data_is_sent_with_gs_paren_l():
+    p = Dummy()
+    p._image_send_graphics_data(b'0', b'p', b'\x00' * 0xfffd)
+    assert bytes(p.output[:7]) == b'\x1d(L\xff\xff0p'
+    assert len(p.output) == 7 + 0xfffd
+
+
+def test_long_data_is_sent_with_gs_8_l():
+    p = Dummy()
+    p._image_send_graphics_data(b'0', b'p', b'\x00' * 0xfffe)
+    assert bytes(p.output[:9]) == b'\x1d8L\x00\x00\x01\x000p'
+    assert len(p.output) == 9 + 0xfffe
+
+
+def test_upload_download_graphics():
+    p = Dummy()
+    assets = AssetManager(p)
+    assert assets.upload(logo()) == '!!'
+    assert bytes(p.output) == b'\x1d(L\x0d\x000S' + LOGO_DATA
+    # resident images are not sent again
+    assert assets.upload(logo()) == '!!'
+    assert len(p.output) == 18
+
+
+def test_upload_nv_graphics_with_key():
+    p = Dummy()
+    assets = AssetManager(p, memory='nv')
+    assert assets.upload(logo(), key='LG') == 'LG'
+    assert bytes(p.output) == b'\x1d(L\x0d\x000C0LG' + LOGO_DATA[3:]
+
+
+def test_print_and_delete():
+    p = Dummy()
+    assets = AssetManager(p)
+    assets.print_key('!!', double_width=True)
+    assets.delete('!!')
+    assert bytes(p.output) == b'\x1d(L\x06\x000U!!\x02\x01' + b'\x1d(L\x04\x000R!!'
+
+
+def test_attached_image_prints_resident_images_by_key():
+    p = Dummy()
+    assets = AssetManager(p)
+    assets.attach()
+    assets.upload(logo())
+    p.clear()
+    p.image(logo())
+    assert bytes(p.output) == b'\x1d(L\x06\x000U!!\x01\x01'
+    assets.detach()
+    p.clear()
+    p.image(logo(), impl='bitImageRaster')
+    assert bytes(p.output) == b'\x1dv0\x00\x01\x00\x02\x00\xff\xff'
+
+
+def test_only_nv_graphics_are_saved(tmp_path):
+    path = str(tmp_path / 'assets.json')
+    p = Dummy()
+    registry = AssetRegistry(path)
+    AssetManager(p, registry, printer_name='shop').upload(logo())
+    AssetManager(p, registry, memory='nv', printer_name='shop').upload(logo())
+    assert set(registry.entries('shop', 'download')) == {'!!'}
+    with open(path) as registry_file:
+        assert list(json.load(registry_file)['shop']) == ['nv']
+    reloaded = AssetRegistry(path)
+    assert reloaded.entries('shop', 'download') == {}
+    assert set(reloaded.entries('shop', 'nv')) == {'!!'}
+
+
+def test_download_graphics_from_old_files_are_dropped(tmp_path):
+    path = tmp_path / 'assets.json'
+    entry = {'digest': 'x', 'width': 8, 'height': 2, 'stored': 0}
+    path.write_text(json.dumps({'shop': {'download': {'!!': entry}, 'nv': {'LG': entry}}}))
+    registry = AssetRegistry(str(path))
+    assert registry.entries('shop', 'download') == {}
+    assert registry.entries('shop', 'nv') == {'LG': entry}
+
+
+def test_reset_forgets_download_graphics():
+    p = Dummy()
+    assets = AssetManager(p)
+    assets.upload(logo())
+    assets.reset()
+    assert assets.resident(logo()) is None
+    assert assets.upload(logo()) == '!!'
+    assert len(p.output) == 36
@@ -0,0 +1,148 @@
+""" Tests of the batch subcommand of the CLI """
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import json
+
+import pytest
+from PIL import Image
+
+from escpos import cli
+from escpos.constants import *
+from escpos.printer import Dummy
+from escpos.profiling import Profiler
+
+
+def render(*entries):
+    """ Output of a batch with the given entries, as one bytes object """
+    lines = [json.dumps(entry) for entry in entries]
+    return b''.join(bytes(data) for _, data in cli._render_batch(lines, Dummy(), 65536))
+
+
+def direct(method, *args, **kwargs):
+    """ Output of calling a printer method on a Dummy """
+    p = Dummy()
+    getattr(p, method)(*args, **kwargs)
+    if method in cli.REQUIRES_NEWLINE:
+        p.text('\n')
+    return bytes(p.output)
+
+
+def test_commands_are_named_like_the_subcommands():
+    commands = cli._batch_arguments()
+    assert commands['raw'][0] == '_raw'
+    assert '_raw' not in commands
+    # not a printer method
+    assert 'fullimage' not in commands
+
+
+def test_raw():
+    assert render({'command': 'raw', 'msg': '\u001b@hiÿ'}) == b'\x1b@hi\xff'
+
+
+def test_raw_rejects_characters_that_are_no_byte():
+    with pytest.raises(ValueError):
+        render({'command': 'raw', 'msg': '€'})
+
+
+def test_raw_command_line_type():
+    assert cli.str_to_bytes('\x1dV\x00') == b'\x1dV\x00'
+
+
+def test_text():
+    assert render({'command': 'text', 'txt': 'Hello'}) == b'Hello\n'
+
+
+def test_block_text():
+    assert render({'command': 'block_text', 'txt': 'aaa bbb ccc', 'columns': '7'}) == \
+        direct('block_text', 'aaa bbb ccc', columns=7)
+
+
+def test_qr():
+    assert render({'command': 'qr', 'content': 'https://example.com'}) == direct('qr', 'https://example.com')
+
+
+def test_barcode():
+    entry = {'command': 'barcode', 'code': '4006381333931', 'bc': 'EAN13', 'height': '80', 'width': '2',
+             'pos': 'OFF', 'align_ct': 'no'}
+    assert render(entry) == BARCODE_HEIGHT + b'\x50' + BARCODE_WIDTH + b'\x02' + \
+        BARCODE_FONT_A + BARCODE_TXT_OFF + b'\x1dk\x02' + b'4006381333931' + NUL + b'\n'
+
+
+def test_cut():
+    assert render({'command': 'cut', 'mode': 'PART'}) == b'\n' * 6 + PAPER_PART_CUT
+
+
+def test_cashdraw():
+    assert render({'command': 'cashdraw', 'pin': 2}) == CD_KICK_2
+
+
+def test_image(tmp_path):
+    path = str(tmp_path / 'dot.png')
+    Image.new('1', (8, 2), 0).save(path)
+    assert render({'command': 'image', 'img_source': path, 'impl': 'bitImageRaster'}) == \
+        b'\x1dv0\x00\x01\x00\x02\x00\xff\xff'
+
+
+def test_charcode():
+    assert render({'command': 'charcode', 'code': 'USA'}) == CHARCODE_PC437
+
+
+def test_set():
+    assert render({'command': 'set', 'align': 'center', 'text_type': 'B', 'width': '2', 'height': '2'}) == \
+        direct('set', align='center', text_type='B', width=2, height=2)
+
+
+def test_hw():
+    assert render({'command': 'hw', 'hw': 'INIT'}) == HW_INIT
+
+
+def test_control():
+    assert render({'command': 'control', 'ctl': 'LF', 'pos': '8'}) == CTL_SET_HT + b'\x08' + CTL_LF
+
+
+def test_panel_buttons():
+    assert render({'command': 'panel_buttons', 'enable': 'false'}) == PANEL_BUTTON_OFF
+
+
+@pytest.mark.parametrize('entry, message', [
+    ({'command': '_raw', 'msg': 'x'}, 'Unknown command'),
+    ({'command': 'text', 'text': 'x'}, 'Unknown argument'),
+    ({'command': 'text'}, 'Missing argument'),
+    ({'command': 'cut', 'mode': 'HALF'}, 'Invalid value'),
+])
+def test_invalid_lines(entry, message):
+    with pytest.raises(ValueError) as error:
+        render({'command': 'text', 'txt': 'ok'}, entry)
+    assert str(error.value).startswith('Line 2: ' + message)
+
+
+def test_chunks_end_after_cuts():
+    lines = [json.dumps(entry) for entry in (
+        {'command': 'text', 'txt': 'a'}, {'command': 'cut'}, {'command': 'text', 'txt': 'b'})]
+    chunks = [(count, bytes(data)) for count, data in cli._render_batch(lines, Dummy(), 65536)]
+    assert chunks == [(2, b'a\n' + b'\n' * 6 + PAPER_FULL_CUT), (1, b'b\n')]
+
+
+@pytest.mark.parametrize('pipeline', [False, True])
+def test_run_batch(tmp_path, pipeline):
+    path = tmp_path / 'batch.jsonl'
+    path.write_text('{"command": "text", "txt": "Hi"}\n\n{"command": "raw", "msg": "\\u001bd\\u0003"}\n')
+    p = Dummy()
+    cli.run_batch(p, file=str(path), pipeline=pipeline)
+    assert bytes(p.output) == b'Hi\n\x1bd\x03'
+
+
+def test_run_batch_is_profiled(tmp_path):
+    path = tmp_path / 'batch.jsonl'
+    path.write_text('{"command": "text", "txt": "Hi"}\n{"command": "cut"}\n')
+    p = Dummy()
+    profiler = p.start_profiling(Profiler(trace_allocations=False))
+    cli.run_batch(p, file=str(path))
+    assert [[record.method for record in job] for job in profiler.jobs] == [['text', 'text', 'cut']]
+    assert p.profiler is profiler
+    p.text('x')
+    assert profiler.current[-1].method == 'text'
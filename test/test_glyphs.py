@@ -0,0 +1,95 @@
+""" Tests of the user-defined characters """
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import pytest
+from PIL import Image
+
+from escpos.constants import *
+from escpos.glyphs import GlyphCache
+from escpos.printer import Dummy
+
+# 12 columns of 24 dots, all printed
+FULL_CELL = b'\x0c' + b'\xff\xff\xff' * 12
+
+
+def define(code):
+    """ ESC & of one character of font A """
+    return USER_CHAR_DEFINE + b'\x03' + code * 2
+
+
+def test_full_cell():
+    p = Dummy()
+    glyphs = GlyphCache(p)
+    glyphs.define('₿', Image.new('1', (12, 24), 0))
+    glyphs.text('a₿b')
+    assert bytes(p.output) == define(b'!') + FULL_CELL + b'a' + USER_CHAR_ON + b'!' + USER_CHAR_OFF + b'b'
+
+
+def test_glyph_is_scaled_and_centered_vertically():
+    glyphs = GlyphCache(Dummy())
+    # scaled to 12 x 12 dots, rows 6 to 17 of the cell
+    assert glyphs._encode(Image.new('L', (1, 1), 0)) == (12, b'\x03\xff\xc0' * 12)
+    # white and transparent pixels are not printed
+    assert glyphs._encode(Image.new('RGBA', (12, 24), (0, 0, 0, 0))) == (12, b'\x00\x00\x00' * 12)
+
+
+def test_font_b_cells_have_three_bytes_per_column():
+    glyphs = GlyphCache(Dummy(), font='b')
+    width, data = glyphs._encode(Image.new('1', (9, 17), 0))
+    assert width == 9
+    assert data == b'\xff\xff\x80' * 9
+
+
+def test_resident_glyphs_are_sent_once():
+    p = Dummy()
+    glyphs = GlyphCache(p)
+    glyphs.define('₿', Image.new('1', (12, 24), 0))
+    glyphs.text('₿')
+    p.clear()
+    glyphs.text('₿₿')
+    assert bytes(p.output) == USER_CHAR_ON + b'!!' + USER_CHAR_OFF
+    assert glyphs.downloads == 1
+
+
+def test_least_recently_used_glyph_is_replaced():
+    p = Dummy()
+    glyphs = GlyphCache(p, slots=2)
+    for char in 'XYZ':
+        glyphs.define(char, Image.new('1', (12, 24), 0))
+    glyphs.text('X')
+    glyphs.text('Y')
+    glyphs.text('X')
+    p.clear()
+    glyphs.text('Z')
+    # Y was used least recently, Z takes its code
+    assert bytes(p.output) == define(b'"') + FULL_CELL + USER_CHAR_ON + b'"' + USER_CHAR_OFF
+    assert list(glyphs.resident().items()) == [('X', 33), ('Z', 34)]
+    assert glyphs.downloads == 3
+
+
+def test_glyphs_of_the_same_text_are_not_replaced():
+    glyphs = GlyphCache(Dummy(), slots=2)
+    for char in 'XYZ':
+        glyphs.define(char, Image.new('1', (12, 24), 0))
+    glyphs.text('XY')
+    with pytest.raises(ValueError):
+        glyphs.text('XYZ')
+
+
+def test_attached_text_and_init():
+    p = Dummy()
+    glyphs = GlyphCache(p)
+    glyphs.define('₿', Image.new('1', (12, 24), 0))
+    glyphs.attach()
+    p.text('₿')
+    p.hw('INIT')
+    assert glyphs.resident() == {}
+    p.clear()
+    p.text('₿')
+    assert bytes(p.output) == define(b'!') + FULL_CELL + USER_CHAR_ON + b'!' + USER_CHAR_OFF
+    glyphs.detach()
+    assert 'text' not in p.__dict__ and 'hw' not in p.__dict__
@@ -0,0 +1,110 @@
+""" Tests of the latency histogram and the method wrappers """
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import pytest
+
+from escpos.instrument import LatencyHistogram, unwrap_method, wrap_method
+from escpos.printer import Dummy
+
+
+def test_small_values_have_a_bucket_each():
+    histogram = LatencyHistogram()
+    assert [histogram._index(value) for value in range(32)] == list(range(32))
+    assert [histogram._value(index) for index in range(32)] == list(range(32))
+
+
+@pytest.mark.parametrize('value, index', [
+    (32, 32), (33, 32), (34, 33), (63, 47),
+    (64, 48), (67, 48), (68, 49), (127, 63),
+    (128, 64), (1 << 20, 32 + 15 * 16),
+])
+def test_index(value, index):
+    assert LatencyHistogram()._index(value) == index
+
+
+def test_buckets_are_contiguous_and_precise():
+    histogram = LatencyHistogram()
+    previous = 0
+    for value in range(1, 1 << 16):
+        index = histogram._index(value)
+        assert index in (previous, previous + 1)
+        previous = index
+        assert abs(histogram._value(index) - value) <= value * 2 ** (1 - histogram.sub_bucket_bits)
+
+
+def test_percentile():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(50) is None
+    for value in range(1, 101):
+        histogram.record(value)
+    assert histogram.count == 100
+    assert histogram.min == 1 and histogram.max == 100
+    assert histogram.percentile(10) == 10
+    # 50 is in the bucket of 50 and 51
+    assert histogram.percentile(50) == 50
+    assert histogram.percentile(100) == 100
+    assert histogram.mean == 50.5
+
+
+def test_merge():
+    first, second = LatencyHistogram(), LatencyHistogram()
+    first.record(5)
+    second.record(5000)
+    second.record(7)
+    first.merge(second)
+    assert (first.count, first.total, first.min, first.max) == (3, 5012, 5, 5000)
+    assert first.counts == {5: 1, 7: 1, first._index(5000): 1}
+    with pytest.raises(ValueError):
+        first.merge(LatencyHistogram(sub_bucket_bits=4))
+
+
+def tagging(calls, tag):
+    def wrapper(name, raw):
+        def tagged(msg):
+            calls.append(tag)
+            return raw(msg)
+        return tagged
+    return wrapper
+
+
+def test_wrappers_are_called_outermost_first():
+    p = Dummy()
+    calls = []
+    wrap_method(p, '_raw', tagging(calls, 'inner'), 'inner')
+    wrap_method(p, '_raw', tagging(calls, 'outer'), 'outer')
+    p._raw(b'x')
+    assert calls == ['outer', 'inner']
+    assert bytes(p.output) == b'x'
+
+
+@pytest.mark.parametrize('order', [
+    ('a', 'b', 'c'), ('c', 'b', 'a'), ('b', 'a', 'c'), ('b', 'c', 'a'),
+])
+def test_unwrap_in_any_order(order):
+    p = Dummy()
+    calls = []
+    for owner in ('a', 'b', 'c'):
+        wrap_method(p, '_raw', tagging(calls, owner), owner)
+    removed = set()
+    for owner in order:
+        unwrap_method(p, '_raw', owner)
+        removed.add(owner)
+        del calls[:]
+        p._raw(b'x')
+        assert calls == [tag for tag in ('c', 'b', 'a') if tag not in removed]
+    assert '_raw' not in p.__dict__
+    assert bytes(p.output) == b'xxx'
+
+
+def test_unwrap_of_an_unknown_owner_does_nothing():
+    p = Dummy()
+    calls = []
+    unwrap_method(p, '_raw', 'a')
+    wrap_method(p, '_raw', tagging(calls, 'a'), 'a')
+    unwrap_method(p, '_raw', 'b')
+    p._raw(b'x')
+    assert calls == ['a']
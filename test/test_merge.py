@@ -0,0 +1,63 @@
+""" Tests of the mail merge """
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import pytest
+
+from escpos.exceptions import MergeError
+from escpos.merge import Layout, merge, read_rows
+from escpos.printer import Dummy
+
+LAYOUT = '''
+{"command": "text", "txt": "{name}: {price:>6}\\n"}
+{"command": "qr", "content": "{sku}", "size": "{size:d}", "native": true}
+'''
+
+
+def direct(name, price, sku, size):
+    p = Dummy()
+    p.text('{0}: {1:>6}\n'.format(name, price))
+    p.qr(sku, size=size, native=True)
+    return bytes(p.output)
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    path = tmp_path / 'products.csv'
+    path.write_text('name,price,sku,size\nTea,2.50,T-1,4\nCake,3.20,C-7,6\n')
+    return str(path)
+
+
+def test_csv_fields_are_converted(csv_path):
+    layout = Layout.from_text(LAYOUT)
+    assert layout.fields == {'name', 'price', 'sku', 'size'}
+    jobs = list(merge(layout, read_rows(csv_path), workers=1))
+    assert jobs == [direct('Tea', '2.50', 'T-1', 4), direct('Cake', '3.20', 'C-7', 6)]
+
+
+def test_plain_placeholder_keeps_the_type():
+    layout = Layout([('qr', {'content': '{sku}', 'size': '{size}', 'native': True})])
+    p = Dummy()
+    layout.render(p, {'sku': 'T-1', 'size': 4})
+    expected = Dummy()
+    expected.qr('T-1', size=4, native=True)
+    assert bytes(p.output) == bytes(expected.output)
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_errors_name_the_row(tmp_path, workers):
+    path = tmp_path / 'products.csv'
+    path.write_text('name,price,sku,size\nTea,2.50,T-1,4\nCake,3.20,C-7,large\n')
+    with pytest.raises(MergeError) as error:
+        list(merge(Layout.from_text(LAYOUT), read_rows(str(path)), workers=workers, chunk_size=1))
+    assert 'row 2: qr: ' in error.value.msg
+
+
+def test_missing_field():
+    layout = Layout.from_text(LAYOUT)
+    with pytest.raises(MergeError) as error:
+        list(merge(layout, [{'name': 'Tea', 'price': '1', 'sku': 'T-1'}], workers=1))
+    assert error.value.msg == "row 1: field 'size' is missing"
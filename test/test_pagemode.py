@@ -0,0 +1,98 @@
+""" Tests of the page mode layouts """
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import pytest
+from PIL import Image
+
+from escpos.constants import *
+from escpos.pagemode import PageLayout
+from escpos.printer import Dummy
+
+START = PAGE_MODE + PAGE_DIRECTION + b'\x00'
+
+
+def area(x, y, width, height):
+    return PAGE_AREA + bytes(bytearray([x & 0xff, x >> 8, y & 0xff, y >> 8, width & 0xff, width >> 8,
+                                        height & 0xff, height >> 8]))
+
+
+def position(x, y):
+    return PAGE_POS_X + bytes(bytearray([x & 0xff, x >> 8])) + PAGE_POS_Y + bytes(bytearray([y & 0xff, y >> 8]))
+
+
+def output(method, *args, **kwargs):
+    p = Dummy()
+    getattr(p, method)(*args, **kwargs)
+    return bytes(p.output)
+
+
+@pytest.mark.parametrize('align, first, second', [('left', 0, 0), ('center', 88, 82), ('right', 176, 164)])
+def test_text_lines_are_positioned_on_their_baseline(align, first, second):
+    p = Dummy()
+    page = PageLayout(p, width=384)
+    page.text((100, 10, 200, 100), 'Hi\nyou', align=align)
+    page.print_page()
+    # lines of 24 dots with a gap of 6
+    assert bytes(p.output) == START + area(100, 10, 200, 100) + output('set', font='a') + \
+        position(first, 24) + b'Hi' + position(second, 54) + b'you' + PAGE_PRINT + output('set')
+
+
+def test_text_is_wrapped_and_cut_at_the_bottom_of_the_region():
+    p = Dummy()
+    page = PageLayout(p, width=384)
+    page.text((0, 0, 60, 30), 'aaa bbb ccc', font='b')
+    page.print_page()
+    # five columns of 9 dots, one line of 17 dots fits
+    assert bytes(p.output) == START + area(0, 0, 60, 30) + output('set', font='b') + position(0, 17) + b'aaa' + \
+        PAGE_PRINT + output('set')
+
+
+def test_barcode_stands_on_the_baseline():
+    p = Dummy()
+    page = PageLayout(p, width=384)
+    page.barcode((0, 0, 300, 100), '4006381333931', 'EAN13', height=50, pos='ABOVE')
+    page.print_page()
+    assert bytes(p.output) == START + area(0, 0, 300, 100) + position(0, 74) + \
+        output('barcode', '4006381333931', 'EAN13', height=50, pos='ABOVE', align_ct=False) + PAGE_PRINT
+
+
+def test_qr_code_is_centered():
+    p = Dummy()
+    page = PageLayout(p, width=384)
+    page.qr((0, 0, 163, 100), 'HI', align='center')
+    page.print_page()
+    # version 1: 21 modules of 3 dots
+    assert bytes(p.output) == START + area(0, 0, 163, 100) + position(50, 63) + \
+        output('qr', 'HI', native=True) + PAGE_PRINT
+
+
+def test_image_and_motion_units():
+    p = Dummy()
+    page = PageLayout(p, width=384, units=203)
+    page.image((100, 0, 100, 20), Image.new('1', (8, 2), 0), align='right')
+    page.print_page(clear=False)
+    assert bytes(p.output) == MOTION_UNITS + b'\xcb\xcb' + START + area(100, 0, 100, 20) + position(92, 2) + \
+        b'\x1dv0\x00\x01\x00\x02\x00\xff\xff' + PAGE_PRINT
+    assert page.height == 20
+    p.clear()
+    page.print_page()
+    assert len(p.output) == 38
+    assert page.regions == []
+
+
+@pytest.mark.parametrize('box', [(-1, 0, 10, 10), (0, 0, 0, 10), (380, 0, 10, 10)])
+def test_regions_have_to_be_inside_the_page(box):
+    with pytest.raises(ValueError):
+        PageLayout(Dummy(), width=384).text(box, 'x')
+
+
+def test_default_width_and_empty_page():
+    p = Dummy()
+    page = PageLayout(p)
+    assert page.width == p.columns * 12
+    page.print_page()
+    assert bytes(p.output) == b''
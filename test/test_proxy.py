@@ -0,0 +1,142 @@
+""" Tests of the raw print proxy against a simulated network printer """
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import socket
+import threading
+import time
+
+import pytest
+
+from escpos.printer import Network
+from escpos.proxy import PrinterQueue, ProxyServer, _Job
+from escpos.simulator import NetworkPrinterSimulator
+
+
+@pytest.fixture
+def simulator():
+    with NetworkPrinterSimulator() as sim:
+        yield sim
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.time() + timeout
+    while not predicate():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def proxy_for(simulator, **kwargs):
+    printer = Network(simulator.host, simulator.port, timeout=2)
+    server = ProxyServer({0: printer}, host='127.0.0.1', **kwargs)
+    port = server.start()[0]
+    return server, port
+
+
+def send_job(port, chunks, pause=0.0):
+    client = socket.create_connection(('127.0.0.1', port), 2)
+    try:
+        for chunk in chunks:
+            client.sendall(chunk)
+            time.sleep(pause)
+    finally:
+        client.close()
+
+
+def test_jobs_of_concurrent_clients_are_not_mixed(simulator):
+    server, port = proxy_for(simulator, chunk_size=16)
+    jobs = [bytes(bytearray([65 + number])) * 200 for number in range(8)]
+    try:
+        clients = [threading.Thread(target=send_job, args=(port, [job[i:i + 50] for i in range(0, 200, 50)], 0.01))
+                   for job in jobs]
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join(5)
+        assert wait_for(lambda: len(simulator.model.received) == 1600)
+    finally:
+        server.shutdown()
+    received = bytes(simulator.model.received)
+    # every job arrives in one piece
+    assert sorted(received[i:i + 200] for i in range(0, 1600, 200)) == jobs
+
+
+def test_connections_over_the_limit_are_closed(simulator):
+    server, port = proxy_for(simulator, max_clients=2)
+    held = [socket.create_connection(('127.0.0.1', port), 2) for _ in range(2)]
+    try:
+        for client in held:
+            client.sendall(b'x')
+        rejected = socket.create_connection(('127.0.0.1', port), 2)
+        try:
+            rejected.settimeout(2)
+            try:
+                assert rejected.recv(1) == b''
+            except (OSError, socket.error):
+                # reset by the proxy
+                pass
+        finally:
+            rejected.close()
+    finally:
+        for client in held:
+            client.close()
+        server.shutdown()
+    assert wait_for(lambda: bytes(simulator.model.received) == b'xx')
+
+
+def test_printer_is_reconnected_after_a_transport_error(simulator):
+    server, port = proxy_for(simulator)
+    printer_queue = server.queues[0]
+    try:
+        client = socket.create_connection(('127.0.0.1', port), 2)
+        try:
+            client.sendall(b'first')
+            assert wait_for(lambda: bytes(simulator.model.received) == b'first')
+            simulator.disconnect()
+            # the chunks after the cut fail to send
+            for _ in range(5):
+                time.sleep(0.05)
+                client.sendall(b'lost')
+        finally:
+            client.close()
+        assert wait_for(lambda: simulator.model.connections == 2)
+        send_job(port, [b'second job'])
+        assert wait_for(lambda: printer_queue.sent_jobs == 1)
+    finally:
+        server.shutdown()
+    assert bytes(simulator.model.received).endswith(b'second job')
+    assert b'lost' * 5 not in bytes(simulator.model.received)
+
+
+class BlockingPrinter(object):
+    """ Printer whose `_raw()` waits until it is released """
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def _raw(self, msg):
+        self.release.wait(5)
+
+
+def test_stop_does_not_block_on_a_full_queue():
+    printer = BlockingPrinter()
+    printer_queue = PrinterQueue(printer, max_jobs=2)
+    printer_queue.start()
+    for _ in range(3):
+        job = _Job('client', 2)
+        job.chunks.put(b'x')
+        job.chunks.put(None)
+        printer_queue.jobs.put(job)
+    assert printer_queue.jobs.full()
+    start = time.time()
+    printer_queue.stop()
+    assert time.time() - start < 1
+    printer.release.set()
+    printer_queue.join(5)
+    assert not printer_queue.is_alive()
+    assert printer_queue.sent_jobs == 3
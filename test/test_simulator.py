@@ -0,0 +1,65 @@
+""" Tests of the simulated device file """
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import os
+import sys
+import time
+
+import pytest
+
+from escpos.printer import File
+from escpos.simulator import FilePrinterSimulator
+
+pytestmark = pytest.mark.skipif(sys.platform == 'win32', reason="named pipes are POSIX only")
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.time() + timeout
+    while not predicate():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_stop_returns_while_a_client_holds_the_pipe():
+    sim = FilePrinterSimulator().start()
+    printer = File(sim.path)
+    try:
+        printer._raw(b'held')
+        assert wait_for(lambda: bytes(sim.model.received) == b'held')
+        start = time.time()
+        sim.stop()
+        assert time.time() - start < 1
+        assert not sim._thread.is_alive()
+    finally:
+        try:
+            printer.close()
+        except (IOError, OSError):
+            pass
+
+
+def test_disconnect_breaks_the_pipe_of_the_client():
+    with FilePrinterSimulator(reconnect_delay=0.2) as sim:
+        printer = File(sim.path)
+        printer._raw(b'first')
+        assert wait_for(lambda: bytes(sim.model.received) == b'first')
+        sim.disconnect()
+        with pytest.raises((IOError, OSError)):
+            for _ in range(50):
+                printer._raw(b'lost')
+                time.sleep(0.01)
+        try:
+            printer.close()
+        except (IOError, OSError):
+            pass
+        assert wait_for(lambda: sim.model.connections == 1)
+        printer = File(sim.path)
+        printer._raw(b'second')
+        printer.close()
+        assert wait_for(lambda: bytes(sim.model.received).endswith(b'second'))
+        assert sim.model.connections == 2
@@ -0,0 +1,132 @@
+""" Tests of the on-disk spool and its writer process """
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import os
+import time
+
+import pytest
+
+from escpos.exceptions import ConfigSyntaxError
+from escpos.spool import RECORD_HEADER, Spool, SpoolReader, SpoolWriter, _build_printer, _list_segments
+from escpos.transfer import RetryPolicy
+
+
+def wait_for_file(path, content, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if os.path.exists(path):
+            with open(path, 'rb') as output:
+                if output.read() == content:
+                    return True
+        time.sleep(0.02)
+    return False
+
+
+def test_reader_resumes_after_the_last_acknowledged_job(tmp_path):
+    path = str(tmp_path)
+    with Spool(path) as spool:
+        assert [spool.enqueue(job) for job in (b'one', b'two', b'three')] == [1, 2, 3]
+    reader = SpoolReader(path)
+    assert reader.next_job() == (1, b'one')
+    reader.ack(1)
+    # read, but not acknowledged
+    assert reader.next_job() == (2, b'two')
+    reader.close()
+
+    reader = SpoolReader(path)
+    assert reader.next_job() == (2, b'two')
+    assert reader.next_job() == (3, b'three')
+    assert reader.next_job() is None
+    reader.close()
+
+
+def test_torn_record_is_cut_off(tmp_path):
+    path = str(tmp_path)
+    with Spool(path) as spool:
+        spool.enqueue(b'complete')
+    segment = os.path.join(path, os.listdir(path)[0])
+    with open(segment, 'ab') as segment_file:
+        segment_file.write(RECORD_HEADER.pack(100, 0, 2) + b'torn')
+    with Spool(path) as spool:
+        assert os.path.getsize(segment) == RECORD_HEADER.size + len(b'complete')
+        assert spool.enqueue(b'next') == 2
+    reader = SpoolReader(path)
+    assert reader.next_job() == (1, b'complete')
+    assert reader.next_job() == (2, b'next')
+    reader.close()
+
+
+def test_acknowledged_segments_are_removed(tmp_path):
+    path = str(tmp_path)
+    with Spool(path, segment_size=1) as spool:
+        for job in (b'a', b'b', b'c'):
+            spool.enqueue(job)
+    assert len(_list_segments(path)) == 4
+    reader = SpoolReader(path)
+    for job_id in (1, 2, 3):
+        assert reader.next_job() == (job_id, b'abc'[job_id - 1:job_id])
+    assert reader.next_job() is None
+    reader.ack(3)
+    reader.close()
+    assert len(_list_segments(path)) == 1
+    assert SpoolReader(path).next_job() is None
+
+
+def test_printer_is_built_like_the_config_does(tmp_path):
+    devfile = str(tmp_path / 'out.bin')
+    printer = _build_printer({'type': 'file', 'devfile': devfile})
+    printer._raw(b'x')
+    printer.close()
+    with open(devfile, 'rb') as output:
+        assert output.read() == b'x'
+    with pytest.raises(ConfigSyntaxError):
+        _build_printer({'type': 'nonexistent'})
+
+
+def test_writer_drains_the_spool(tmp_path):
+    path = str(tmp_path / 'spool')
+    devfile = str(tmp_path / 'out.bin')
+    with Spool(path, sync_interval=0.01) as spool:
+        spool.enqueue(b'\x1b@Hello\n')
+        spool.enqueue(b'World\n')
+    writer = SpoolWriter(path, {'type': 'file', 'devfile': devfile}, poll_interval=0.01)
+    writer.start()
+    try:
+        assert wait_for_file(devfile, b'\x1b@Hello\nWorld\n')
+    finally:
+        writer.stop(5)
+    assert writer.exitcode == 0
+    assert SpoolReader(path).next_job() is None
+
+
+def test_writer_retries_until_the_printer_is_available(tmp_path):
+    path = str(tmp_path / 'spool')
+    devfile = str(tmp_path / 'missing' / 'out.bin')
+    with Spool(path) as spool:
+        spool.enqueue(b'job')
+    writer = SpoolWriter(path, {'type': 'file', 'devfile': devfile}, poll_interval=0.01,
+                         policy=RetryPolicy(attempts=100, delay=0.01, max_delay=0.05))
+    writer.start()
+    try:
+        time.sleep(0.1)
+        os.mkdir(str(tmp_path / 'missing'))
+        assert wait_for_file(devfile, b'job')
+    finally:
+        writer.stop(5)
+    assert writer.exitcode == 0
+
+
+def test_writer_gives_up_and_keeps_the_job(tmp_path):
+    path = str(tmp_path / 'spool')
+    with Spool(path) as spool:
+        spool.enqueue(b'job')
+    writer = SpoolWriter(path, {'type': 'file', 'devfile': str(tmp_path / 'missing' / 'out.bin')},
+                         policy=RetryPolicy(attempts=2, delay=0.01))
+    writer.start()
+    writer.join(5)
+    assert writer.exitcode not in (0, None)
+    assert SpoolReader(path).next_job() == (1, b'job')
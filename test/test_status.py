@@ -0,0 +1,164 @@
+""" Tests of the real-time status queries and the status poller """
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import threading
+import time
+
+import pytest
+
+from escpos.constants import *
+from escpos.printer import Dummy, Network
+from escpos.simulator import NetworkPrinterSimulator
+from escpos.status import PrinterStatus, StatusPoller, next_reply, parse_asb, parse_rt_status
+
+
+class CountingDummy(Dummy):
+    """ Dummy that keeps every `_raw()` call """
+
+    def __init__(self, *args, **kwargs):
+        Dummy.__init__(self, *args, **kwargs)
+        self.calls = []
+
+    def _raw(self, msg):
+        self.calls.append(bytes(msg))
+        Dummy._raw(self, msg)
+
+
+@pytest.fixture
+def simulator():
+    with NetworkPrinterSimulator() as sim:
+        yield sim
+
+
+def wait_for(predicate, timeout=2):
+    deadline = time.time() + timeout
+    while not predicate():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_parse_rt_status():
+    assert parse_rt_status(RT_STATUS_PRINTER, 0x12) == {'online': True, 'drawer': False}
+    assert parse_rt_status(RT_STATUS_PRINTER, 0x1e) == {'online': False, 'drawer': True}
+    assert parse_rt_status(RT_STATUS_OFFLINE, 0x56) == {'cover_open': True, 'paper_feed': False, 'error': True}
+    assert parse_rt_status(RT_STATUS_ERROR, 0x1a) == {'error': True}
+    assert parse_rt_status(RT_STATUS_PAPER, 0x1e) == {'paper_near_end': True, 'paper_out': False}
+    assert parse_rt_status(RT_STATUS_PAPER, 0x72) == {'paper_near_end': False, 'paper_out': True}
+    with pytest.raises(ValueError):
+        parse_rt_status(b'\x10\x04\x09', 0x12)
+
+
+def test_parse_asb():
+    assert parse_asb(b'\x3c\x20\x0c\x00') == {
+        'drawer': True, 'online': False, 'cover_open': True, 'paper_feed': False, 'error': True,
+        'paper_near_end': False, 'paper_out': True,
+    }
+    assert PrinterStatus(**parse_asb(b'\x10\x00\x00\x00')).ready
+
+
+def test_next_reply_separates_status_bytes_from_frames():
+    buf = bytearray(b'\x16\x10\x00\x00\x00\xff\x12\x10\x00')
+    assert next_reply(buf) == ('rt', 0x16)
+    assert next_reply(buf) == ('asb', b'\x10\x00\x00\x00')
+    assert next_reply(buf) == ('rt', 0x12)
+    # an incomplete frame stays in the buffer
+    assert next_reply(buf) is None
+    assert buf == bytearray(b'\x10\x00')
+
+
+def test_barcode_is_sent_in_one_piece():
+    p = CountingDummy()
+    p.barcode('4006381333931', 'EAN13', align_ct=False)
+    assert p.calls[-1] == b'\x1dk\x02' + b'4006381333931' + b'\x00'
+
+
+def test_query_status(simulator):
+    simulator.model.set_status(paper_near_end=True)
+    p = Network(simulator.host, simulator.port, timeout=2)
+    try:
+        assert p.query_status(RT_STATUS_PAPER, 2) == 0x1e
+        assert p.paper_status(2) == 1
+        assert p.is_online(2) is True
+    finally:
+        p.close()
+
+
+def test_asb_poller_answers_queries_of_other_threads(simulator):
+    p = Network(simulator.host, simulator.port, timeout=2)
+    poller = StatusPoller(p, mode='asb', interval=0.05)
+    poller.start()
+    try:
+        assert poller.wait_ready(2)
+        assert p.status_poller is poller
+        simulator.model.set_status(paper_out=True)
+        assert wait_for(lambda: poller.status.paper_out)
+        # the poller reads the answer, the caller gets it
+        assert p.query_status(RT_STATUS_PAPER, 2) == 0x72
+        assert not poller.ready
+    finally:
+        poller.stop(2)
+        p.close()
+    assert p.status_poller is None
+
+
+def test_dle_poller_waits_for_the_end_of_a_job(simulator):
+    p = Network(simulator.host, simulator.port, timeout=2)
+    poller = StatusPoller(p, mode='dle', timeout=1)
+    in_job = threading.Event()
+    finish = threading.Event()
+
+    def job():
+        with p.job():
+            p._raw(b'\x1dv0\x00\x01\x00\x02\x00')
+            in_job.set()
+            finish.wait(2)
+            p._raw(b'\xff\xff')
+
+    sender = threading.Thread(target=job)
+    sender.start()
+    try:
+        assert in_job.wait(2)
+        poller._poll_dle()
+        assert poller.status.online is None
+        finish.set()
+        sender.join(2)
+        poller._poll_dle()
+        assert poller.status.online is True
+        assert wait_for(lambda: bytes(simulator.model.received).endswith(RT_STATUS_PAPER))
+        # the queries follow the complete raster command
+        assert bytes(simulator.model.received).startswith(b'\x1dv0\x00\x01\x00\x02\x00\xff\xff' + RT_STATUS_PRINTER)
+    finally:
+        finish.set()
+        p.close()
+
+
+class SilentDummy(Dummy):
+    """ Dummy that never answers a status query """
+
+    def _read(self, timeout=0):
+        time.sleep(timeout)
+        return b''
+
+
+def test_dle_poll_does_not_hold_up_a_job_while_it_waits_for_answers():
+    p = SilentDummy()
+    poller = StatusPoller(p, mode='dle', timeout=0.5)
+    polling = threading.Thread(target=poller._poll_dle)
+    polling.start()
+    try:
+        time.sleep(0.05)
+        start = time.time()
+        with p.job():
+            p._raw(b'job')
+        assert time.time() - start < 0.2
+    finally:
+        polling.join(2)
+    # the three queries are sent in one piece
+    assert bytes(p.output) == RT_STATUS_PRINTER + RT_STATUS_OFFLINE + RT_STATUS_PAPER + b'job'
+    assert poller.status.online is False